@@ -0,0 +1,237 @@
+import heapq
+from datetime import datetime
+
+import numpy as np
+
+ONGOING_STATUSES = ("CURRENT", "REPEATING")
+
+
+def year_span(year):
+    """``[start, end)`` timestamps of ``year`` in local time, so
+    ``start <= ts < end`` is ``datetime.fromtimestamp(ts).year == year``."""
+    return datetime(year, 1, 1).timestamp(), datetime(year + 1, 1, 1).timestamp()
+
+
+class Vocabulary:
+    """Interns genre, studio, format and country names to integer codes."""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+def _ragged(groups, vocab):
+    """Flatten per-entry name lists into parallel (entry index, code) arrays,
+    keeping entry order and the order of names within each entry."""
+    known = vocab.codes
+    owners = []
+    codes = []
+    for i, names in enumerate(groups):
+        for name in names:
+            code = known.get(name)
+            if code is None:
+                code = vocab.code(name)
+            owners.append(i)
+            codes.append(code)
+    return np.array(owners, dtype=np.int64), np.array(codes, dtype=np.int64)
+
+
+def _relevant(entries, years):
+    """Entries completed in, or ongoing and updated during, one of ``years``."""
+    spans = [year_span(y) for y in years]
+    kept = []
+    for e in entries:
+        if e.year and e.year in years:
+            kept.append(e)
+        elif e.status in ONGOING_STATUSES:
+            ts = e.updated_at or 0
+            for start, end in spans:
+                if start <= ts < end:
+                    kept.append(e)
+                    break
+    return kept
+
+
+class EntryColumns:
+    """Struct-of-arrays view of one list of ``Entry``.
+
+    Numeric fields become NumPy columns and names become ``vocab`` codes; the
+    entries are kept only to build the few output objects a report shows.
+    With ``years`` given, only entries that can appear in those years' reports
+    (completed in one of them, or ongoing) are kept.
+    """
+
+    def __init__(self, entries, kind, vocab, years=None):
+        if years is not None:
+            entries = _relevant(entries, years)
+        n = len(entries)
+        anime = kind == "anime"
+
+        rows = [
+            (
+                e.year or 0,
+                e.month or 0,
+                e.progress or 0,
+                e.repeat or 0,
+                e.updated_at or 0,
+                e.status in ONGOING_STATUSES,
+                (e.duration or 24) if anime else (e.volumes or 0),
+            )
+            for e in entries
+        ]
+        table = np.array(rows, dtype=np.int64).reshape(n, 7).T.copy()
+
+        self.kind = kind
+        self.entries = entries
+        self.year, self.month, self.progress, self.repeat, self.updated = table[:5]
+        self.ongoing = table[5].astype(bool)
+        self.score = np.fromiter((e.score for e in entries), np.float64, n)
+
+        self.genre_owner, self.genre_code = _ragged((e.genres for e in entries), vocab)
+
+        if anime:
+            self.duration = table[6]
+            self.volumes = np.zeros(n, np.int64)
+            self.category = np.fromiter(
+                (vocab.code(e.format or "UNKNOWN") for e in entries), np.int64, n
+            )
+            self.studio_owner, self.studio_code = _ragged(
+                (e.studios for e in entries), vocab
+            )
+        else:
+            self.duration = np.zeros(n, np.int64)
+            self.volumes = table[6]
+            self.category = np.fromiter(
+                (vocab.code(e.country or "JP") for e in entries), np.int64, n
+            )
+            self.studio_owner = self.studio_code = np.zeros(0, np.int64)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def completed_in(self, year):
+        return self.year == year
+
+    def ongoing_in(self, year):
+        start, end = year_span(year)
+        return (
+            self.ongoing
+            & (self.updated != 0)
+            & (self.updated >= start)
+            & (self.updated < end)
+        )
+
+    def active_years(self):
+        years = set(np.unique(self.year[self.year != 0]).tolist())
+        for ts in self.updated[self.ongoing & (self.updated != 0)].tolist():
+            years.add(datetime.fromtimestamp(ts).year)
+        return years
+
+
+def ordered_counts(codes, names):
+    """``(name, count)`` pairs sorted by count descending.
+
+    Ties keep first-appearance order in ``codes``, exactly what sorting a
+    ``defaultdict(int)`` filled in that order would give.
+    """
+    if not len(codes):
+        return []
+    unique, first, counts = np.unique(codes, return_index=True, return_counts=True)
+    by_appearance = np.argsort(first, kind="stable")
+    unique, counts = unique[by_appearance], counts[by_appearance]
+    ranked = np.argsort(-counts, kind="stable")
+    return [(names[unique[i]], int(counts[i])) for i in ranked]
+
+
+def appearance_order(values):
+    """Distinct ``values`` in order of first appearance."""
+    if not len(values):
+        return []
+    unique, first = np.unique(values, return_index=True)
+    return unique[np.argsort(first, kind="stable")].tolist()
+
+
+def top_k(scores, tiebreak, k):
+    """Positions of the ``k`` highest ``scores``, highest first, ties ordered
+    by ``tiebreak``. Uses a partial selection so only the candidates at or
+    above the k-th score get sorted."""
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.zeros(0, np.int64)
+    candidates = np.arange(n)
+    if n > k:
+        kth = np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(-scores <= kth)
+    order = np.lexsort((tiebreak[candidates], -scores[candidates]))
+    return candidates[order][:k]
+
+
+def first_argmax(scores):
+    """Position of the first maximum, like ``max(..., key=score)``."""
+    return int(np.argmax(scores)) if len(scores) else None
+
+
+class LazyMin:
+    """Multiset with O(log n) insert and amortized O(log n) minimum under
+    removal: removed items stay in the heap until they surface."""
+
+    def __init__(self):
+        self._heap = []
+        self._live = {}
+
+    def add(self, item):
+        self._live[item] = self._live.get(item, 0) + 1
+        heapq.heappush(self._heap, item)
+
+    def remove(self, item):
+        left = self._live[item] - 1
+        if left:
+            self._live[item] = left
+        else:
+            del self._live[item]
+
+    def first(self):
+        heap = self._heap
+        while heap and heap[0] not in self._live:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+
+class RunningCounts:
+    """Incrementally maintained ``ordered_counts``: per-name counts plus the
+    earliest position each name was seen at, so ties break in first-appearance
+    order even after entries are removed."""
+
+    def __init__(self):
+        self.counts = {}
+        self._first = {}
+
+    def add(self, name, position):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        first = self._first.get(name)
+        if first is None:
+            first = self._first[name] = LazyMin()
+        first.add(position)
+
+    def remove(self, name, position):
+        left = self.counts[name] - 1
+        if left:
+            self.counts[name] = left
+            self._first[name].remove(position)
+        else:
+            del self.counts[name]
+            del self._first[name]
+
+    def ordered(self):
+        """``(name, count)`` pairs, as ``ordered_counts`` would return them."""
+        return sorted(
+            self.counts.items(),
+            key=lambda item: (-item[1], self._first[item[0]].first()),
+        )
@@ -1,55 +1,254 @@
 from flask import (
     Flask,
+    g,
     jsonify,
     request,
     Response,
     send_file,
     render_template,
+    stream_with_context,
 )
 
 import os
 import sys
+import time
 import asyncio
-import hashlib
+import functools
 from io import BytesIO
 from datetime import datetime
 from flask_caching import Cache
+from werkzeug.http import unquote_etag
 
 
 sys.path.insert(0, os.path.dirname(__file__))
 
+import metrics
+import profiling
+from shares import get_share_store, share_id_for
+from results import SingleFlight, get_result_cache, rewind_key, rewinds_key
+from cards import CardQueueFull, CardTimeout, get_card_renderer
+from sections import (
+    FETCHED_SECTIONS,
+    NDJSON_HEADERS,
+    SECTION_NAMES,
+    STATIC_SECTIONS,
+    early_events,
+    event,
+    fetched,
+    page_html,
+    render_sections,
+    section_event,
+    staged,
+)
+
 try:
-    from rewind import build_rewind
-    from data.anime import fetch_anime
-    from data.manga import fetch_manga
-    from share_card import create_share_card
-    from data.favorites import fetch_favorites
+    from rewind import AccumulatorCache, build_rewind, build_rewind_multi
+    from data import fetch_all, get_client, get_store, refresh_cached, run_sync
+    from images import (
+        ProxyRejected,
+        get_image_proxy,
+        get_thumbnail_store,
+        thumb_srcset,
+        thumb_url,
+    )
+    from share_card import FORMATS, negotiate_format
 except ImportError as e:
     print(f"Import error: {e}")
 
-    async def fetch_anime(username):
-        return {"lists": []}
+    async def fetch_all(username, year=None):
+        return [], [], {"characters": []}
+
+    def run_sync(coro, timeout=None):
+        return asyncio.run(coro)
+
+    def get_client():
+        return None
+
+    def get_store():
+        return None
+
+    class ProxyRejected(ValueError):
+        pass
+
+    def get_image_proxy():
+        raise RuntimeError("Image proxy unavailable")
+
+    def get_thumbnail_store():
+        raise RuntimeError("Thumbnails unavailable")
+
+    def thumb_url(url, width=320):
+        return url
 
-    async def fetch_manga(username):
-        return {"lists": []}
+    def thumb_srcset(url):
+        return ""
 
-    async def fetch_favorites(username):
-        return {"characters": []}
+    FORMATS = {"png": ("PNG", "image/png", {})}
+
+    def negotiate_format(accept=None, requested=None):
+        return "png"
 
     def build_rewind(anime, manga, favorites, year):
         return {"error": "Import failed"}
 
-    def create_share_card(data):
-        from PIL import Image
+    def build_rewind_multi(anime, manga, favorites, years=None):
+        return {}
+
+    class AccumulatorCache:
+        stats = {}
 
-        return Image.new("RGB", (1080, 1350), color="#030303")
+        def build(self, username, refresh, load):
+            return {"favorites": None, "reports": {}}
 
 
 app = Flask(__name__)
 cache = Cache(config={"CACHE_TYPE": "SimpleCache", "CACHE_DEFAULT_TIMEOUT": 3600})
 cache.init_app(app)
-
-share_cache = {}
+app.jinja_env.globals.update(thumb=thumb_url, thumb_srcset=thumb_srcset)
+
+EMPTY_LIST = []
+LOCAL_TIMEOUT = 300
+
+flights = SingleFlight()
+accumulators = AccumulatorCache()
+
+
+def build_reports(username):
+    """Every year's report for ``username``. With the list store, a refresh
+    that only fetched changed entries updates the reports incrementally."""
+    store = get_store()
+    if store is None:
+        with metrics.span("fetch"):
+            anime, manga, favorites = run_sync(fetch_all(username))
+        fetched(favorites)
+        profiling.annotate(
+            fetched_entries=profiling.entry_count(anime)
+            + profiling.entry_count(manga)
+        )
+        return {
+            "favorites": favorites,
+            "reports": build_rewind_multi(anime, manga, favorites),
+        }
+    with metrics.span("fetch"):
+        refresh = run_sync(refresh_cached(username))
+    fetched(refresh.favorites)
+    profiling.annotate(
+        refresh=refresh.mode,
+        fetched_entries=profiling.entry_count(refresh.anime)
+        + profiling.entry_count(refresh.manga),
+    )
+    return accumulators.build(username, refresh, store.load)
+
+
+def build_year(username, year):
+    """One year's report from a year-scoped fetch, which downloads only the
+    entries that year's report can show."""
+    with metrics.span("fetch"):
+        anime, manga, favorites = run_sync(fetch_all(username, year=year))
+    fetched(favorites)
+    profiling.annotate(
+        fetched_entries=profiling.entry_count(anime)
+        + profiling.entry_count(manga)
+    )
+    return build_rewind(anime, manga, favorites, year)
+
+
+def cached_rewind(key, build):
+    """``build()``, shared between workers through the result cache, which
+    also makes concurrent misses wait for one build and serves hot users
+    stale while refreshing them; ``cache`` keeps a short-lived decoded copy
+    per process. Without the result cache, concurrent misses still share one
+    build through ``flights``."""
+    cached = cache.get(key)
+    metrics.inc("rewind_lookups", result="miss" if cached is None else "hit")
+    if cached is None:
+        results = get_result_cache()
+        if results is not None:
+            cached = results.get_or_compute(key, build)
+        else:
+            cached = flights.do(key, build)
+        cache.set(key, cached, timeout=LOCAL_TIMEOUT)
+    return cached
+
+
+def rewind_reports(username):
+    """Every year's report for ``username``, built from a single fetch so
+    switching years never goes back to AniList."""
+    return cached_rewind(rewinds_key(username), lambda: build_reports(username))
+
+
+def rewind_for(username, year):
+    """The report for ``year``. With the list store it comes from every
+    year's reports, kept up to date incrementally; without it there is
+    nothing to refresh incrementally, so only ``year`` is fetched."""
+    if get_store() is None:
+        key = rewind_key(username, year)
+        return dict(cached_rewind(key, lambda: build_year(username, year)))
+    cached = rewind_reports(username)
+    report = cached["reports"].get(year)
+    if report is None:
+        report = build_rewind(EMPTY_LIST, EMPTY_LIST, cached["favorites"], year)
+    return dict(report)
+
+
+def report_sections(report):
+    """The HTML of each section of a report's page, by name. A shareId names
+    the report's content, so the sections are cached under it and shared by
+    ``/api/report`` and the stream."""
+    key = f"report-html:{report['shareId']}"
+    sections = cache.get(key)
+    metrics.inc("report_html_lookups", result="miss" if sections is None else "hit")
+    if sections is None:
+        collage = get_thumbnail_store().prepare(report)
+        sections = render_sections(app.jinja_env, {**report, "collage": collage})
+        cache.set(key, sections, timeout=LOCAL_TIMEOUT)
+    return sections
+
+
+def report_html(report):
+    """The report page fragment of a stored report."""
+    return page_html(report_sections(report))
+
+
+@app.before_request
+def start_timing():
+    g.started = time.perf_counter()
+    if request.args.get("timing") in ("1", "true"):
+        g.timing = metrics.begin()
+
+
+@app.after_request
+def finish_timing(response):
+    """Times every request; with ``timing=1`` the spans it went through are
+    also sent back in a ``Server-Timing`` header."""
+    elapsed = time.perf_counter() - g.started
+    metrics.get_registry().observe(f"request.{request.endpoint}", elapsed)
+    token = g.pop("timing", None)
+    if token is not None:
+        timings = metrics.end(token)
+        response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+    return response
+
+
+@app.teardown_request
+def drop_timing(exc):
+    token = g.pop("timing", None)
+    if token is not None:
+        metrics.end(token)
+
+
+def profiled(view):
+    """Profile requests to ``view`` that ask for it (see ``profiling``)."""
+
+    @functools.wraps(view)
+    def run(*args, **kwargs):
+        with profiling.get_profile_store().maybe_profile(
+            view.__name__,
+            request.headers.get(profiling.PROFILE_HEADER),
+            request.args.get("username"),
+        ):
+            return view(*args, **kwargs)
+
+    return run
 
 
 @app.route("/")
@@ -62,11 +261,38 @@ def index():
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok", "message": "Server is running"}), 200
+    client = get_client()
+    return (
+        jsonify(
+            {
+                "status": "ok",
+                "message": "Server is running",
+                "anilist": client.scheduler.metrics() if client else None,
+                "cards": get_card_renderer().metrics(),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/metrics")
+def metrics_route():
+    results = get_result_cache()
+    client = get_client()
+    gauges = {
+        "result_cache": results.stats if results else {},
+        "anilist": client.scheduler.metrics() if client else {},
+        "cards": get_card_renderer().metrics(),
+        "accumulators": accumulators.stats,
+    }
+    return Response(
+        metrics.get_registry().render(gauges),
+        mimetype="text/plain; version=0.0.4",
+    )
 
 
 @app.route("/api/rewind")
-@cache.cached(timeout=3600, query_string=True)
+@profiled
 def api_rewind():
     username = request.args.get("username")
     year = request.args.get("year")
@@ -78,32 +304,97 @@ def api_rewind():
         year = datetime.utcnow().year
     else:
         year = int(year)
+    with_html = request.args.get("html") not in ("0", "false")
 
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        result = rewind_for(username, year)
+        profiling.annotate(
+            year=year,
+            anime_completed=result["overall"]["anime_completed"],
+            manga_completed=result["overall"]["manga_completed"],
+        )
 
-        anime = loop.run_until_complete(fetch_anime(username))
-        manga = loop.run_until_complete(fetch_manga(username))
-        favorites = loop.run_until_complete(fetch_favorites(username))
+        result["username"] = username
+        result["generatedAt"] = datetime.now().isoformat()
+        with metrics.span("share_store"):
+            get_share_store().put(result)
 
-        loop.close()
+        if not with_html:
+            return jsonify({"data": result})
+        return jsonify({"html": report_html(result), "data": result})
 
-        result = build_rewind(anime, manga, favorites, year)
+    except Exception as e:
+        app.logger.error(f"Error fetching data: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        share_id = hashlib.md5(
-            f"{username}-{year}-{datetime.now()}".encode()
-        ).hexdigest()[:8]
-        result["shareId"] = share_id
-        result["username"] = username
-        result["generatedAt"] = datetime.now().isoformat()
 
-        share_cache[share_id] = result
+@app.route("/api/rewind/stream")
+def api_rewind_stream():
+    """``/api/rewind`` as newline-delimited JSON: a ``status`` event listing
+    the page's sections, then one ``section`` event per section as soon as
+    its data is there (see ``sections``) and a final ``done`` (or ``error``)
+    event."""
+    username = request.args.get("username")
+    year = request.args.get("year")
 
-        html_content = render_template("report_content.html", **result)
+    if not username:
+        return jsonify({"error": "Username is required"}), 400
 
-        return jsonify({"html": html_content, "data": result})
+    year = int(year) if year else datetime.utcnow().year
+
+    def events():
+        yield event("status", stage="fetching", sections=SECTION_NAMES)
+        context = {"username": username, "year": year}
+        yield from early_events(app.jinja_env, context, STATIC_SECTIONS)
+        sent = set(STATIC_SECTIONS)
+        try:
+            for stage, value in staged(lambda: rewind_for(username, year)):
+                if stage == "fetched":
+                    context["favorites"] = value
+                    yield from early_events(app.jinja_env, context, FETCHED_SECTIONS)
+                    sent.update(FETCHED_SECTIONS)
+            result = value
+            result["username"] = username
+            result["generatedAt"] = datetime.now().isoformat()
+            result["shareId"] = share_id_for(result)
+            yield event("status", stage="rendering")
+
+            sections = report_sections(result)
+            for name in SECTION_NAMES:
+                if name not in sent and name != "outro":
+                    yield section_event(name, sections[name], result)
+            with metrics.span("share_store"):
+                get_share_store().put(result)
+            yield section_event("outro", sections["outro"], result)
+            yield event("done")
+        except Exception as e:
+            app.logger.error(f"Error streaming rewind: {e}")
+            yield event("error", error=str(e))
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="application/x-ndjson",
+        headers=NDJSON_HEADERS,
+    )
+
+
+@app.route("/api/rewind/years")
+def api_rewind_years():
+    username = request.args.get("username")
+    if not username:
+        return jsonify({"error": "Username is required"}), 400
 
+    try:
+        reports = rewind_reports(username)["reports"]
+        years = [
+            {
+                "year": year,
+                "anime_completed": report["overall"]["anime_completed"],
+                "manga_completed": report["overall"]["manga_completed"],
+            }
+            for year, report in sorted(reports.items(), reverse=True)
+        ]
+        return jsonify({"username": username, "years": years})
     except Exception as e:
         app.logger.error(f"Error fetching data: {e}")
         return jsonify({"error": str(e)}), 500
@@ -112,9 +403,43 @@ def api_rewind():
 @app.route("/api/share")
 def api_share():
     share_id = request.args.get("shareId")
-    if share_id not in share_cache:
+    data = get_share_store().get(share_id) if share_id else None
+    if data is None:
+        return jsonify({"error": "Share not found"}), 404
+    return jsonify(data)
+
+
+REPORT_HEADERS = {"Cache-Control": "public, max-age=86400"}
+
+
+@app.route("/api/report")
+def api_report():
+    share_id = request.args.get("shareId")
+    if not share_id:
         return jsonify({"error": "Share not found"}), 404
-    return jsonify(share_cache[share_id])
+
+    # Only a share that still exists is "not modified"; an evicted or
+    # unknown one is a 404 whatever the client has cached.
+    data = get_share_store().get(share_id)
+    if data is None:
+        return jsonify({"error": "Share not found"}), 404
+
+    headers = {**REPORT_HEADERS, "ETag": f'"{share_id}"'}
+    if request.if_none_match.contains_weak(share_id):
+        return Response(status=304, headers=headers)
+
+    try:
+        html = report_html(data)
+    except Exception as e:
+        app.logger.error(f"Error rendering report: {e}")
+        return jsonify({"error": str(e)}), 500
+    return Response(html, mimetype="text/html", headers=headers)
+
+
+PROXY_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Cache-Control": "public, max-age=604800, immutable",
+}
 
 
 @app.route("/api/proxy")
@@ -124,42 +449,128 @@ def proxy_image():
         return jsonify({"error": "URL is required"}), 400
 
     try:
-        import requests as req
+        image = get_image_proxy().open(url)
+    except ProxyRejected as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error proxying {url}: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        resp = req.get(url, timeout=10)
+    if image.status != 200:
         return Response(
-            resp.content,
-            mimetype=resp.headers.get("content-type"),
+            image.chunks,
+            status=image.status,
+            mimetype=image.content_type,
             headers={"Access-Control-Allow-Origin": "*"},
         )
+
+    headers = {**PROXY_HEADERS, "ETag": image.etag}
+    if request.if_none_match.contains_weak(unquote_etag(image.etag)[0]):
+        image.close()
+        return Response(status=304, headers=headers)
+    if image.cached:
+        return Response(image.body, mimetype=image.content_type, headers=headers)
+    return Response(image.chunks, mimetype=image.content_type, headers=headers)
+
+
+THUMB_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+@app.route("/api/thumbs/<name>")
+def thumbnail(name):
+    try:
+        body = get_thumbnail_store().get(name)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        app.logger.error(f"Error building thumbnail: {e}")
+        return jsonify({"error": str(e)}), 502
+    if body is None:
+        return jsonify({"error": "Thumbnail not found"}), 404
+    return Response(body, mimetype="image/webp", headers=THUMB_HEADERS)
+
+
+CARD_HEADERS = {"Cache-Control": "public, max-age=86400", "Vary": "Accept"}
 
 
 @app.route("/api/generate-card")
+@profiled
 def generate_card():
     share_id = request.args.get("shareId")
-    if not share_id or share_id not in share_cache:
+    data = get_share_store().get(share_id) if share_id else None
+    if data is None:
         return jsonify({"error": "Share not found"}), 404
+    profiling.identify(data.get("username"))
 
     try:
-        data = share_cache[share_id]
-        img = create_share_card(data)
-
-        img_io = BytesIO()
-        img.save(img_io, "PNG", quality=95)
-        img_io.seek(0)
+        fmt = negotiate_format(
+            request.headers.get("Accept"), request.args.get("format")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    preset = request.args.get("preset", "balanced")
+    preview = request.args.get("preview") in ("1", "true")
+    profiling.annotate(format=fmt, preset=preset, preview=preview)
 
-        return send_file(
-            img_io,
-            mimetype="image/png",
-            as_attachment=True,
-            download_name=f"Wrapped-{data.get('username', 'User')}-{data.get('year', 2024)}.png",
+    try:
+        renderer = get_card_renderer()
+        render = renderer.render_here if profiling.active() else renderer.render
+        with metrics.span("card"):
+            card = render(data, fmt, preset, preview)
+
+        response = send_file(
+            BytesIO(card),
+            mimetype=FORMATS[fmt][1],
+            as_attachment=not preview,
+            download_name=f"Wrapped-{data.get('username', 'User')}-{data.get('year', 2024)}.{fmt}",
         )
+        response.headers.update(CARD_HEADERS)
+        return response
+    except CardQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except CardTimeout as e:
+        return jsonify({"error": str(e)}), 504
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error generating card: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def profile_access():
+    store = profiling.get_profile_store()
+    token = request.headers.get(profiling.PROFILE_HEADER) or request.args.get("token")
+    return store if store.authorized(token) else None
+
+
+@app.route("/admin/profiles")
+def list_profiles():
+    store = profile_access()
+    if store is None:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": store.list(), **store.stats})
+
+
+@app.route("/admin/profiles/<profile_id>")
+def download_profile(profile_id):
+    """One kept profile, as ``format=speedscope`` JSON (default) or a
+    ``format=pstats`` dump."""
+    store = profile_access()
+    profile = store.get(profile_id) if store else None
+    if profile is None:
+        return jsonify({"error": "Not found"}), 404
+
+    if request.args.get("format") == "pstats":
+        return send_file(
+            BytesIO(profile.pstats()),
+            mimetype="application/octet-stream",
+            as_attachment=True,
+            download_name=f"{profile.endpoint}-{profile.id}.pstats",
+        )
+    response = jsonify(profile.speedscope())
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{profile.endpoint}-{profile.id}.speedscope.json"'
+    )
+    return response
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=2110)
@@ -0,0 +1,562 @@
+"""ASGI version of the API, served from a single event loop.
+
+AniList fetches run as coroutines on the serving loop, so a request waiting
+on AniList holds no thread; card and template rendering, aggregation and
+SQLite access run in worker threads.
+
+    uvicorn asgi:app --port 2110
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from fastapi.staticfiles import StaticFiles
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import metrics  # noqa: E402
+import profiling  # noqa: E402
+from cards import CardQueueFull, CardTimeout, get_card_renderer  # noqa: E402
+from data import fetch_all, get_client, get_store, refresh_cached  # noqa: E402
+from images import (  # noqa: E402
+    ProxyRejected,
+    etag_matches,
+    get_image_proxy,
+    get_thumbnail_store,
+    thumb_srcset,
+    thumb_url,
+)
+from results import (  # noqa: E402
+    AsyncSingleFlight,
+    get_result_cache,
+    rewind_key,
+    rewinds_key,
+)
+from rewind import AccumulatorCache, build_rewind, build_rewind_multi  # noqa: E402
+from sections import (  # noqa: E402
+    FETCHED_SECTIONS,
+    NDJSON_HEADERS,
+    SECTION_NAMES,
+    STATIC_SECTIONS,
+    astaged,
+    early_events,
+    event,
+    fetched,
+    page_html,
+    render_sections,
+    section_event,
+)
+from shares import get_share_store, share_id_for  # noqa: E402
+from share_card import FORMATS, negotiate_format  # noqa: E402
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EMPTY_LIST = []
+REPORT_HTML_ITEMS = 256
+PROXY_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Cache-Control": "public, max-age=604800, immutable",
+}
+
+
+def url_for(endpoint, filename=None):
+    return f"/{endpoint}/{filename}"
+
+
+templates = Environment(
+    loader=FileSystemLoader(os.path.join(ROOT, "templates")),
+    autoescape=select_autoescape(["html"]),
+)
+templates.globals.update(url_for=url_for, thumb=thumb_url, thumb_srcset=thumb_srcset)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await get_client().aclose()
+    await get_image_proxy().aclose()
+    get_card_renderer().shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/static", StaticFiles(directory=os.path.join(ROOT, "static")), name="static")
+
+flights = AsyncSingleFlight()
+accumulators = AccumulatorCache()
+report_fragments = OrderedDict()
+report_fragments_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+async def build_reports(username):
+    store = await asyncio.to_thread(get_store)
+    if store is None:
+        with metrics.span("fetch"):
+            anime, manga, favorites = await fetch_all(username)
+        fetched(favorites)
+        profiling.annotate(
+            fetched_entries=profiling.entry_count(anime)
+            + profiling.entry_count(manga)
+        )
+        reports = await asyncio.to_thread(build_rewind_multi, anime, manga, favorites)
+        return {"favorites": favorites, "reports": reports}
+    with metrics.span("fetch"):
+        refresh = await refresh_cached(username)
+    fetched(refresh.favorites)
+    profiling.annotate(
+        refresh=refresh.mode,
+        fetched_entries=profiling.entry_count(refresh.anime)
+        + profiling.entry_count(refresh.manga),
+    )
+    return await asyncio.to_thread(accumulators.build, username, refresh, store.load)
+
+
+async def build_year(username, year):
+    with metrics.span("fetch"):
+        anime, manga, favorites = await fetch_all(username, year=year)
+    fetched(favorites)
+    profiling.annotate(
+        fetched_entries=profiling.entry_count(anime)
+        + profiling.entry_count(manga)
+    )
+    return await asyncio.to_thread(build_rewind, anime, manga, favorites, year)
+
+
+async def cached_rewind(key, build):
+    results = get_result_cache()
+    if results is not None:
+        return await results.aget_or_compute(key, build)
+    return await flights.do(key, build)
+
+
+async def rewind_reports(username):
+    return await cached_rewind(rewinds_key(username), lambda: build_reports(username))
+
+
+async def rewind_for(username, year):
+    if await asyncio.to_thread(get_store) is None:
+        # Without the list store nothing is refreshed incrementally, so only
+        # the year asked for is fetched.
+        key = rewind_key(username, year)
+        return dict(await cached_rewind(key, lambda: build_year(username, year)))
+    cached = await rewind_reports(username)
+    report = cached["reports"].get(year)
+    if report is None:
+        report = await asyncio.to_thread(
+            build_rewind, EMPTY_LIST, EMPTY_LIST, cached["favorites"], year
+        )
+    return dict(report)
+
+
+def render(name, **context):
+    return templates.get_template(name).render(**context)
+
+
+def cached_fragment(share_id):
+    """The cached section HTML for ``share_id``, marked as recently used.
+    Sections are rendered in worker threads, so the LRU is locked."""
+    with report_fragments_lock:
+        sections = report_fragments.get(share_id)
+        if sections is not None:
+            report_fragments.move_to_end(share_id)
+    return sections
+
+
+def report_sections(report):
+    """The HTML of each section of a report's page, by name. A shareId names
+    the report's content, so the sections are cached under it and shared by
+    ``/api/report`` and the stream."""
+    share_id = report["shareId"]
+    sections = cached_fragment(share_id)
+    metrics.inc("report_html_lookups", result="miss" if sections is None else "hit")
+    if sections is None:
+        collage = get_thumbnail_store().prepare(report)
+        sections = render_sections(templates, {**report, "collage": collage})
+        with report_fragments_lock:
+            report_fragments[share_id] = sections
+            while len(report_fragments) > REPORT_HTML_ITEMS:
+                report_fragments.popitem(last=False)
+    return sections
+
+
+def report_html(report):
+    """The report page fragment of a stored report."""
+    return page_html(report_sections(report))
+
+
+@app.middleware("http")
+async def timing(request: Request, call_next):
+    """Times every request; with ``timing=1`` the spans it went through are
+    also sent back in a ``Server-Timing`` header."""
+    start = time.perf_counter()
+    if request.query_params.get("timing") in ("1", "true"):
+        with metrics.collect() as timings:
+            response = await call_next(request)
+    else:
+        timings = None
+        response = await call_next(request)
+
+    elapsed = time.perf_counter() - start
+    endpoint = getattr(request.scope.get("endpoint"), "__name__", None)
+    metrics.get_registry().observe(f"request.{endpoint}", elapsed)
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+    return response
+
+
+PROFILED = {"/api/rewind": "api_rewind", "/api/generate-card": "generate_card"}
+
+
+def serving_threads():
+    """The event loop's thread and the ``asyncio.to_thread`` workers: where
+    a request's work runs, along with that of any concurrent requests."""
+    loop_thread = threading.get_ident()
+
+    def threads():
+        workers = [t for t in threading.enumerate() if t.name.startswith("asyncio_")]
+        return [loop_thread, *(t.ident for t in workers)]
+
+    return threads
+
+
+@app.middleware("http")
+async def profile(request: Request, call_next):
+    """Profile requests to ``PROFILED`` routes that ask for it (see
+    ``profiling``)."""
+    endpoint = PROFILED.get(request.url.path)
+    if endpoint is None:
+        return await call_next(request)
+    with profiling.get_profile_store().maybe_profile(
+        endpoint,
+        request.headers.get(profiling.PROFILE_HEADER),
+        request.query_params.get("username"),
+        serving_threads(),
+    ):
+        return await call_next(request)
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index():
+    return await asyncio.to_thread(render, "index.html")
+
+
+@app.get("/health")
+async def health():
+    client = get_client()
+    return {
+        "status": "ok",
+        "message": "Server is running",
+        "anilist": client.scheduler.metrics() if client else None,
+        "cards": get_card_renderer().metrics(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_route():
+    results = get_result_cache()
+    client = get_client()
+    gauges = {
+        "result_cache": results.stats if results else {},
+        "anilist": client.scheduler.metrics() if client else {},
+        "cards": get_card_renderer().metrics(),
+        "accumulators": accumulators.stats,
+    }
+    return PlainTextResponse(
+        metrics.get_registry().render(gauges),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/api/rewind")
+async def api_rewind(username: str = None, year: int = None, html: bool = True):
+    if not username:
+        return error("Username is required", 400)
+    if not year:
+        year = datetime.utcnow().year
+
+    try:
+        result = await rewind_for(username, year)
+        profiling.annotate(
+            year=year,
+            anime_completed=result["overall"]["anime_completed"],
+            manga_completed=result["overall"]["manga_completed"],
+        )
+        result["username"] = username
+        result["generatedAt"] = datetime.now().isoformat()
+        with metrics.span("share_store"):
+            await asyncio.to_thread(get_share_store().put, result)
+
+        if not html:
+            return JSONResponse({"data": result})
+        html_content = await asyncio.to_thread(report_html, result)
+        return JSONResponse({"html": html_content, "data": result})
+    except Exception as e:
+        logger.exception("Error fetching data")
+        return error(str(e), 500)
+
+
+@app.get("/api/rewind/stream")
+async def api_rewind_stream(username: str = None, year: int = None):
+    """The report's page as newline-delimited JSON, each section as soon as
+    its data is there (see ``sections``)."""
+    if not username:
+        return error("Username is required", 400)
+    if not year:
+        year = datetime.utcnow().year
+
+    def early(context, names):
+        events = early_events(templates, context, names)
+        return asyncio.to_thread(lambda: "".join(events))
+
+    async def events():
+        yield event("status", stage="fetching", sections=SECTION_NAMES)
+        context = {"username": username, "year": year}
+        yield await early(context, STATIC_SECTIONS)
+        sent = set(STATIC_SECTIONS)
+        try:
+            async for stage, value in astaged(lambda: rewind_for(username, year)):
+                if stage == "fetched":
+                    context["favorites"] = value
+                    yield await early(context, FETCHED_SECTIONS)
+                    sent.update(FETCHED_SECTIONS)
+            result = value
+            result["username"] = username
+            result["generatedAt"] = datetime.now().isoformat()
+            result["shareId"] = share_id_for(result)
+            yield event("status", stage="rendering")
+
+            sections = await asyncio.to_thread(report_sections, result)
+            for name in SECTION_NAMES:
+                if name not in sent and name != "outro":
+                    yield section_event(name, sections[name], result)
+            with metrics.span("share_store"):
+                await asyncio.to_thread(get_share_store().put, result)
+            yield section_event("outro", sections["outro"], result)
+            yield event("done")
+        except Exception as e:
+            logger.exception("Error streaming rewind")
+            yield event("error", error=str(e))
+
+    return StreamingResponse(
+        events(), media_type="application/x-ndjson", headers=NDJSON_HEADERS
+    )
+
+
+@app.get("/api/rewind/years")
+async def api_rewind_years(username: str = None):
+    if not username:
+        return error("Username is required", 400)
+
+    try:
+        reports = (await rewind_reports(username))["reports"]
+        years = [
+            {
+                "year": year,
+                "anime_completed": report["overall"]["anime_completed"],
+                "manga_completed": report["overall"]["manga_completed"],
+            }
+            for year, report in sorted(reports.items(), reverse=True)
+        ]
+        return {"username": username, "years": years}
+    except Exception as e:
+        logger.exception("Error fetching data")
+        return error(str(e), 500)
+
+
+@app.get("/api/share")
+async def api_share(shareId: str = None):
+    data = await asyncio.to_thread(get_share_store().get, shareId) if shareId else None
+    if data is None:
+        return error("Share not found", 404)
+    return JSONResponse(data)
+
+
+REPORT_HEADERS = {"Cache-Control": "public, max-age=86400"}
+
+
+@app.get("/api/report")
+async def api_report(request: Request, shareId: str = None):
+    if not shareId:
+        return error("Share not found", 404)
+
+    # Only a share that still exists is "not modified"; an evicted or
+    # unknown one is a 404 whatever the client has cached.
+    data = await asyncio.to_thread(get_share_store().get, shareId)
+    if data is None:
+        return error("Share not found", 404)
+
+    headers = {**REPORT_HEADERS, "ETag": f'"{shareId}"'}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        html = await asyncio.to_thread(report_html, data)
+    except Exception as e:
+        logger.exception("Error rendering report")
+        return error(str(e), 500)
+    return HTMLResponse(html, headers=headers)
+
+
+@app.get("/api/proxy")
+async def proxy_image(request: Request, url: str = None):
+    if not url:
+        return error("URL is required", 400)
+
+    try:
+        image = await get_image_proxy().aopen(url)
+    except ProxyRejected as e:
+        return error(str(e), 400)
+    except Exception as e:
+        logger.exception("Error proxying %s", url)
+        return error(str(e), 500)
+
+    if image.status != 200:
+        return StreamingResponse(
+            image.chunks,
+            status_code=image.status,
+            media_type=image.content_type,
+            headers={"Access-Control-Allow-Origin": "*"},
+        )
+
+    headers = {**PROXY_HEADERS, "ETag": image.etag}
+    if etag_matches(request.headers.get("if-none-match"), image.etag):
+        await image.aclose()
+        return Response(status_code=304, headers=headers)
+    if image.cached:
+        return Response(image.body, media_type=image.content_type, headers=headers)
+    return StreamingResponse(
+        image.chunks, media_type=image.content_type, headers=headers
+    )
+
+
+THUMB_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+@app.get("/api/thumbs/{name}")
+async def thumbnail(name: str):
+    try:
+        body = await asyncio.to_thread(get_thumbnail_store().get, name)
+    except Exception as e:
+        logger.exception("Error building thumbnail")
+        return error(str(e), 502)
+    if body is None:
+        return error("Thumbnail not found", 404)
+    return Response(body, media_type="image/webp", headers=THUMB_HEADERS)
+
+
+CARD_HEADERS = {"Cache-Control": "public, max-age=86400", "Vary": "Accept"}
+
+
+@app.get("/api/generate-card")
+async def generate_card(
+    request: Request,
+    shareId: str = None,
+    format: str = None,
+    preset: str = "balanced",
+    preview: bool = False,
+):
+    data = await asyncio.to_thread(get_share_store().get, shareId) if shareId else None
+    if data is None:
+        return error("Share not found", 404)
+    profiling.identify(data.get("username"))
+
+    try:
+        fmt = negotiate_format(request.headers.get("accept"), format)
+    except ValueError as e:
+        return error(str(e), 400)
+    profiling.annotate(format=fmt, preset=preset, preview=preview)
+
+    try:
+        renderer = get_card_renderer()
+        with metrics.span("card"):
+            if profiling.active():
+                card = await asyncio.to_thread(
+                    renderer.render_here, data, fmt, preset, preview
+                )
+            else:
+                card = await renderer.arender(data, fmt, preset, preview)
+        filename = (
+            f"Wrapped-{data.get('username', 'User')}-{data.get('year', 2024)}.{fmt}"
+        )
+        disposition = "inline" if preview else "attachment"
+        return Response(
+            card,
+            media_type=FORMATS[fmt][1],
+            headers={
+                **CARD_HEADERS,
+                "Content-Disposition": f'{disposition}; filename="{filename}"',
+            },
+        )
+    except CardQueueFull as e:
+        return JSONResponse({"error": str(e)}, 503, {"Retry-After": "1"})
+    except CardTimeout as e:
+        return error(str(e), 504)
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        logger.exception("Error generating card")
+        return error(str(e), 500)
+
+
+def profile_access(request, token):
+    store = profiling.get_profile_store()
+    token = request.headers.get(profiling.PROFILE_HEADER) or token
+    return store if store.authorized(token) else None
+
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request, token: str = None):
+    store = profile_access(request, token)
+    if store is None:
+        return error("Not found", 404)
+    return {"profiles": store.list(), **store.stats}
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    request: Request, profile_id: str, format: str = None, token: str = None
+):
+    store = profile_access(request, token)
+    profile = store.get(profile_id) if store else None
+    if profile is None:
+        return error("Not found", 404)
+
+    name = f"{profile.endpoint}-{profile.id}"
+    if format == "pstats":
+        return Response(
+            profile.pstats(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{name}.pstats"'},
+        )
+    return JSONResponse(
+        profile.speedscope(),
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.speedscope.json"'
+        },
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=2110)
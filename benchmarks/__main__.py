@@ -0,0 +1,71 @@
+"""Run the benchmark suite and save every result in one JSON file.
+
+Each benchmark runs in its own process with fixed arguments, so two runs on
+the same machine measure the same work; compare them with
+``python -m benchmarks.compare``.
+
+    python -m benchmarks --out benchmarks/results/$(git rev-parse --short HEAD).json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import report  # noqa: E402
+
+SUITE = {
+    "rewind": ("bench_rewind", ["--entries", "2000", "--latency", "0.1"]),
+    "aggregate-10": ("bench_aggregate", ["--entries", "10", "--rounds", "20"]),
+    "aggregate-1000": ("bench_aggregate", ["--entries", "1000"]),
+    "aggregate-20000": ("bench_aggregate", ["--entries", "20000", "--rounds", "3"]),
+    "memory": ("bench_memory", ["--entries", "5000"]),
+    "share_card": ("bench_share_card", ["--rounds", "10"]),
+    "proxy": ("bench_proxy", ["--latency", "0.1", "--requests", "30"]),
+}
+
+
+def run(module, args, path):
+    subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{module}", *args, "--json", path],
+        cwd=report.ROOT,
+        check=True,
+    )
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", help="default: benchmarks/results/COMMIT.json")
+    parser.add_argument(
+        "--only", action="append", choices=SUITE, help="run only these benchmarks"
+    )
+    args = parser.parse_args()
+
+    environment = report.environment()
+    out = args.out or os.path.join(
+        report.ROOT, "benchmarks", "results", f"{environment['commit']}.json"
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.only or SUITE:
+            module, bench_args = SUITE[name]
+            print(f"== {name}", flush=True)
+            document = run(module, bench_args, os.path.join(tmp, f"{name}.json"))
+            results[name] = {"args": document["args"], "results": document["results"]}
+
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment, "benchmarks": results}, f, indent=2)
+        f.write("\n")
+    print(f"saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Aggregation time on synthetic lists: the original loop-based build_rewind
+over AniList's dicts vs. the columnar engine over decoded entries, for one
+year and for every year, and refreshing every year's report after one
+changed entry with a RewindAccumulator.
+
+    python -m benchmarks.bench_aggregate --entries 10000
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import report  # noqa: E402
+from benchmarks.reference_rewind import build_rewind_reference  # noqa: E402
+from benchmarks.stub_server import sample_collection  # noqa: E402
+from data.entries import entry_list  # noqa: E402
+from rewind import RewindAccumulator, build_rewind, build_rewind_multi  # noqa: E402
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--rounds", type=int, default=5)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    anime = {"lists": sample_collection(args.entries, seed=1)}
+    manga = {"lists": sample_collection(args.entries, seed=2)}
+    favorites = {"characters": [], "staff": []}
+    years = range(2016, 2026)
+    anime_entries, manga_entries = entry_list(anime), entry_list(manga)
+
+    accumulator = RewindAccumulator(anime_entries, manga_entries, favorites)
+    changed = copy.copy(anime_entries[0])
+
+    def one_change():
+        changed.progress += 1
+        accumulator.apply([changed], [], favorites)
+        return accumulator.reports()
+
+    cases = {
+        "one year, reference": lambda: build_rewind_reference(
+            anime, manga, favorites, args.year
+        ),
+        "one year, columnar": lambda: build_rewind(
+            anime_entries, manga_entries, favorites, args.year
+        ),
+        "all years, reference": lambda: [
+            build_rewind_reference(anime, manga, favorites, y) for y in years
+        ],
+        "all years, columnar": lambda: build_rewind_multi(
+            anime_entries, manga_entries, favorites
+        ),
+        "one change, incremental": one_change,
+    }
+
+    print(f"{args.entries} anime + {args.entries} manga entries")
+    results = {}
+    for name, fn in cases.items():
+        elapsed = timed(fn, args.rounds)
+        results[name] = {"ms": elapsed * 1000}
+        print(f"{name:24} {elapsed * 1000:8.1f} ms")
+    report.save(args.json, "aggregate", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Share card latency against a slow local image CDN.
+
+Compares the original sequential, uncached cover downloads with the cover
+fetch service: cold (parallel), warm (memory), after a restart (disk), and
+many concurrent cards for the same covers (coalesced).
+
+    python -m benchmarks.bench_covers --latency 0.3 --concurrent 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import share_card  # noqa: E402
+from benchmarks.bench_share_card import sample_card  # noqa: E402
+from benchmarks.reference_share_card import create_share_card_reference  # noqa: E402
+from benchmarks.stub_server import StubImages  # noqa: E402
+from images import CoverFetcher, set_cover_fetcher  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--concurrent", type=int, default=20)
+    args = parser.parse_args()
+
+    share_card.preload()
+    with StubImages(latency=args.latency) as cdn, tempfile.TemporaryDirectory() as tmp:
+        data = sample_card()
+        data["overall"]["best_anime"]["cover_image"] = f"{cdn.url}/anime.jpg"
+        data["overall"]["best_manga"]["cover_image"] = f"{cdn.url}/manga.jpg"
+
+        def card():
+            return share_card.create_share_card(data)
+
+        def report(name, elapsed, requests):
+            print(f"{name:24} {elapsed * 1000:8.1f} ms  {requests} CDN requests")
+
+        before = cdn.requests
+        report(
+            "original, sequential",
+            timed(lambda: create_share_card_reference(data)),
+            cdn.requests - before,
+        )
+
+        set_cover_fetcher(CoverFetcher(cache_dir=tmp))
+        before = cdn.requests
+        report("cold, parallel", timed(card), cdn.requests - before)
+        before = cdn.requests
+        report("warm, memory", timed(card), cdn.requests - before)
+
+        set_cover_fetcher(CoverFetcher(cache_dir=tmp))
+        before = cdn.requests
+        report("restart, disk", timed(card), cdn.requests - before)
+
+        set_cover_fetcher(CoverFetcher(cache_dir=None))
+        before = cdn.requests
+        with ThreadPoolExecutor(args.concurrent) as pool:
+            latencies = list(pool.map(lambda _: timed(card), range(args.concurrent)))
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        report(f"{args.concurrent} concurrent, p95", p95, cdn.requests - before)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Share card encoding: time and size of every format/preset pair, against the
+original ``img.save(img_io, "PNG", quality=95)``. Cards are rendered once with
+locally generated covers so only encoding is measured.
+
+    python -m benchmarks.bench_encode --rounds 5
+"""
+
+import argparse
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import share_card  # noqa: E402
+from images import CoverFetcher, set_cover_fetcher  # noqa: E402
+from benchmarks.bench_share_card import local_cover, sample_card, timed  # noqa: E402
+
+
+def original_encode(img):
+    img_io = BytesIO()
+    img.save(img_io, "PNG", quality=95)
+    return img_io.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    set_cover_fetcher(CoverFetcher(cache_dir=None, loader=local_cover))
+    share_card.preload()
+    sparse = sample_card()
+    dense = sample_card()
+    dense["overall"]["top_genres"] = dict.fromkeys(
+        ["Action", "Adventure", "Drama", "Fantasy", "Mystery", "Supernatural"], 1
+    )
+    dense["persona"]["title"] = "The Completionist"
+    cards = {
+        "sparse": share_card.create_share_card(sparse),
+        "dense": share_card.create_share_card(dense),
+    }
+
+    print(f"{'card':8} {'format':6} {'preset':9} {'variant':8} {'ms':>8} {'KiB':>8}")
+    for name, img in cards.items():
+        seconds = timed(lambda: original_encode(img), args.rounds)
+        size = len(original_encode(img))
+        print(
+            f"{name:8} {'png':6} {'original':9} {'full':8} "
+            f"{seconds * 1000:8.1f} {size / 1024:8.1f}"
+        )
+        for fmt in share_card.FORMATS:
+            for preset in share_card.PRESETS:
+                for preview in (False, True):
+                    encode = lambda: share_card.encode_card(  # noqa: E731
+                        img, fmt, preset, preview
+                    )
+                    seconds = timed(encode, args.rounds)
+                    size = len(encode())
+                    variant = "preview" if preview else "full"
+                    print(
+                        f"{name:8} {fmt:6} {preset:9} {variant:8} "
+                        f"{seconds * 1000:8.1f} {size / 1024:8.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
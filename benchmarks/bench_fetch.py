@@ -0,0 +1,87 @@
+"""Cold rewind fetch latency and round trips per rewind.
+
+Compares the original sequential per-query clients, the three queries
+gathered over the shared pooled client, and the single combined query.
+
+    python -m benchmarks.bench_fetch --latency 0.2 --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import StubAniList  # noqa: E402
+from data import AniListClient, fetch_all, run_sync  # noqa: E402
+from data import fetch_anime, fetch_favorites, fetch_manga  # noqa: E402
+from data.anime import ANIME_QUERY  # noqa: E402
+from data.favorites import FAVORITES_QUERY  # noqa: E402
+from data.manga import MANGA_QUERY  # noqa: E402
+
+
+async def fetch_sequential(url, username):
+    results = []
+    for query in (ANIME_QUERY, MANGA_QUERY, FAVORITES_QUERY):
+        async with httpx.AsyncClient() as client:
+            r = await client.post(
+                url, json={"query": query, "variables": {"username": username}}
+            )
+            r.raise_for_status()
+            results.append(r.json()["data"])
+    return results
+
+
+async def fetch_gathered(client, username):
+    return await asyncio.gather(
+        fetch_anime(username, client),
+        fetch_manga(username, client),
+        fetch_favorites(username, client),
+    )
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    strategies = {
+        "sequential": lambda stub, client: fetch_sequential(stub.url, "bench"),
+        "gathered, pooled": lambda stub, client: fetch_gathered(client, "bench"),
+        "combined query": lambda stub, client: fetch_all("bench", client),
+    }
+
+    print(f"upstream latency {args.latency * 1000:.1f} ms, {args.rounds} rewinds")
+    baseline = None
+    with StubAniList(latency=args.latency) as stub:
+        for name, strategy in strategies.items():
+            client = AniListClient(url=stub.url)
+            requests, connections = stub.requests, stub.connections
+            elapsed = timed(lambda: run_sync(strategy(stub, client)), args.rounds)
+            run_sync(client.aclose())
+            baseline = baseline or elapsed
+            print(
+                f"{name:18} {elapsed * 1000:8.1f} ms"
+                f"  {baseline / elapsed:5.2f}x"
+                f"  {(stub.requests - requests) / args.rounds:.0f} requests/rewind"
+                f"  {stub.connections - connections} connections"
+            )
+
+
+if __name__ == "__main__":
+    main()
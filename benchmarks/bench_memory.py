@@ -0,0 +1,89 @@
+"""Memory per rewind: peak traced allocation while decoding a full-list
+response and aggregating it, and what the decoded lists keep alive, with
+AniList's nested dicts vs. compact entries.
+
+    python -m benchmarks.bench_memory --entries 5000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import report  # noqa: E402
+from benchmarks.stub_server import StubAniList  # noqa: E402
+from data import AniListClient, decode, fetch_all, run_sync  # noqa: E402
+from rewind import build_rewind_multi  # noqa: E402
+
+
+def response_body(entries):
+    """The body AniList would send for a full rewind query."""
+    with StubAniList(latency=0, entries=entries) as stub:
+        client = AniListClient(url=stub.url)
+        stub.record = True
+        run_sync(fetch_all("bench", client))
+        run_sync(client.aclose())
+    return stub.bodies[-1]
+
+
+def measure(fn):
+    """Peak traced bytes while ``fn`` runs, the bytes and blocks still
+    allocated once it returns (held by its result), and its untraced time."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+    del result
+    return {
+        "peak_mib": peak / 2**20,
+        "retained_mib": retained / 2**20,
+        "blocks": blocks,
+        "ms": elapsed * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5000)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    body = response_body(args.entries)
+
+    def rewind():
+        data = decode(body)["data"]
+        return build_rewind_multi(data["anime"], data["manga"], {})
+
+    cases = {
+        "decode, dicts": lambda: json.loads(body),
+        "decode, entries": lambda: decode(body),
+        "decode and aggregate": rewind,
+    }
+
+    print(f"{args.entries} entries per list, {len(body) / 1024:.0f} KiB response")
+    results = {}
+    for name, fn in cases.items():
+        results[name] = measure(fn)
+        r = results[name]
+        print(
+            f"{name:22} peak {r['peak_mib']:6.1f} MiB"
+            f"  retained {r['retained_mib']:6.1f} MiB {r['blocks']:8} blocks"
+            f"  {r['ms']:7.1f} ms"
+        )
+    report.save(args.json, "memory", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Upstream payload size and JSON decode time per rewind: full list download
+vs. the year-scoped fetch.
+
+    python -m benchmarks.bench_payload --entries 5000 --year 2024
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import StubAniList  # noqa: E402
+from data import AniListClient, decode, fetch_all, run_sync  # noqa: E402
+from rewind import build_rewind  # noqa: E402
+
+
+def measure(stub, client, username, year, scoped):
+    stub.bodies.clear()
+    stub.record = True
+    sent = stub.bytes_sent
+    anime, manga, favorites = run_sync(
+        fetch_all(username, client, year=year if scoped else None)
+    )
+    stub.record = False
+
+    start = time.perf_counter()
+    for body in stub.bodies:
+        decode(body)
+    decoding = time.perf_counter() - start
+
+    report = build_rewind(anime, manga, favorites, year)
+    return stub.bytes_sent - sent, len(stub.bodies), decoding, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--year", type=int, default=2024)
+    args = parser.parse_args()
+
+    with StubAniList(latency=0, entries=args.entries) as stub:
+        client = AniListClient(url=stub.url)
+        full = measure(stub, client, "bench", args.year, scoped=False)
+        scoped = measure(stub, client, "bench", args.year, scoped=True)
+        run_sync(client.aclose())
+
+    for name, (size, requests, decode, _) in (("full", full), ("year", scoped)):
+        print(
+            f"{name:5} {size / 1024:9.1f} KiB  {requests} requests"
+            f"  decode {decode * 1000:7.2f} ms"
+        )
+    print(f"size reduction {full[0] / scoped[0]:.1f}x")
+    print(f"same overall stats: {full[3]['overall'] == scoped[3]['overall']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""``/api/proxy`` latency against a slow local image CDN.
+
+Compares the original uncached proxy (one full upstream download per
+request) with the caching proxy: cold (streamed), warm (memory), after a
+restart (disk), and a browser revalidating with ``If-None-Match``.
+
+    python -m benchmarks.bench_proxy --latency 0.3 --requests 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from benchmarks import report  # noqa: E402
+from benchmarks.stub_server import StubImages  # noqa: E402
+from images import ImageProxy, set_image_proxy  # noqa: E402
+
+
+def original(url):
+    resp = requests.get(url, timeout=10)
+    return resp.content
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--requests", type=int, default=50)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    results = {}
+    with StubImages(latency=args.latency) as cdn, tempfile.TemporaryDirectory() as tmp:
+        urls = [f"{cdn.url}/cover/{i % 10}.jpg" for i in range(args.requests)]
+        cdn_host = urlsplit(cdn.url).hostname
+
+        def run(name, fetch):
+            before = cdn.requests
+            start = time.perf_counter()
+            for url in urls:
+                fetch(url)
+            elapsed = (time.perf_counter() - start) / len(urls)
+            results[name] = {
+                "ms_per_request": elapsed * 1000,
+                "cdn_requests": cdn.requests - before,
+            }
+            print(
+                f"{name:24} {elapsed * 1000:8.1f} ms/request"
+                f"  {cdn.requests - before} CDN requests"
+            )
+
+        def proxied(url, **headers):
+            r = client.get("/api/proxy", query_string={"url": url}, headers=headers)
+            return r.status_code, r.headers.get("ETag"), r.data
+
+        run("original, uncached", original)
+
+        set_image_proxy(ImageProxy(cache_dir=tmp, allowed_hosts=[cdn_host]))
+        run("cold then memory", proxied)
+
+        set_image_proxy(ImageProxy(cache_dir=tmp, allowed_hosts=[cdn_host]))
+        run("restart, disk", proxied)
+
+        etags = {url: proxied(url)[1] for url in set(urls)}
+        run(
+            "revalidate, 304",
+            lambda url: proxied(url, **{"If-None-Match": etags[url]}),
+        )
+    report.save(args.json, "proxy", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""End-to-end ``/api/rewind`` latency against the stub AniList API and CDN.
+
+Goes through the Flask app with fresh SQLite list, result and share stores:
+a user seen for the first time (fetch, aggregate, render), the same user
+again (per-process cache), from another worker (result cache only), and
+the data-only variant.
+
+    python -m benchmarks.bench_rewind --entries 2000 --latency 0.1
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as server  # noqa: E402
+from benchmarks import report  # noqa: E402
+from benchmarks.stub_server import StubAniList, StubImages  # noqa: E402
+from data import AniListClient, ListStore, set_store  # noqa: E402
+from data.client import set_client  # noqa: E402
+from images import ThumbnailStore, set_thumbnail_store  # noqa: E402
+from results import ResultCache, set_result_cache  # noqa: E402
+from shares import SQLiteShareStore, set_share_store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--image-latency", type=float, default=0.05)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--rounds", type=int, default=5)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    client = server.app.test_client()
+    users = (f"bench{i}" for i in itertools.count())
+    results = {}
+
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        StubImages(latency=args.image_latency) as cdn,
+        StubAniList(
+            latency=args.latency, entries=args.entries, image_url=cdn.url
+        ) as stub,
+    ):
+        set_client(AniListClient(url=stub.url))
+        set_store(ListStore(os.path.join(tmp, "lists.sqlite3")))
+        set_result_cache(ResultCache(os.path.join(tmp, "results.sqlite3")))
+        set_share_store(SQLiteShareStore(os.path.join(tmp, "shares.sqlite3")))
+        set_thumbnail_store(ThumbnailStore(cache_dir=os.path.join(tmp, "thumbs")))
+
+        def rewind(username, **params):
+            r = client.get(
+                "/api/rewind",
+                query_string={"username": username, "year": args.year, **params},
+            )
+            assert r.status_code == 200, r.get_json()
+            return len(r.data)
+
+        def run(name, prepare, **params):
+            samples = []
+            for _ in range(args.rounds):
+                username = prepare()
+                requests = stub.requests
+                start = time.perf_counter()
+                size = rewind(username, **params)
+                samples.append(time.perf_counter() - start)
+            elapsed = statistics.median(samples)
+            results[name] = {
+                "ms": elapsed * 1000,
+                "upstream_requests": stub.requests - requests,
+                "response_kib": size / 1024,
+            }
+            print(
+                f"{name:22} {elapsed * 1000:8.1f} ms"
+                f"  {stub.requests - requests} upstream requests"
+                f"  {size / 1024:7.1f} KiB"
+            )
+
+        def seen():
+            username = next(users)
+            rewind(username)
+            return username
+
+        def other_worker():
+            username = seen()
+            server.cache.clear()
+            return username
+
+        print(f"{args.entries} entries per list, {args.latency * 1000:.0f} ms upstream")
+        run("first visit", lambda: next(users))
+        run("first visit, data only", lambda: next(users), html=0)
+        run("repeat visit", seen)
+        run("other worker", other_worker)
+
+    report.save(args.json, "rewind", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Sustained throughput against a rate-limited stub.
+
+Fires a burst of rewinds at a stub that allows ``--limit`` requests per
+``--window`` seconds and reports achieved vs. maximal throughput and how many
+requests were answered with 429.
+
+    python -m benchmarks.bench_scheduler --limit 30 --window 5 --rewinds 90
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import StubAniList  # noqa: E402
+from data import AniListClient, fetch_all, run_sync  # noqa: E402
+from data.scheduler import RequestScheduler, TokenBucket  # noqa: E402
+
+
+async def burst(client, rewinds):
+    return await asyncio.gather(
+        *(fetch_all(f"user{i}", client) for i in range(rewinds)),
+        return_exceptions=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--window", type=float, default=5.0)
+    parser.add_argument("--rewinds", type=int, default=90)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with StubAniList(
+        latency=args.latency, rate_limit=args.limit, window=args.window
+    ) as stub:
+        scheduler = RequestScheduler(
+            bucket=TokenBucket(capacity=args.limit, period=args.window)
+        )
+        client = AniListClient(url=stub.url, scheduler=scheduler)
+
+        start = time.perf_counter()
+        results = run_sync(burst(client, args.rewinds))
+        elapsed = time.perf_counter() - start
+        run_sync(client.aclose())
+
+    failed = sum(isinstance(r, Exception) for r in results)
+    ideal = max(0.0, (args.rewinds - args.limit) / args.limit * args.window)
+    print(f"rewinds             {args.rewinds} ({failed} failed)")
+    print(f"elapsed             {elapsed:.2f} s (ideal {ideal:.2f} s)")
+    print(f"throughput          {args.rewinds / elapsed:.2f} req/s")
+    print(f"maximal throughput  {args.limit / args.window:.2f} req/s")
+    print(f"429 responses       {stub.throttled}")
+    print(f"scheduler           {scheduler.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Share card render time: the original per-scanline gradient and per-call
+font loading vs. the cached render assets. Covers are generated locally so
+only rendering is measured; the cached path also reuses resized covers.
+
+    python -m benchmarks.bench_share_card --rounds 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import share_card  # noqa: E402
+from images import CoverFetcher, set_cover_fetcher  # noqa: E402
+from benchmarks import reference_share_card, report  # noqa: E402
+from benchmarks.reference_share_card import create_share_card_reference  # noqa: E402
+
+
+def local_cover(url):
+    return Image.new("RGB", (460, 650), color=(hash(url) % 255, 90, 140))
+
+
+def sample_card():
+    return {
+        "username": "bench",
+        "year": 2024,
+        "persona": {"title": "The Futurist"},
+        "overall": {
+            "anime_completed": 120,
+            "episodes_watched": 1500,
+            "manga_completed": 40,
+            "chapters_read": 2200,
+            "best_anime": {"cover_image": "anime.jpg"},
+            "best_manga": {"cover_image": "manga.jpg"},
+            "top_genres": dict.fromkeys(
+                ["Action", "Drama", "Sci-Fi", "Romance", "Comedy", "Slice of Life"], 1
+            ),
+        },
+    }
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=10)
+    report.add_json_argument(parser)
+    args = parser.parse_args()
+
+    set_cover_fetcher(CoverFetcher(cache_dir=None, loader=local_cover))
+    reference_share_card.download_image = local_cover
+    data = sample_card()
+
+    start = time.perf_counter()
+    share_card.preload()
+    warmup = time.perf_counter() - start
+
+    reference = timed(lambda: create_share_card_reference(data), args.rounds)
+    cached = timed(lambda: share_card.create_share_card(data), args.rounds)
+    same = not ImageChops.difference(
+        create_share_card_reference(data), share_card.create_share_card(data)
+    ).getbbox()
+
+    print(f"asset preload      {warmup * 1000:8.1f} ms (once per process)")
+    print(f"reference render   {reference * 1000:8.1f} ms")
+    print(f"cached assets      {cached * 1000:8.1f} ms")
+    print(f"speedup            {reference / cached:8.2f}x")
+    print(f"pixel-identical    {same}")
+    report.save(
+        args.json,
+        "share_card",
+        args,
+        {
+            "asset preload": {"ms": warmup * 1000},
+            "reference render": {"ms": reference * 1000},
+            "cached assets": {"ms": cached * 1000, "pixel_identical": same},
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Upstream traffic for repeated rewinds with the persistent list store.
+
+Runs a cold rewind, a year switch, and a refresh after a few entries changed,
+and reports AniList requests and bytes for each.
+
+    python -m benchmarks.bench_store --entries 5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data  # noqa: E402
+from benchmarks.stub_server import StubAniList  # noqa: E402
+from data import AniListClient, ListStore, fetch_cached, run_sync  # noqa: E402
+from rewind import build_rewind  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--changed", type=int, default=2)
+    args = parser.parse_args()
+
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        StubAniList(latency=0.05, entries=args.entries) as stub,
+    ):
+        store = ListStore(os.path.join(tmp, "lists.sqlite3"))
+        client = AniListClient(url=stub.url)
+
+        def rewind(label, year):
+            requests, sent = stub.requests, stub.bytes_sent
+            start = time.perf_counter()
+            lists = run_sync(fetch_cached("bench", store, client))
+            report = build_rewind(*lists, year)
+            print(
+                f"{label:22} {(time.perf_counter() - start) * 1000:8.1f} ms"
+                f"  {stub.requests - requests} requests"
+                f"  {(stub.bytes_sent - sent) / 1024:9.1f} KiB"
+            )
+            return report
+
+        rewind("cold, 2024", 2024)
+        rewind("year switch, 2023", 2023)
+
+        data.FRESH_FOR = 0
+        rewind("unchanged, 2024", 2024)
+        stub.touch(args.changed)
+        report = rewind(f"{args.changed} changed, 2024", 2024)
+        full = build_rewind(*run_sync(data.fetch_all("bench", client)), 2024)
+        same = report["overall"] == full["overall"]
+        print(f"merged report matches a full fetch: {same}")
+        run_sync(client.aclose())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare two saved benchmark runs, metric by metric.
+
+Accepts suite files from ``python -m benchmarks`` or single results saved
+with ``--json``. Times are better lower, so a ratio below 1 is an
+improvement.
+
+    python -m benchmarks.compare benchmarks/results/abc1234.json new.json
+"""
+
+import argparse
+import json
+
+
+def metrics(path):
+    """``{(benchmark, case, metric): value}`` for every number in ``path``."""
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if "benchmarks" in document:
+        runs = document["benchmarks"]
+    else:
+        runs = {document["benchmark"]: document}
+
+    values = {}
+    for benchmark, run in runs.items():
+        for case, fields in run["results"].items():
+            for metric, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[(benchmark, case, metric)] = value
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    old, new = metrics(args.old), metrics(args.new)
+    for key in sorted(old.keys() & new.keys()):
+        benchmark, case, metric = key
+        before, after = old[key], new[key]
+        ratio = f"{after / before:6.2f}x" if before else "      -"
+        print(
+            f"{benchmark:16} {case:26} {metric:18}"
+            f" {before:10.2f} {after:10.2f} {ratio}"
+        )
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{' '.join(key)}: only in {args.old if key in old else args.new}")
+
+
+if __name__ == "__main__":
+    main()
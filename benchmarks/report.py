@@ -0,0 +1,67 @@
+"""Saving benchmark results as JSON, so runs can be compared across commits.
+
+Every benchmark that accepts ``--json PATH`` writes one document:
+
+    {"benchmark": ..., "args": {...}, "environment": {...},
+     "results": {case: {metric: value}}}
+
+``python -m benchmarks`` runs the suite into one file per commit and
+``python -m benchmarks.compare`` diffs two of them.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git(*args):
+    try:
+        out = subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def environment():
+    """What a result depends on besides the code: commit, interpreter and
+    machine."""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def add_json_argument(parser):
+    parser.add_argument("--json", metavar="PATH", help="also save results as JSON")
+
+
+def save(path, benchmark, args, results):
+    """Write ``results`` of ``benchmark`` run with ``args`` (a namespace) to
+    ``path``; does nothing when ``path`` is None."""
+    if path is None:
+        return
+    document = {
+        "benchmark": benchmark,
+        "args": {k: v for k, v in vars(args).items() if k != "json"},
+        "environment": environment(),
+        "results": results,
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    print(f"saved {path}", file=sys.stderr)
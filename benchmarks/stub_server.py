@@ -0,0 +1,470 @@
+"""Local stand-in for the AniList GraphQL endpoint.
+
+Answers the list and favourites queries with canned payloads after an
+artificial delay so fetch strategies can be compared without touching the
+real API. With ``rate_limit`` set it enforces a fixed-window limit and sends
+AniList-style ``X-RateLimit-*``/``Retry-After`` headers and 429s.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+_TOKEN = re.compile(r'"[^"]*"|\$?\w+|[{}()\[\]:,!]')
+
+STATUSES = ["COMPLETED"] * 6 + ["CURRENT", "PLANNING", "DROPPED", "PAUSED", "REPEATING"]
+# AniList's genres, most common first.
+GENRES = [
+    "Action",
+    "Comedy",
+    "Drama",
+    "Fantasy",
+    "Romance",
+    "Adventure",
+    "Slice of Life",
+    "Supernatural",
+    "Sci-Fi",
+    "Mystery",
+    "Psychological",
+    "Sports",
+    "Ecchi",
+    "Mecha",
+    "Music",
+    "Thriller",
+    "Horror",
+    "Mahou Shoujo",
+]
+STUDIOS = [f"Studio {i}" for i in range(60)]
+
+
+def zipf_weights(n, skew):
+    """Weights of ranks ``1..n`` under a Zipf law: a few names dominate and
+    the tail is long, as genre and studio counts are on real lists."""
+    return [1 / rank**skew for rank in range(1, n + 1)]
+
+
+def weighted_sample(rng, names, weights, k):
+    """``k`` distinct ``names`` drawn with probability proportional to
+    ``weights``."""
+    picked = []
+    while len(picked) < k:
+        name = rng.choices(names, weights)[0]
+        if name not in picked:
+            picked.append(name)
+    return picked
+
+
+def sample_collection(
+    entries=50, seed=0, years=(2016, 2025), skew=1.1, image_url="https://img.test"
+):
+    """Entries spread over ``years`` with a mix of statuses, grouped into one
+    list per status like AniList does. Genres and studios follow Zipf
+    distributions with exponent ``skew``; the same ``seed`` always gives
+    the same collection. Images point at ``image_url``, which can be a
+    ``StubImages``."""
+    rng = random.Random(seed)
+    genre_weights = zipf_weights(len(GENRES), skew)
+    studio_weights = zipf_weights(len(STUDIOS), skew)
+    lists = {}
+    for i in range(entries):
+        status = rng.choice(STATUSES)
+        year = rng.randint(*years)
+        completed = status in ("COMPLETED", "REPEATING") or rng.random() < 0.05
+        lists.setdefault(status, []).append(
+            {
+                "id": i + 1,
+                "score": rng.choice([0, 0] + list(range(30, 101, 5))),
+                "progress": rng.randint(1, 50),
+                "progressVolumes": rng.randint(0, 10),
+                "repeat": rng.choice([0, 0, 0, 1]),
+                "status": status,
+                "updatedAt": int(
+                    datetime(
+                        year, rng.randint(1, 12), 15, tzinfo=timezone.utc
+                    ).timestamp()
+                ),
+                "completedAt": (
+                    {"year": year, "month": rng.randint(1, 12)}
+                    if completed
+                    else {"year": None, "month": None}
+                ),
+                "media": {
+                    "title": {"english": f"Title {i}"},
+                    "duration": rng.choice([24, 24, 12, 100]),
+                    "format": rng.choice(["TV", "TV", "MOVIE", "OVA"]),
+                    "countryOfOrigin": rng.choice(["JP", "JP", "KR", "CN"]),
+                    "genres": weighted_sample(
+                        rng, GENRES, genre_weights, rng.randint(1, 4)
+                    ),
+                    "bannerImage": f"{image_url}/banner/{i}.jpg",
+                    "coverImage": {"large": f"{image_url}/cover/{i}.jpg"},
+                    "studios": {
+                        "nodes": [
+                            {"name": name}
+                            for name in weighted_sample(
+                                rng, STUDIOS, studio_weights, rng.choice([1, 1, 1, 2])
+                            )
+                        ]
+                    },
+                },
+            }
+        )
+    return [
+        {"name": status.title(), "status": status, "entries": items}
+        for status, items in lists.items()
+    ]
+
+
+def sample_favourites():
+    return {
+        "favourites": {
+            "characters": {"nodes": []},
+            "staff": {"nodes": []},
+        }
+    }
+
+
+class _Query:
+    """Just enough of a GraphQL parser to resolve aliases, arguments and
+    selection sets of the queries this app sends."""
+
+    def __init__(self, text):
+        self.tokens = _TOKEN.findall(text)
+        self.pos = 0
+
+    def _next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _peek(self):
+        return self.tokens[self.pos]
+
+    def parse(self):
+        while self._next() != "{":
+            pass
+        return self._selection()
+
+    def _selection(self):
+        fields = []
+        while self._peek() != "}":
+            if self._peek() == ",":
+                self._next()
+                continue
+            alias = name = self._next()
+            if self._peek() == ":":
+                self._next()
+                name = self._next()
+            args = self._arguments() if self._peek() == "(" else {}
+            sub = None
+            if self._peek() == "{":
+                self._next()
+                sub = self._selection()
+            fields.append((alias, name, args, sub))
+        self._next()
+        return fields
+
+    def _arguments(self):
+        self._next()
+        args = {}
+        while self._peek() != ")":
+            if self._peek() == ",":
+                self._next()
+                continue
+            name = self._next()
+            self._next()
+            args[name] = self._value()
+        self._next()
+        return args
+
+    def _value(self):
+        token = self._next()
+        if token != "[":
+            return token
+        items = []
+        while self._peek() != "]":
+            if self._peek() != ",":
+                items.append(self._next())
+            else:
+                self._next()
+        self._next()
+        return items
+
+
+def project(value, selection):
+    if selection is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(v, selection) for v in value]
+    return {alias: project(value.get(name), sub) for alias, name, _, sub in selection}
+
+
+class StubAniList:
+    def __init__(
+        self,
+        latency=0.1,
+        entries=50,
+        rate_limit=None,
+        window=60.0,
+        host="127.0.0.1",
+        port=0,
+        image_url="https://img.test",
+    ):
+        self.latency = latency
+        self.lists = sample_collection(entries, image_url=image_url)
+        self.rate_limit = rate_limit
+        self.window = window
+        self.requests = 0
+        self.arrivals = []
+        self.throttled = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self.bodies = []
+        self.record = False
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                allowed, headers = stub.admit()
+                time.sleep(stub.latency)
+                if allowed:
+                    status = 200
+                    body = {
+                        "data": stub.answer(
+                            payload["query"], payload.get("variables") or {}
+                        )
+                    }
+                else:
+                    status = 429
+                    body = {"errors": [{"message": "Too Many Requests."}]}
+                body = json.dumps(body).encode()
+                stub.sent(body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, str(value))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def admit(self):
+        with self._lock:
+            self.requests += 1
+            self.arrivals.append(time.monotonic())
+            if self.rate_limit is None:
+                return True, {}
+
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._window_count = 0
+
+            reset_in = self.window - (now - self._window_start)
+            if self._window_count >= self.rate_limit:
+                self.throttled += 1
+                return False, {
+                    "X-RateLimit-Limit": self.rate_limit,
+                    "X-RateLimit-Remaining": 0,
+                    "X-RateLimit-Reset": int(time.time() + reset_in),
+                    "Retry-After": max(1, round(reset_in)),
+                }
+
+            self._window_count += 1
+            return True, {
+                "X-RateLimit-Limit": self.rate_limit,
+                "X-RateLimit-Remaining": self.rate_limit - self._window_count,
+            }
+
+    def sent(self, body):
+        with self._lock:
+            self.bytes_sent += len(body)
+            if self.record:
+                self.bodies.append(body)
+
+    def answer(self, query, variables):
+        def arg(args, name):
+            value = args.get(name)
+            if isinstance(value, str) and value.startswith("$"):
+                return variables.get(value[1:])
+            if isinstance(value, str) and value.isdigit():
+                return int(value)
+            return value
+
+        data = {}
+        for alias, name, args, sub in _Query(query).parse():
+            if name == "MediaListCollection":
+                value = self.collection(
+                    status_in=arg(args, "status_in"),
+                    completed_after=arg(args, "completedAt_greater"),
+                    completed_before=arg(args, "completedAt_lesser"),
+                    chunk=arg(args, "chunk"),
+                    per_chunk=arg(args, "perChunk"),
+                )
+            elif name == "Page":
+                value = self.page(arg(args, "page") or 1, arg(args, "perPage") or 50)
+            else:
+                value = sample_favourites()
+            data[alias] = project(value, sub)
+        return data
+
+    def page(self, page, per_page):
+        """``Page.mediaList`` sorted by ``UPDATED_TIME_DESC``."""
+        entries = sorted(
+            (e for lst in self.lists for e in lst["entries"]),
+            key=lambda e: e["updatedAt"],
+            reverse=True,
+        )
+        start = (page - 1) * per_page
+        return {
+            "pageInfo": {"hasNextPage": len(entries) > start + per_page},
+            "mediaList": entries[start : start + per_page],
+        }
+
+    def touch(self, count):
+        """Bump ``updatedAt`` on ``count`` entries, as if the user logged
+        progress on them."""
+        now = int(time.time())
+        entries = [e for lst in self.lists for e in lst["entries"]]
+        for e in entries[:count]:
+            e["updatedAt"] = now
+            e["progress"] += 1
+
+    def collection(
+        self,
+        status_in=None,
+        completed_after=None,
+        completed_before=None,
+        chunk=None,
+        per_chunk=None,
+    ):
+        def fuzzy(entry):
+            c = entry["completedAt"]
+            if not c["year"]:
+                return None
+            return c["year"] * 10000 + (c["month"] or 0) * 100
+
+        entries = []
+        for lst in self.lists:
+            for e in lst["entries"]:
+                if status_in and e["status"] not in status_in:
+                    continue
+                if (
+                    completed_after is not None
+                    and not (fuzzy(e) or 0) > completed_after
+                ):
+                    continue
+                if (
+                    completed_before is not None
+                    and not (fuzzy(e) or float("inf")) < completed_before
+                ):
+                    continue
+                entries.append(e)
+
+        has_next = False
+        if chunk and per_chunk:
+            start = (chunk - 1) * per_chunk
+            has_next = len(entries) > start + per_chunk
+            entries = entries[start : start + per_chunk]
+
+        lists = {}
+        for e in entries:
+            lists.setdefault(e["status"], []).append(e)
+        return {
+            "hasNextChunk": has_next,
+            "lists": [{"entries": items} for items in lists.values()],
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubImages:
+    """Serves generated JPEG covers for any path after ``latency`` seconds,
+    standing in for the AniList image CDN."""
+
+    def __init__(self, latency=0.2, size=(460, 650), host="127.0.0.1", port=0):
+        self.latency = latency
+        self.size = size
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.latency)
+                body = stub.render(self.path)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def render(self, path):
+        shade = sum(path.encode()) % 200
+        img = Image.new("RGB", self.size, color=(shade, 80, 255 - shade))
+        buffer = BytesIO()
+        img.save(buffer, "JPEG", quality=85)
+        return buffer.getvalue()
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
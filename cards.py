@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+CARD_CACHE_DIR = os.environ.get(
+    "CARD_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "cards"),
+)
+CARD_WORKERS = int(os.environ.get("CARD_WORKERS", 0)) or None
+CARD_TIMEOUT = float(os.environ.get("CARD_TIMEOUT", 30))
+
+# Bump when the card design changes so cached PNGs are not served for it.
+CARD_VERSION = 1
+
+
+class CardQueueFull(Exception):
+    """Raised instead of queueing a render when the pool is saturated."""
+
+
+class CardTimeout(Exception):
+    """Raised when a card is not ready within the renderer's timeout."""
+
+
+# share_card is imported inside the functions below so that importing this
+# module stays cheap; worker processes import it when they start.
+def _init_worker():
+    from share_card import preload
+
+    preload()
+
+
+def _render(data, variant):
+    from share_card import create_share_card, encode_card
+
+    with metrics.collect() as timings:
+        start = time.perf_counter()
+        img = create_share_card(data)
+        rendered = time.perf_counter()
+        encoded = encode_card(img, *variant)
+    return encoded, rendered - start, time.perf_counter() - rendered, timings
+
+
+def card_variant(fmt="png", preset="balanced", preview=False):
+    """The encoding of a card as ``(fmt, preset, preview)``; raises
+    ``ValueError`` for one ``share_card.encode_card`` does not support."""
+    from share_card import FORMATS, PRESETS
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if preset not in PRESETS:
+        raise ValueError(f"Unsupported preset: {preset}")
+    return fmt, preset, bool(preview)
+
+
+def card_key(data, variant):
+    from share_card import card_inputs
+
+    inputs = json.dumps(
+        [CARD_VERSION, variant, card_inputs(data)],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(inputs.encode()).hexdigest()
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CardRenderer:
+    """Renders share cards in a pool of worker processes.
+
+    PIL holds the GIL for most of a render, so cards rendered on request
+    threads serialize; worker processes render them in parallel. At most
+    ``max_pending`` renders are queued or running, beyond that ``render``
+    raises ``CardQueueFull`` so callers can shed load instead of piling up,
+    and a card not ready within ``timeout`` seconds raises ``CardTimeout``.
+    Encoded cards are cached on disk under a hash of ``card_inputs`` and the
+    requested encoding, and concurrent requests for the same card share one
+    render.
+    """
+
+    def __init__(
+        self,
+        cache_dir=CARD_CACHE_DIR,
+        workers=CARD_WORKERS,
+        max_pending=None,
+        max_cache_items=2000,
+        timeout=CARD_TIMEOUT,
+    ):
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.max_cache_items = max_cache_items
+        self.timeout = timeout
+        self.stats = {"cache_hits": 0, "rendered": 0, "rejected": 0, "errors": 0}
+
+        self.pending = 0
+        self._render_times = deque(maxlen=500)
+        self._encode_times = deque(maxlen=500)
+        self._wait_times = deque(maxlen=500)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._writes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def render(self, data, fmt="png", preset="balanced", preview=False):
+        """``data``'s share card encoded as ``fmt`` (see
+        ``share_card.encode_card``)."""
+        try:
+            return self.submit(data, fmt, preset, preview).result(self.timeout)
+        except FutureTimeout:
+            raise CardTimeout(f"Card not ready after {self.timeout}s") from None
+
+    def render_here(self, data, fmt="png", preset="balanced", preview=False):
+        """``render`` in the calling thread, bypassing the pool and the
+        cache, so a profiled request's profile includes the render itself."""
+        return _render(data, card_variant(fmt, preset, preview))[0]
+
+    async def arender(self, data, fmt="png", preset="balanced", preview=False):
+        # Shielded: the future is shared with every caller of the same card.
+        card = asyncio.wrap_future(self.submit(data, fmt, preset, preview))
+        try:
+            return await asyncio.wait_for(asyncio.shield(card), self.timeout)
+        except asyncio.TimeoutError:
+            raise CardTimeout(f"Card not ready after {self.timeout}s") from None
+
+    def submit(self, data, fmt="png", preset="balanced", preview=False):
+        """A ``concurrent.futures.Future`` of the encoded card. Raises
+        ``ValueError`` for an unsupported encoding before anything is
+        queued."""
+        variant = card_variant(fmt, preset, preview)
+        key = card_key(data, variant)
+        encoded = self._read_cache(key)
+        if encoded is not None:
+            self.stats["cache_hits"] += 1
+            done = Future()
+            done.set_result(encoded)
+            return done
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return inflight
+            if self.pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise CardQueueFull(f"{self.pending} cards already rendering")
+            self.pending += 1
+            result = self._inflight[key] = Future()
+
+        queued = time.perf_counter()
+        pool = None
+        try:
+            pool = self._executor()
+            rendering = pool.submit(_render, data, variant)
+        except Exception as e:
+            self._failed(key, result, e, pool)
+            return result
+
+        def finished(f):
+            try:
+                encoded, render_seconds, encode_seconds, timings = f.result()
+            except Exception as e:
+                self._failed(key, result, e, pool)
+                return
+            with self._lock:
+                self.pending -= 1
+                self._inflight.pop(key, None)
+            self.stats["rendered"] += 1
+            # Spans timed in the worker process, accounted in this one.
+            for stage, seconds in timings:
+                metrics.record(stage, seconds)
+            self._render_times.append(render_seconds)
+            self._encode_times.append(encode_seconds)
+            self._wait_times.append(
+                time.perf_counter() - queued - render_seconds - encode_seconds
+            )
+            self._write_cache(key, encoded)
+            result.set_result(encoded)
+
+        rendering.add_done_callback(finished)
+        return result
+
+    def _failed(self, key, result, error, pool):
+        """Settle the shared future of a render that could not finish. A
+        worker that died breaks its whole pool, so the next render starts a
+        new one."""
+        with self._lock:
+            self.pending -= 1
+            self._inflight.pop(key, None)
+            broken = isinstance(error, BrokenProcessPool) and self._pool is pool
+            if broken:
+                self._pool = None
+        if broken:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.stats["errors"] += 1
+        result.set_exception(error)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.card")
+
+    def _read_cache(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cache(self, key, encoded):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune_cache()
+
+    def _prune_cache(self):
+        try:
+            paths = [
+                os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir)
+                if name.endswith(".card")
+            ]
+            if len(paths) <= self.max_cache_items:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[: len(paths) - self.max_cache_items]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def metrics(self):
+        render = list(self._render_times)
+        encode = list(self._encode_times)
+        wait = list(self._wait_times)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "render_ms_p50": _ms(_percentile(render, 0.5)),
+            "render_ms_p95": _ms(_percentile(render, 0.95)),
+            "encode_ms_p50": _ms(_percentile(encode, 0.5)),
+            "encode_ms_p95": _ms(_percentile(encode, 0.95)),
+            "queue_wait_ms_p95": _ms(_percentile(wait, 0.95)),
+            **self.stats,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_card_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = CardRenderer()
+    return _renderer
+
+
+def set_card_renderer(renderer):
+    global _renderer
+    _renderer = renderer
@@ -1 +1,247 @@
 # Data package
+import asyncio
+import time
+from collections import namedtuple
+
+import metrics
+from data.anime import (
+    ANIME_CHANGES_QUERY,
+    ANIME_ONGOING_QUERY,
+    ANIME_QUERY,
+    ANIME_YEAR_QUERY,
+    fetch_anime,
+)
+from data.manga import (
+    MANGA_CHANGES_QUERY,
+    MANGA_ONGOING_QUERY,
+    MANGA_QUERY,
+    MANGA_YEAR_QUERY,
+    fetch_manga,
+)
+from data.favorites import FAVORITES_QUERY, fetch_favorites, parse_favorites
+from data.client import AniListClient, get_client, run_sync
+from data.entries import Entry, decode, entry_list
+from data.query import combine_queries, declared_variables
+from data.store import ListStore, get_store, set_store
+
+REWIND_QUERY = combine_queries(
+    {"anime": ANIME_QUERY, "manga": MANGA_QUERY, "favorites": FAVORITES_QUERY}
+)
+
+YEAR_PARTS = {
+    "animeCompleted": ANIME_YEAR_QUERY,
+    "animeOngoing": ANIME_ONGOING_QUERY,
+    "mangaCompleted": MANGA_YEAR_QUERY,
+    "mangaOngoing": MANGA_ONGOING_QUERY,
+    "favorites": FAVORITES_QUERY,
+}
+
+CHANGES_PARTS = {
+    "anime": ANIME_CHANGES_QUERY,
+    "manga": MANGA_CHANGES_QUERY,
+    "favorites": FAVORITES_QUERY,
+}
+
+PER_CHUNK = 500
+
+# A stored list younger than this is served without asking AniList at all.
+FRESH_FOR = 300
+# Incremental refreshes cannot see deleted entries, so refetch in full weekly.
+FULL_REFRESH_AFTER = 7 * 24 * 3600
+
+
+def year_bounds(year: int):
+    """Exclusive ``FuzzyDateInt`` bounds covering every date in ``year``,
+    including year-only (``YYYY0000``) and year-month dates."""
+    return (year - 1) * 10000 + 1231, (year + 1) * 10000
+
+
+def merge_entries(*parts):
+    """Merge entry lists into one, keeping the first copy of any entry that
+    matched more than one filter."""
+    seen = set()
+    entries = []
+    for part in parts:
+        for e in part:
+            if e.id not in seen:
+                seen.add(e.id)
+                entries.append(e)
+    return entries
+
+
+async def _query_parts(client, parts, values):
+    document = combine_queries(parts)
+    declared = declared_variables(document)
+    variables = {k: v for k, v in values.items() if k in declared}
+    return await client.query(document, variables)
+
+
+async def fetch_all(username: str, client=None, year=None):
+    client = client or get_client()
+    if year is not None:
+        return await fetch_year(username, year, client)
+
+    data = await client.query(REWIND_QUERY, {"username": username})
+    return (
+        entry_list(data["anime"]),
+        entry_list(data["manga"]),
+        parse_favorites(data["favorites"]),
+    )
+
+
+async def fetch_year(username: str, year: int, client=None):
+    """Fetch only what a ``year`` rewind needs.
+
+    Completed entries are filtered server-side by ``completedAt`` and ongoing
+    ones by ``status_in``, with ongoing entries requesting only the fields the
+    report renders. Large results are paged with ``chunk``/``perChunk``; each
+    round re-sends only the parts that still have a next chunk.
+    """
+    client = client or get_client()
+    completed_after, completed_before = year_bounds(year)
+    values = {
+        "username": username,
+        "completedAfter": completed_after,
+        "completedBefore": completed_before,
+        "perChunk": PER_CHUNK,
+    }
+
+    parts = dict(YEAR_PARTS)
+    entries = {alias: [] for alias in parts if alias != "favorites"}
+    favorites = None
+    chunk = 1
+
+    while parts:
+        data = await _query_parts(client, parts, {**values, "chunk": chunk})
+
+        if "favorites" in data:
+            favorites = parse_favorites(data.pop("favorites"))
+
+        remaining = {}
+        for alias, collection in data.items():
+            for lst in collection["lists"]:
+                entries[alias].extend(lst["entries"])
+            if collection.get("hasNextChunk"):
+                remaining[alias] = parts[alias]
+        parts = remaining
+        chunk += 1
+
+    anime = merge_entries(entries["animeCompleted"], entries["animeOngoing"])
+    manga = merge_entries(entries["mangaCompleted"], entries["mangaOngoing"])
+    return anime, manga, favorites
+
+
+async def fetch_changes(username: str, since: dict, client=None):
+    """Fetch entries updated at or after the stored watermarks.
+
+    Pages through ``mediaList`` sorted by ``UPDATED_TIME_DESC`` and stops a
+    list type as soon as a page reaches entries older than its watermark.
+    """
+    client = client or get_client()
+    watermarks = {
+        "anime": since["anime_updated_at"],
+        "manga": since["manga_updated_at"],
+    }
+
+    parts = dict(CHANGES_PARTS)
+    changes = {"anime": [], "manga": []}
+    favorites = None
+    page = 1
+
+    while parts:
+        data = await _query_parts(client, parts, {"username": username, "page": page})
+
+        if "favorites" in data:
+            favorites = parse_favorites(data.pop("favorites"))
+
+        remaining = {}
+        for alias, result in data.items():
+            fresh = [
+                e
+                for e in result["mediaList"]
+                if (e.updated_at or 0) >= watermarks[alias]
+            ]
+            changes[alias].extend(fresh)
+            if result["pageInfo"]["hasNextPage"] and len(fresh) == len(
+                result["mediaList"]
+            ):
+                remaining[alias] = parts[alias]
+        parts = remaining
+        page += 1
+
+    return changes["anime"], changes["manga"], favorites
+
+
+# What ``refresh_cached`` did: ``mode`` is "full" (``anime`` and ``manga`` are
+# the whole lists), "changes" (only entries changed since the stored state
+# ``since``) or "fresh" (nothing fetched); ``state`` is the stored state after.
+# Lists are ``Entry`` lists.
+Refresh = namedtuple(
+    "Refresh",
+    ["mode", "since", "state", "anime", "manga", "favorites"],
+    defaults=(None, None, None),
+)
+
+
+async def refresh_cached(username: str, store=None, client=None):
+    """Bring the persistent store up to date for ``username``.
+
+    Unknown users (and stores older than ``FULL_REFRESH_AFTER``) are fetched
+    in full; otherwise only entries changed since the last refresh are
+    fetched and merged, and nothing at all within ``FRESH_FOR`` seconds.
+    """
+    store = store or get_store()
+    client = client or get_client()
+    state = await asyncio.to_thread(store.state, username)
+    now = time.time()
+
+    if state is None or now - state["full_at"] > FULL_REFRESH_AFTER:
+        anime, manga, favorites = await fetch_all(username, client)
+        await asyncio.to_thread(store.replace, username, anime, manga, favorites)
+        after = await asyncio.to_thread(store.state, username)
+        metrics.inc("list_refreshes", mode="full")
+        return Refresh("full", state, after, anime, manga, favorites)
+
+    if now - state["refreshed_at"] > FRESH_FOR:
+        anime, manga, favorites = await fetch_changes(username, state, client)
+        await asyncio.to_thread(store.merge, username, anime, manga, favorites)
+        after = await asyncio.to_thread(store.state, username)
+        metrics.inc("list_refreshes", mode="changes")
+        return Refresh("changes", state, after, anime, manga, favorites)
+
+    metrics.inc("list_refreshes", mode="fresh")
+    return Refresh("fresh", state, state)
+
+
+async def fetch_cached(username: str, store=None, client=None):
+    """Return the full lists for ``username`` from the persistent store,
+    refreshing it first (see ``refresh_cached``)."""
+    store = store or get_store()
+    refresh = await refresh_cached(username, store, client)
+    if refresh.mode == "full":
+        return refresh.anime, refresh.manga, refresh.favorites
+    return await asyncio.to_thread(store.load, username)
+
+
+__all__ = [
+    "AniListClient",
+    "Entry",
+    "ListStore",
+    "REWIND_QUERY",
+    "Refresh",
+    "combine_queries",
+    "decode",
+    "entry_list",
+    "fetch_all",
+    "fetch_anime",
+    "fetch_cached",
+    "fetch_changes",
+    "fetch_favorites",
+    "fetch_manga",
+    "fetch_year",
+    "get_client",
+    "get_store",
+    "refresh_cached",
+    "run_sync",
+    "set_store",
+]
@@ -1,12 +1,9 @@
-import httpx
+from data.client import get_client
+from data.entries import entry_list
+from data.query import ONGOING_ENTRY_FIELDS
 
-ANILIST_API_URL = "https://graphql.anilist.co"
-
-ANIME_QUERY = """
-query ($username: String) {
-  MediaListCollection(userName: $username, type: ANIME) {
-    lists {
-      entries {
+ANIME_ENTRY_FIELDS = """
+        id
         score
         progress
         repeat
@@ -26,18 +23,67 @@ query ($username: String) {
             }
           }
         }
-      }
+"""
+
+ANIME_QUERY = (
+    """
+query ($username: String) {
+  MediaListCollection(userName: $username, type: ANIME) {
+    lists {
+      entries {"""
+    + ANIME_ENTRY_FIELDS
+    + """      }
     }
   }
 }
 """
+)
+
+ANIME_YEAR_QUERY = (
+    """
+query ($username: String, $completedAfter: FuzzyDateInt, $completedBefore: FuzzyDateInt, $chunk: Int, $perChunk: Int) {
+  MediaListCollection(userName: $username, type: ANIME, completedAt_greater: $completedAfter, completedAt_lesser: $completedBefore, chunk: $chunk, perChunk: $perChunk) {
+    hasNextChunk
+    lists {
+      entries {"""
+    + ANIME_ENTRY_FIELDS
+    + """      }
+    }
+  }
+}
+"""
+)
+
+ANIME_ONGOING_QUERY = (
+    """
+query ($username: String, $chunk: Int, $perChunk: Int) {
+  MediaListCollection(userName: $username, type: ANIME, status_in: [CURRENT, REPEATING], chunk: $chunk, perChunk: $perChunk) {
+    hasNextChunk
+    lists {
+      entries {"""
+    + ONGOING_ENTRY_FIELDS
+    + """      }
+    }
+  }
+}
+"""
+)
+
+ANIME_CHANGES_QUERY = (
+    """
+query ($username: String, $page: Int) {
+  Page(page: $page, perPage: 50) {
+    pageInfo { hasNextPage }
+    mediaList(userName: $username, type: ANIME, sort: UPDATED_TIME_DESC) {"""
+    + ANIME_ENTRY_FIELDS
+    + """    }
+  }
+}
+"""
+)
 
 
-async def fetch_anime(username: str):
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            ANILIST_API_URL,
-            json={"query": ANIME_QUERY, "variables": {"username": username}},
-        )
-        r.raise_for_status()
-        return r.json()["data"]["MediaListCollection"]
+async def fetch_anime(username: str, client=None):
+    client = client or get_client()
+    data = await client.query(ANIME_QUERY, {"username": username})
+    return entry_list(data["MediaListCollection"])
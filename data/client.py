@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import httpx
+
+import metrics
+from data.entries import decode
+from data.scheduler import (
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    current_priority,
+    prioritized,
+)
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+ANILIST_API_URL = "https://graphql.anilist.co"
+
+
+class AniListClient:
+    """Process-wide AniList GraphQL client.
+
+    Keeps one pooled ``httpx.AsyncClient`` (keep-alive, HTTP/2 when ``h2`` is
+    installed) per event loop so repeated rewinds reuse warm connections
+    instead of paying a TLS handshake per query. Every request goes through
+    ``scheduler`` so the process as a whole stays inside the rate limit.
+
+    Connections belong to the loop that opened them, so a client is only
+    used and closed on its own loop. Clients of loops that have since closed
+    (after an ``asyncio.run``) are dropped when the next one is created.
+    """
+
+    def __init__(
+        self, url=ANILIST_API_URL, timeout=20.0, max_connections=20, scheduler=None
+    ):
+        self.url = url
+        self.scheduler = scheduler or RequestScheduler()
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0,
+        )
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            http = self._clients.get(loop)
+            if http is None:
+                for closed in [other for other in self._clients if other.is_closed()]:
+                    del self._clients[closed]
+                http = self._clients[loop] = httpx.AsyncClient(
+                    http2=HTTP2, limits=self.limits, timeout=self.timeout
+                )
+        return http
+
+    async def query(self, query: str, variables: dict, priority=None):
+        """The ``data`` of the response, with list entries as ``Entry``.
+        ``priority`` defaults to the one of the current context."""
+        if priority is None:
+            priority = current_priority()
+        payload = {"query": query, "variables": variables}
+        with metrics.span("anilist.request"):
+            r = await self.scheduler.submit(
+                lambda: self._client().post(self.url, json=payload), priority
+            )
+        metrics.inc("anilist_bytes", len(r.content))
+        metrics.inc("anilist_responses", status=r.status_code)
+        r.raise_for_status()
+        with metrics.span("anilist.decode"):
+            return decode(r.content)["data"]
+
+    async def aclose(self):
+        """Close the scheduler and every client, each on its own loop."""
+        await self.scheduler.aclose()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for owner, http in clients.items():
+            if owner is loop:
+                await http.aclose()
+            elif owner.is_running():
+                closing = asyncio.run_coroutine_threadsafe(http.aclose(), owner)
+                await asyncio.wrap_future(closing)
+
+
+class LoopThread:
+    """A single event loop running in a daemon thread.
+
+    Lets synchronous callers (the Flask routes) submit coroutines without
+    creating and tearing down a loop, and the pooled connections bound to it,
+    on every request.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=self._loop.run_forever, name="anilist-loop", daemon=True
+                )
+                thread.start()
+            return self._loop
+
+    def run(self, coro, timeout=None):
+        timings = metrics.current_timings()
+        if timings is not None:
+            coro = metrics.bound(coro, timings)
+        level = current_priority()
+        if level != PRIORITY_INTERACTIVE:
+            coro = prioritized(coro, level)
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure())
+        return future.result(timeout)
+
+
+_client = None
+_runner = LoopThread()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = AniListClient()
+    return _client
+
+
+def set_client(client):
+    global _client
+    _client = client
+
+
+def run_sync(coro, timeout=None):
+    return _runner.run(coro, timeout)
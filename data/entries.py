@@ -0,0 +1,146 @@
+"""Compact list entries.
+
+AniList returns each list entry as a small tree of dicts: the entry, its
+media, title, cover, completion date and studio nodes. ``Entry`` keeps just
+the fields the reports read, in ``__slots__``. ``decode`` builds entries
+while a response is being parsed, so a list of thousands of titles never
+exists as dicts. Repeated names (statuses, formats, countries, genres and
+studios) are interned, so every entry shares one copy of each.
+"""
+
+import json
+import sys
+
+
+def _name(value):
+    return sys.intern(value) if value else value
+
+
+def _names(values):
+    return tuple(map(sys.intern, values)) if values else ()
+
+
+class Entry:
+    """One anime or manga list entry.
+
+    Fields the query did not ask for are None (``genres`` and ``studios``
+    are empty), as is anything AniList sent as null, so callers apply the
+    same defaults they would to the response.
+    """
+
+    __slots__ = (
+        "id",
+        "score",
+        "progress",
+        "volumes",
+        "repeat",
+        "status",
+        "updated_at",
+        "year",
+        "month",
+        "title",
+        "cover",
+        "banner",
+        "duration",
+        "format",
+        "country",
+        "genres",
+        "studios",
+    )
+
+    @classmethod
+    def from_json(cls, e):
+        """The entry of AniList's ``e`` (a ``MediaList`` object)."""
+        self = cls.__new__(cls)
+        media = e.get("media") or {}
+        completed = e.get("completedAt") or {}
+        self.id = e["id"]
+        score = e.get("score")
+        self.score = 0 if score is None else score
+        self.progress = e.get("progress")
+        self.volumes = e.get("progressVolumes")
+        self.repeat = e.get("repeat")
+        self.status = _name(e.get("status"))
+        self.updated_at = e.get("updatedAt")
+        self.year = completed.get("year")
+        self.month = completed.get("month")
+        self.title = (media.get("title") or {}).get("english")
+        self.cover = (media.get("coverImage") or {}).get("large")
+        self.banner = media.get("bannerImage")
+        self.duration = media.get("duration")
+        self.format = _name(media.get("format"))
+        self.country = _name(media.get("countryOfOrigin"))
+        self.genres = _names(media.get("genres"))
+        studios = (media.get("studios") or {}).get("nodes")
+        self.studios = _names([s["name"] for s in studios or ()])
+        return self
+
+    def to_json(self):
+        """The entry in AniList's shape, without the fields that are unset
+        but ``status``, which ``decode`` looks for; ``from_json`` of it gives
+        an equal entry."""
+        media = {
+            "title": {"english": self.title},
+            "coverImage": {"large": self.cover},
+            "bannerImage": self.banner,
+            "duration": self.duration,
+            "format": self.format,
+            "countryOfOrigin": self.country,
+            "genres": list(self.genres) or None,
+            "studios": (
+                {"nodes": [{"name": name} for name in self.studios]}
+                if self.studios
+                else None
+            ),
+        }
+        entry = {
+            "id": self.id,
+            "score": self.score,
+            "progress": self.progress,
+            "progressVolumes": self.volumes,
+            "repeat": self.repeat,
+            "status": self.status,
+            "updatedAt": self.updated_at,
+            "completedAt": (
+                {"year": self.year, "month": self.month} if self.year else None
+            ),
+            "media": {k: v for k, v in media.items() if v is not None},
+        }
+        return {k: v for k, v in entry.items() if v is not None or k == "status"}
+
+    def __eq__(self, other):
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    # Entries compare by value and their slots are writable, so a hash could
+    # change under a set or dict; they are deliberately unhashable, like the
+    # dicts they replace. Key by ``id`` instead.
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Entry(id={self.id!r}, title={self.title!r})"
+
+
+def _decode_object(obj):
+    if "media" in obj and "status" in obj:
+        return Entry.from_json(obj)
+    return obj
+
+
+def decode(content):
+    """Parse a JSON document (an AniList response or a stored entry), turning
+    each list entry into an ``Entry`` as soon as it has been read."""
+    return json.loads(content, object_hook=_decode_object)
+
+
+def entry_list(value):
+    """The entries of ``value`` in list order: a sequence of entries, or a
+    ``MediaListCollection`` as AniList returns it (decoded or raw)."""
+    if not value:
+        return []
+    if isinstance(value, dict):
+        value = [e for lst in value["lists"] for e in lst["entries"]]
+    return [e if isinstance(e, Entry) else Entry.from_json(e) for e in value]
@@ -1,4 +1,4 @@
-import httpx
+from data.client import get_client
 
 FAVORITES_QUERY = """
 query ($username: String) {
@@ -23,15 +23,15 @@ query ($username: String) {
 """
 
 
-async def fetch_favorites(username: str):
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            "https://graphql.anilist.co",
-            json={"query": FAVORITES_QUERY, "variables": {"username": username}},
-        )
-        r.raise_for_status()
-        data = r.json()["data"]["User"]["favourites"]
-        return {
-            "characters": data["characters"]["nodes"],
-            "staff": data["staff"]["nodes"],
-        }
+async def fetch_favorites(username: str, client=None):
+    client = client or get_client()
+    data = await client.query(FAVORITES_QUERY, {"username": username})
+    return parse_favorites(data["User"])
+
+
+def parse_favorites(user):
+    data = user["favourites"]
+    return {
+        "characters": data["characters"]["nodes"],
+        "staff": data["staff"]["nodes"],
+    }
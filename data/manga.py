@@ -1,10 +1,9 @@
-import httpx
+from data.client import get_client
+from data.entries import entry_list
+from data.query import ONGOING_ENTRY_FIELDS
 
-MANGA_QUERY = """
-query ($username: String) {
-  MediaListCollection(userName: $username, type: MANGA) {
-    lists {
-      entries {
+MANGA_ENTRY_FIELDS = """
+        id
         score
         progress
         progressVolumes
@@ -19,18 +18,67 @@ query ($username: String) {
           bannerImage
           coverImage { large }
         }
-      }
+"""
+
+MANGA_QUERY = (
+    """
+query ($username: String) {
+  MediaListCollection(userName: $username, type: MANGA) {
+    lists {
+      entries {"""
+    + MANGA_ENTRY_FIELDS
+    + """      }
+    }
+  }
+}
+"""
+)
+
+MANGA_YEAR_QUERY = (
+    """
+query ($username: String, $completedAfter: FuzzyDateInt, $completedBefore: FuzzyDateInt, $chunk: Int, $perChunk: Int) {
+  MediaListCollection(userName: $username, type: MANGA, completedAt_greater: $completedAfter, completedAt_lesser: $completedBefore, chunk: $chunk, perChunk: $perChunk) {
+    hasNextChunk
+    lists {
+      entries {"""
+    + MANGA_ENTRY_FIELDS
+    + """      }
+    }
+  }
+}
+"""
+)
+
+MANGA_ONGOING_QUERY = (
+    """
+query ($username: String, $chunk: Int, $perChunk: Int) {
+  MediaListCollection(userName: $username, type: MANGA, status_in: [CURRENT, REPEATING], chunk: $chunk, perChunk: $perChunk) {
+    hasNextChunk
+    lists {
+      entries {"""
+    + ONGOING_ENTRY_FIELDS
+    + """      }
     }
   }
 }
 """
+)
+
+MANGA_CHANGES_QUERY = (
+    """
+query ($username: String, $page: Int) {
+  Page(page: $page, perPage: 50) {
+    pageInfo { hasNextPage }
+    mediaList(userName: $username, type: MANGA, sort: UPDATED_TIME_DESC) {"""
+    + MANGA_ENTRY_FIELDS
+    + """    }
+  }
+}
+"""
+)
 
 
-async def fetch_manga(username: str):
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            "https://graphql.anilist.co",
-            json={"query": MANGA_QUERY, "variables": {"username": username}},
-        )
-        r.raise_for_status()
-        return r.json()["data"]["MediaListCollection"]
+async def fetch_manga(username: str, client=None):
+    client = client or get_client()
+    data = await client.query(MANGA_QUERY, {"username": username})
+    return entry_list(data["MediaListCollection"])
@@ -0,0 +1,54 @@
+import re
+
+_HEADER = re.compile(r"query\s*(?:\w+\s*)?\(([^)]*)\)\s*\{")
+_ROOT_FIELD = re.compile(r"^\s*(\w+)\s*\(")
+_VARIABLE = re.compile(r"\$(\w+)\s*:")
+
+# Everything the report renders for an in-progress title.
+ONGOING_ENTRY_FIELDS = """
+        id
+        score
+        progress
+        status
+        updatedAt
+        media {
+          title { english }
+          coverImage { large }
+        }
+"""
+
+
+def declared_variables(document: str) -> set:
+    header = _HEADER.search(document)
+    return set(_VARIABLE.findall(header.group(1))) if header else set()
+
+
+def combine_queries(parts: dict) -> str:
+    """Merge several single-root-field GraphQL documents into one.
+
+    ``parts`` maps an alias to a query document. Each document's root field is
+    aliased so the combined response comes back as ``{alias: root_value}``.
+    Variables with the same name must have the same type in every document.
+    """
+    variables = {}
+    fields = []
+
+    for alias, document in parts.items():
+        header = _HEADER.search(document)
+        if not header:
+            raise ValueError(f"Cannot parse query header for '{alias}'")
+
+        for declaration in header.group(1).split(","):
+            if not declaration.strip():
+                continue
+            name, type_ = (s.strip() for s in declaration.split(":", 1))
+            if variables.setdefault(name, type_) != type_:
+                raise ValueError(f"Conflicting types for variable {name}")
+
+        body = document[header.end() : document.rstrip().rfind("}")].strip()
+        if not _ROOT_FIELD.match(body):
+            raise ValueError(f"Cannot find root field for '{alias}'")
+        fields.append(f"  {alias}: {body}")
+
+    declarations = ", ".join(f"{name}: {type_}" for name, type_ in variables.items())
+    return "query (" + declarations + ") {\n" + "\n".join(fields) + "\n}\n"
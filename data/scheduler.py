@@ -0,0 +1,242 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+_priority = ContextVar("priority", default=PRIORITY_INTERACTIVE)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Client-side view of AniList's rate limit.
+
+    Refills continuously at ``capacity / period`` tokens per second and is
+    corrected from the ``X-RateLimit-*`` and ``Retry-After`` headers of every
+    response, so the local estimate never runs ahead of the server's. The
+    headers can lower the rate below the configured ``capacity`` but never
+    raise it above it.
+    """
+
+    def __init__(self, capacity=90, period=60.0):
+        self.capacity = capacity
+        self.max_capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    @property
+    def rate(self):
+        return self.capacity / self.period
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def sync(self, limit=None, remaining=None):
+        self._refill(time.monotonic())
+        if limit:
+            self.capacity = min(limit, self.max_capacity)
+            self.tokens = min(self.tokens, self.capacity)
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+    def block(self, seconds):
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+@contextmanager
+def priority(level):
+    """Submit the AniList requests made in this context (including tasks
+    and ``run_sync`` calls started from it) at ``level``."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+async def prioritized(coro, level):
+    """Await ``coro`` at ``level``, for coroutines handed to an event loop
+    in another thread."""
+    with priority(level):
+        return await coro
+
+
+def _header_int(response, name):
+    try:
+        return int(response.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """Queues AniList requests and releases them as rate-limit tokens allow.
+
+    Waiting requests are served lowest ``priority`` first (interactive
+    rewinds ahead of background pre-warming), FIFO within a priority.
+    Throttled, 5xx and transport failures are retried with jittered
+    exponential backoff; a 429 pauses the whole queue for ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        bucket=None,
+        max_retries=4,
+        backoff_base=0.5,
+        backoff_cap=30.0,
+    ):
+        self.bucket = bucket or TokenBucket()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.in_flight = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "throttled": 0,
+        }
+
+        self._waiters = []
+        self._counter = itertools.count()
+        self._loop = None
+        self._wakeup = None
+        self._dispatcher = None
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher.done():
+            self._loop = loop
+            self._waiters = []
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self.bucket.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.bucket.take()
+                future.set_result(None)
+
+    async def _acquire(self, priority, seq):
+        self._ensure_dispatcher()
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, (priority, seq, future))
+        self._wakeup.set()
+        await future
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_cap, self.backoff_base * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _observe(self, response):
+        self.bucket.sync(
+            limit=_header_int(response, "X-RateLimit-Limit"),
+            remaining=_header_int(response, "X-RateLimit-Remaining"),
+        )
+        if response.status_code != 429:
+            return None
+
+        self.stats["throttled"] += 1
+        retry_after = _header_int(response, "Retry-After")
+        reset = _header_int(response, "X-RateLimit-Reset")
+        if retry_after is None and reset is not None:
+            retry_after = max(0, reset - int(time.time()))
+        if retry_after is None:
+            retry_after = self.bucket.period / self.bucket.capacity
+        self.bucket.block(retry_after)
+        return retry_after
+
+    async def submit(self, send, priority=PRIORITY_INTERACTIVE):
+        """Run ``send()`` (a coroutine function returning an ``httpx.Response``)
+        once a token is available, retrying throttled and failed attempts."""
+        self.stats["submitted"] += 1
+        seq = next(self._counter)
+        attempt = 0
+
+        while True:
+            await self._acquire(priority, seq)
+            self.in_flight += 1
+            try:
+                response = await send()
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                retry_after = self._observe(response)
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or attempt >= self.max_retries
+                ):
+                    self.stats["completed"] += 1
+                    return response
+                delay = self._backoff(attempt)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+            finally:
+                self.in_flight -= 1
+
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        if self._dispatcher is not None and not self._dispatcher.done():
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+
+    def metrics(self):
+        return {
+            "queue_depth": sum(1 for *_, f in self._waiters if not f.done()),
+            "in_flight": self.in_flight,
+            "tokens": round(max(self.bucket.tokens, 0.0), 2),
+            "capacity": self.bucket.capacity,
+            **self.stats,
+        }
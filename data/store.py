@@ -0,0 +1,165 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from data.entries import decode, entry_list
+
+DEFAULT_PATH = os.environ.get(
+    "ANILIST_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "lists.sqlite3"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    favorites TEXT NOT NULL,
+    anime_updated_at INTEGER NOT NULL,
+    manga_updated_at INTEGER NOT NULL,
+    full_at REAL NOT NULL,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    username TEXT NOT NULL,
+    type TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (username, type, id)
+);
+"""
+
+TYPES = ("anime", "manga")
+
+
+def _max_updated(entries):
+    return max((e.updated_at or 0 for e in entries), default=0)
+
+
+class ListStore:
+    """Persistent store of each user's list entries.
+
+    Backed by one SQLite file (WAL mode) so every worker process shares it
+    and it survives restarts. Alongside the entries it keeps the newest
+    ``updatedAt`` seen per list type, which is the watermark for incremental
+    refreshes. Entries are stored as AniList-shaped JSON and loaded as
+    ``Entry`` lists.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def state(self, username: str):
+        with self._db() as db:
+            row = db.execute(
+                "SELECT anime_updated_at, manga_updated_at, full_at, refreshed_at"
+                " FROM users WHERE username = ?",
+                (username.lower(),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "anime_updated_at": row[0],
+            "manga_updated_at": row[1],
+            "full_at": row[2],
+            "refreshed_at": row[3],
+        }
+
+    def load(self, username: str):
+        key = username.lower()
+        with self._db() as db:
+            row = db.execute(
+                "SELECT favorites FROM users WHERE username = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            lists = {}
+            for type_ in TYPES:
+                rows = db.execute(
+                    "SELECT entry FROM entries WHERE username = ? AND type = ?"
+                    " ORDER BY rowid",
+                    (key, type_),
+                )
+                lists[type_] = [decode(r[0]) for r in rows]
+        return lists["anime"], lists["manga"], json.loads(row[0])
+
+    def replace(self, username: str, anime, manga, favorites):
+        """Store a full fetch, dropping whatever was stored before."""
+        key = username.lower()
+        now = time.time()
+        changes = {"anime": entry_list(anime), "manga": entry_list(manga)}
+        with self._db() as db:
+            db.execute("DELETE FROM entries WHERE username = ?", (key,))
+            self._write(db, key, changes)
+            db.execute(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    json.dumps(favorites),
+                    _max_updated(changes["anime"]),
+                    _max_updated(changes["manga"]),
+                    now,
+                    now,
+                ),
+            )
+
+    def merge(self, username: str, anime_changes, manga_changes, favorites):
+        """Upsert entries changed since the last refresh and move the
+        watermarks forward."""
+        key = username.lower()
+        changes = {"anime": anime_changes, "manga": manga_changes}
+        state = self.state(username)
+        with self._db() as db:
+            self._write(db, key, changes)
+            db.execute(
+                "UPDATE users SET favorites = ?, anime_updated_at = ?,"
+                " manga_updated_at = ?, refreshed_at = ? WHERE username = ?",
+                (
+                    json.dumps(favorites),
+                    max(state["anime_updated_at"], _max_updated(anime_changes)),
+                    max(state["manga_updated_at"], _max_updated(manga_changes)),
+                    time.time(),
+                    key,
+                ),
+            )
+
+    def _write(self, db, key, changes):
+        for type_, entries in changes.items():
+            db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (
+                    (key, type_, e.id, e.updated_at or 0, json.dumps(e.to_json()))
+                    for e in entries
+                ),
+            )
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None and DEFAULT_PATH:
+        _store = ListStore(DEFAULT_PATH)
+    return _store
+
+
+def set_store(store):
+    global _store
+    _store = store
@@ -0,0 +1,911 @@
+import asyncio
+import os
+import json
+import hashlib
+import logging
+import re
+import tempfile
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "COVER_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "covers"),
+)
+
+PROXY_CACHE_DIR = os.environ.get(
+    "PROXY_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "proxy"),
+)
+
+THUMB_CACHE_DIR = os.environ.get(
+    "THUMB_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "thumbs"),
+)
+
+# Hosts the proxy fetches from: AniList's image CDN.
+PROXY_ALLOWED_HOSTS = tuple(
+    host.strip()
+    for host in os.environ.get("PROXY_ALLOWED_HOSTS", "s4.anilist.co").split(",")
+    if host.strip()
+)
+
+PLACEHOLDER_COLOR = "#1a1a1a"
+
+# Widths of the report's cover variants, cropped to the 2:3 cover aspect.
+THUMB_WIDTHS = (160, 320, 640)
+COLLAGE_TILE = (100, 150)
+COLLAGE_COLUMNS = 10
+THUMB_NAME = re.compile(
+    r"(?:(?P<collage>collage-[0-9a-f]{20})"
+    r"|(?P<digest>[0-9a-f]{20})-(?P<width>\d+))\.webp"
+)
+
+
+def make_session(pool_size=16):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of ``etag`` against an ``If-None-Match`` header."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag):
+        return tag.strip().removeprefix("W/")
+
+    return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
+
+
+class CoverFetcher:
+    """Fetches cover images already decoded and resized for the share card.
+
+    Thumbnails are kept in a byte-bounded in-memory LRU and as PNGs in
+    ``cache_dir``, so a popular cover is downloaded once per deployment
+    rather than once per card. Concurrent requests for the same URL and size
+    share one download. ``loader`` turns a URL into a PIL image and defaults
+    to an HTTP GET over a pooled session.
+    """
+
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        max_memory_bytes=64 * 1024 * 1024,
+        max_disk_items=5000,
+        timeout=15,
+        workers=8,
+        loader=None,
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_items = max_disk_items
+        self.timeout = timeout
+        self.loader = loader or self._download
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "downloads": 0, "errors": 0}
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._session = make_session(workers * 2)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="covers")
+        self._disk_writes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, url, size):
+        """Return ``url`` as an RGB image resized to ``size``; a placeholder if
+        it can't be fetched."""
+        return self._future(url, size).result()
+
+    def get_many(self, urls, size):
+        """Fetch several covers at the same time."""
+        futures = [self._future(url, size) for url in urls]
+        return [f.result() for f in futures]
+
+    def _future(self, url, size):
+        key = (url, tuple(size))
+        if not url:
+            done = Future()
+            done.set_result(Image.new("RGB", key[1], color=PLACEHOLDER_COLOR))
+            return done
+
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                done = Future()
+                done.set_result(img.copy())
+                return done
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = self._executor.submit(self._load, key)
+                self._inflight[key] = inflight
+        return _CopyingFuture(inflight)
+
+    def _load(self, key):
+        url, size = key
+        try:
+            img = self._read_disk(key)
+            if img is None:
+                img = self.loader(url).convert("RGB")
+                img = img.resize(size, Image.Resampling.LANCZOS)
+                self.stats["downloads"] += 1
+                self._write_disk(key, img)
+            self._remember(key, img)
+            return img
+        except Exception as e:
+            logger.warning("Error downloading image %s: %s", url, e)
+            self.stats["errors"] += 1
+            return Image.new("RGB", size, color=PLACEHOLDER_COLOR)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _download(self, url):
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return Image.open(BytesIO(response.content))
+
+    def _remember(self, key, img):
+        cost = img.width * img.height * len(img.getbands())
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = img
+            self._memory_bytes += cost
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._memory_bytes -= old.width * old.height * len(old.getbands())
+
+    def _path(self, key):
+        url, (width, height) = key
+        digest = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}-{width}x{height}.png")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with Image.open(self._path(key)) as img:
+                img.load()
+                self.stats["disk_hits"] += 1
+                return img.convert("RGB")
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, img):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp, "PNG", compress_level=1)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        try:
+            paths = [
+                os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir)
+                if name.endswith(".png")
+            ]
+            if len(paths) <= self.max_disk_items:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[: len(paths) - self.max_disk_items]:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class _CopyingFuture:
+    """Hands every waiter on a shared download its own copy of the image."""
+
+    def __init__(self, future):
+        self._future = future
+
+    def result(self, timeout=None):
+        return self._future.result(timeout).copy()
+
+
+class ProxyRejected(ValueError):
+    """A URL the proxy does not fetch, or an upstream response it does not
+    relay."""
+
+
+class ProxiedImage:
+    """One proxy response: either a cached ``body`` or a ``chunks`` iterator
+    streaming straight from upstream."""
+
+    def __init__(
+        self, status, content_type, etag, body=None, chunks=None, upstream=None
+    ):
+        self.status = status
+        self.content_type = content_type
+        self.etag = etag
+        self.body = body
+        self.chunks = chunks
+        self._upstream = upstream
+
+    @property
+    def cached(self):
+        return self.body is not None
+
+    def close(self):
+        """Release the upstream connection of a response that won't be sent."""
+        if self._upstream is not None:
+            self._upstream.close()
+
+    async def aclose(self):
+        if self._upstream is not None:
+            await self._upstream.aclose()
+
+
+class ImageProxy:
+    """Streaming image proxy with a size-bounded memory and disk cache.
+
+    Misses are streamed to the client chunk by chunk while being teed into
+    the cache, so nothing is buffered before the first byte goes out. Cover
+    URLs on the AniList CDN never change content, so the upstream ``ETag``
+    (or a hash of the URL when there is none) is a stable validator.
+
+    Only ``allowed_hosts`` are fetched, without following redirects, and
+    only ``image/*`` responses are relayed and cached, so the proxy cannot
+    be used to serve arbitrary content.
+    """
+
+    def __init__(
+        self,
+        cache_dir=PROXY_CACHE_DIR,
+        max_memory_bytes=32 * 1024 * 1024,
+        max_disk_bytes=512 * 1024 * 1024,
+        max_item_bytes=2 * 1024 * 1024,
+        chunk_size=64 * 1024,
+        timeout=10,
+        session=None,
+        allowed_hosts=PROXY_ALLOWED_HOSTS,
+    ):
+        self.cache_dir = cache_dir
+        self.allowed_hosts = frozenset(allowed_hosts)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_item_bytes = max_item_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._session = session or make_session(32)
+        self._http = None
+        self._loop = None
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    def check_url(self, url):
+        """Raise ``ProxyRejected`` unless ``url`` is on an allowed host."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or (
+            parts.hostname not in self.allowed_hosts
+        ):
+            raise ProxyRejected("URL is not on an allowed image host")
+
+    def _check_type(self, upstream, content_type):
+        if upstream.status_code == 200 and not (content_type or "").startswith(
+            "image/"
+        ):
+            raise ProxyRejected("Upstream response is not an image")
+
+    def open(self, url):
+        self.check_url(url)
+        hit = self.lookup(url)
+        if hit is not None:
+            return hit
+
+        self.stats["misses"] += 1
+        upstream = self._session.get(
+            url, timeout=self.timeout, stream=True, allow_redirects=False
+        )
+        content_type = upstream.headers.get("content-type")
+        try:
+            self._check_type(upstream, content_type)
+        except ProxyRejected:
+            upstream.close()
+            raise
+        etag = upstream.headers.get("etag") or self._default_etag(url)
+        if upstream.status_code != 200:
+            return ProxiedImage(
+                upstream.status_code,
+                content_type,
+                None,
+                chunks=self._relay(upstream, None),
+                upstream=upstream,
+            )
+        return ProxiedImage(
+            200,
+            content_type,
+            etag,
+            chunks=self._relay(upstream, (url, content_type, etag)),
+            upstream=upstream,
+        )
+
+    async def aopen(self, url):
+        """``open`` for the event loop, streaming misses over a pooled
+        ``httpx.AsyncClient``."""
+        self.check_url(url)
+        hit = await asyncio.to_thread(self.lookup, url)
+        if hit is not None:
+            return hit
+
+        self.stats["misses"] += 1
+        client = self._async_client()
+        upstream = await client.send(client.build_request("GET", url), stream=True)
+        content_type = upstream.headers.get("content-type")
+        try:
+            self._check_type(upstream, content_type)
+        except ProxyRejected:
+            await upstream.aclose()
+            raise
+        etag = upstream.headers.get("etag") or self._default_etag(url)
+        if upstream.status_code != 200:
+            return ProxiedImage(
+                upstream.status_code,
+                content_type,
+                None,
+                chunks=self._arelay(upstream, None),
+                upstream=upstream,
+            )
+        return ProxiedImage(
+            200,
+            content_type,
+            etag,
+            chunks=self._arelay(upstream, (url, content_type, etag)),
+            upstream=upstream,
+        )
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            self._http = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                timeout=self.timeout,
+                follow_redirects=False,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+            )
+            self._loop = loop
+        return self._http
+
+    async def aclose(self):
+        """Close the connections ``aopen`` pooled; call on the loop serving it."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._loop = None
+
+    def lookup(self, url):
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                self._memory.move_to_end(url)
+                self.stats["memory_hits"] += 1
+                body, content_type, etag = entry
+                return ProxiedImage(200, content_type, etag, body=body)
+
+        entry = self._read_disk(url)
+        if entry is not None:
+            self.stats["disk_hits"] += 1
+            self._remember(url, *entry)
+            body, content_type, etag = entry
+            return ProxiedImage(200, content_type, etag, body=body)
+        return None
+
+    def _relay(self, upstream, cache_as):
+        buffered = []
+        size = 0
+        try:
+            for chunk in upstream.iter_content(self.chunk_size):
+                yield chunk
+                if cache_as is not None:
+                    size += len(chunk)
+                    if size > self.max_item_bytes:
+                        cache_as = None
+                        buffered = []
+                    else:
+                        buffered.append(chunk)
+            if cache_as is not None:
+                url, content_type, etag = cache_as
+                body = b"".join(buffered)
+                self._remember(url, body, content_type, etag)
+                self._write_disk(url, body, content_type, etag)
+        finally:
+            upstream.close()
+
+    async def _arelay(self, upstream, cache_as):
+        buffered = []
+        size = 0
+        try:
+            async for chunk in upstream.aiter_bytes(self.chunk_size):
+                yield chunk
+                if cache_as is not None:
+                    size += len(chunk)
+                    if size > self.max_item_bytes:
+                        cache_as = None
+                        buffered = []
+                    else:
+                        buffered.append(chunk)
+            if cache_as is not None:
+                url, content_type, etag = cache_as
+                body = b"".join(buffered)
+                self._remember(url, body, content_type, etag)
+                await asyncio.to_thread(self._write_disk, url, body, content_type, etag)
+        finally:
+            await upstream.aclose()
+
+    def _default_etag(self, url):
+        return '"' + hashlib.sha1(url.encode()).hexdigest() + '"'
+
+    def _remember(self, url, body, content_type, etag):
+        with self._lock:
+            if url in self._memory:
+                return
+            self._memory[url] = (body, content_type, etag)
+            self._memory_bytes += len(body)
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, (old, _, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old)
+
+    def _path(self, url):
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".img"
+        )
+
+    def _read_disk(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(url), "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return body, meta["content_type"], meta["etag"]
+
+    def _write_disk(self, url, body, content_type, etag):
+        if not self.cache_dir:
+            return
+        path = self._path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        meta = json.dumps({"url": url, "content_type": content_type, "etag": etag})
+        try:
+            with open(tmp, "wb") as f:
+                f.write(meta.encode() + b"\n")
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_bytes += len(body)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune_disk()
+
+    def _disk_files(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".img"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _prune_disk(self):
+        """Drop the oldest files until the cache is back under 90% of its
+        budget."""
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:20]
+
+
+def thumb_url(url, width=320):
+    """URL of ``url``'s ``width`` WebP variant, for covers registered with
+    ``ThumbnailStore.prepare``."""
+    if not url:
+        return url
+    return f"/api/thumbs/{_digest(url)}-{width}.webp"
+
+
+def thumb_srcset(url):
+    if not url:
+        return ""
+    return ", ".join(f"{thumb_url(url, w)} {w}w" for w in THUMB_WIDTHS)
+
+
+class ThumbnailStore:
+    """Small WebP variants of the covers a report shows, and its collage as
+    one sprite image.
+
+    ``prepare`` registers a report's covers under content-addressed names,
+    so the rendered page can point at ``/api/thumbs/...`` and only covers a
+    report selected can be fetched through it, then builds them in the
+    background. Every width of a cover comes from one download; variants
+    that aren't built yet when the browser asks are built on demand, with
+    concurrent requests sharing one build. Sources and variants live in
+    ``cache_dir`` so every worker sees them.
+    """
+
+    def __init__(
+        self,
+        cache_dir=THUMB_CACHE_DIR,
+        quality=70,
+        max_disk_items=20000,
+        timeout=15,
+        workers=4,
+        loader=None,
+    ):
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.max_disk_items = max_disk_items
+        self.timeout = timeout
+        self.loader = loader or self._download
+        self.stats = {"disk_hits": 0, "built": 0, "errors": 0}
+
+        self._sources = {}
+        self._bodies = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._session = make_session(workers * 2)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="thumbs")
+        self._disk_writes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def prepare(self, report):
+        """Register every cover in ``report``, start building the missing
+        variants and return the collage sprite's layout for the template
+        (``None`` without a collage)."""
+        covers = list(dict.fromkeys(_cover_images(report)))
+        for url in covers:
+            self._register(_digest(url), url)
+
+        collage = (report.get("overall") or {}).get("collage_covers") or []
+        sprite = None
+        if collage:
+            key = _digest("\n".join(collage))
+            self._register(f"collage-{key}", json.dumps(collage))
+            rows = -(-len(collage) // COLLAGE_COLUMNS)
+            columns = min(len(collage), COLLAGE_COLUMNS)
+            sprite = {
+                "url": f"/api/thumbs/collage-{key}.webp",
+                "columns": columns,
+                "rows": rows,
+                "tiles": [
+                    (
+                        _percent(i % COLLAGE_COLUMNS, columns),
+                        _percent(i // COLLAGE_COLUMNS, rows),
+                    )
+                    for i in range(len(collage))
+                ],
+            }
+
+        names = [f"{_digest(url)}-{THUMB_WIDTHS[0]}.webp" for url in covers]
+        if sprite:
+            names.append(sprite["url"].rsplit("/", 1)[1])
+        for name in names:
+            if not self._exists(name):
+                self._build(name)
+        return sprite
+
+    def get(self, name):
+        """WebP bytes of the variant or sprite ``name``; ``None`` if it was
+        never registered."""
+        body = self._read(name)
+        if body is not None:
+            self.stats["disk_hits"] += 1
+            return body
+        parsed = self._parse(name)
+        if parsed is None:
+            return None
+        built = self._build(name).result()
+        key, width = parsed
+        return built if width is None or built is None else built[width]
+
+    def _build(self, name):
+        """Future of a cover's variants by width, or of a sprite's bytes.
+        Every width of a cover shares one build."""
+        key, width = self._parse(name)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                make = self._make_collage if width is None else self._make_thumbs
+                future = self._executor.submit(self._make, key, make)
+                self._inflight[key] = future
+        return future
+
+    def _make(self, key, make):
+        try:
+            return make(key)
+        except Exception as e:
+            logger.exception("Error building thumbnail %s: %s", key, e)
+            self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _make_thumbs(self, digest):
+        url = self._source(digest)
+        if url is None:
+            return None
+        img = self.loader(url).convert("RGB")
+        variants = {}
+        for width in THUMB_WIDTHS:
+            size = (width, width * 3 // 2)
+            thumb = ImageOps.fit(img, size, Image.Resampling.LANCZOS)
+            variants[width] = self._encode(thumb)
+            self._write(f"{digest}-{width}.webp", variants[width])
+        self.stats["built"] += 1
+        return variants
+
+    def _make_collage(self, key):
+        source = self._source(key)
+        if source is None:
+            return None
+        covers = json.loads(source)
+        rows = -(-len(covers) // COLLAGE_COLUMNS)
+        columns = min(len(covers), COLLAGE_COLUMNS)
+        tile_w, tile_h = COLLAGE_TILE
+        sprite = Image.new("L", (columns * tile_w, rows * tile_h), color=26)
+        for i, url in enumerate(covers):
+            tile = self._tile(url)
+            if tile is not None:
+                x = (i % COLLAGE_COLUMNS) * tile_w
+                y = (i // COLLAGE_COLUMNS) * tile_h
+                sprite.paste(tile, (x, y))
+        body = self._encode(sprite)
+        self._write(f"{key}.webp", body)
+        self.stats["built"] += 1
+        return body
+
+    def _tile(self, url):
+        """The collage tile of ``url``, cut from its smallest variant. A
+        variant already being built is waited for; one that is only queued
+        is built here, since waiting on the pool from inside it could
+        deadlock."""
+        digest = _digest(url)
+        name = f"{digest}-{THUMB_WIDTHS[0]}.webp"
+        try:
+            body = self._read(name)
+            if body is None:
+                with self._lock:
+                    future = self._inflight.get(digest)
+                if future is not None and (future.running() or future.done()):
+                    variants = future.result()
+                else:
+                    variants = self._make_thumbs(digest)
+                body = variants and variants[THUMB_WIDTHS[0]]
+            if body is None:
+                return None
+            with Image.open(BytesIO(body)) as img:
+                return img.convert("L").resize(COLLAGE_TILE, Image.Resampling.LANCZOS)
+        except Exception as e:
+            logger.warning("Error building collage tile %s: %s", url, e)
+            self.stats["errors"] += 1
+            return None
+
+    def _encode(self, img):
+        out = BytesIO()
+        img.save(out, "WEBP", quality=self.quality, method=4)
+        return out.getvalue()
+
+    def _download(self, url):
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return Image.open(BytesIO(response.content))
+
+    def _parse(self, name):
+        """``(key, width)`` of a variant name, ``(key, None)`` for a sprite."""
+        match = THUMB_NAME.fullmatch(name)
+        if match is None:
+            return None
+        if match["collage"]:
+            return match["collage"], None
+        width = int(match["width"])
+        return (match["digest"], width) if width in THUMB_WIDTHS else None
+
+    def _register(self, key, source):
+        with self._lock:
+            if key in self._sources:
+                return
+            self._sources[key] = source
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, f"{key}.src")
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(source)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _source(self, key):
+        with self._lock:
+            source = self._sources.get(key)
+        if source is not None or not self.cache_dir:
+            return source
+        try:
+            with open(os.path.join(self.cache_dir, f"{key}.src")) as f:
+                source = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._sources[key] = source
+        return source
+
+    def _exists(self, name):
+        if not self.cache_dir:
+            with self._lock:
+                return name in self._bodies
+        return os.path.exists(os.path.join(self.cache_dir, name))
+
+    def _read(self, name):
+        if self._parse(name) is None:
+            return None
+        if not self.cache_dir:
+            with self._lock:
+                return self._bodies.get(name)
+        try:
+            with open(os.path.join(self.cache_dir, name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, name, body):
+        if not self.cache_dir:
+            with self._lock:
+                self._bodies[name] = body
+                while len(self._bodies) > self.max_disk_items:
+                    self._bodies.popitem(last=False)
+            return
+        path = os.path.join(self.cache_dir, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        try:
+            paths = [
+                os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir)
+                if name.endswith(".webp")
+            ]
+            if len(paths) <= self.max_disk_items:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[: len(paths) - self.max_disk_items]:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _cover_images(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "cover_image" and isinstance(item, str) and item:
+                yield item
+            elif key == "collage_covers":
+                yield from (url for url in item if url)
+            else:
+                yield from _cover_images(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _cover_images(item)
+
+
+def _percent(index, count):
+    return round(index * 100 / (count - 1), 4) if count > 1 else 0
+
+
+_fetcher = None
+_proxy = None
+_thumbs = None
+_fetcher_lock = threading.Lock()
+
+
+def get_cover_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = CoverFetcher()
+    return _fetcher
+
+
+def set_cover_fetcher(fetcher):
+    global _fetcher
+    _fetcher = fetcher
+
+
+def get_image_proxy():
+    global _proxy
+    with _fetcher_lock:
+        if _proxy is None:
+            _proxy = ImageProxy()
+    return _proxy
+
+
+def set_image_proxy(proxy):
+    global _proxy
+    _proxy = proxy
+
+
+def get_thumbnail_store():
+    global _thumbs
+    with _fetcher_lock:
+        if _thumbs is None:
+            _thumbs = ThumbnailStore()
+    return _thumbs
+
+
+def set_thumbnail_store(store):
+    global _thumbs
+    _thumbs = store
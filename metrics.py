@@ -0,0 +1,218 @@
+"""Lightweight in-process instrumentation.
+
+``span(stage)`` times a block and feeds the per-stage summary (count, sum
+and p50/p95/p99 over the most recent samples); ``inc`` bumps a labelled
+counter. ``render`` formats both, plus any stats dicts passed in, in the
+Prometheus text format for the ``/metrics`` route.
+
+Spans also land in the current request's timings when it asked for them
+(``collect``), which the apps send back as a ``Server-Timing`` header.
+Numbers are per process: with several workers, scrape each of them.
+"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PREFIX = "wrapped"
+QUANTILES = (0.5, 0.95, 0.99)
+
+_timings = ContextVar("timings", default=None)
+
+
+class Summary:
+    """Count and total of every observation, and quantiles over the last
+    ``window`` of them."""
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self, qs=QUANTILES):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: math.nan for q in qs}
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(q * len(ordered)))] for q in qs}
+
+
+class Registry:
+    def __init__(self, window=1024):
+        self.window = window
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            summary = self._stages.get(stage)
+            if summary is None:
+                summary = self._stages[stage] = Summary(self.window)
+            summary.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self, gauges=None):
+        """Prometheus text exposition of every stage and counter, plus
+        ``gauges``: ``{group: stats dict}`` exported as
+        ``wrapped_<group>{stat="<key>"}``, skipping non-numeric values."""
+        with self._lock:
+            summaries = sorted(
+                (stage, s.count, s.total, s.quantiles())
+                for stage, s in self._stages.items()
+            )
+            counters = sorted(self._counters.items())
+
+        lines = [f"# TYPE {PREFIX}_stage_seconds summary"]
+        for stage, count, total, quantiles in summaries:
+            label = f'stage="{stage}"'
+            for q, value in quantiles.items():
+                lines.append(
+                    f'{PREFIX}_stage_seconds{{{label},quantile="{q}"}} {value:.6f}'
+                )
+            lines.append(f"{PREFIX}_stage_seconds_sum{{{label}}} {total:.6f}")
+            lines.append(f"{PREFIX}_stage_seconds_count{{{label}}} {count}")
+
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+        for group, stats in (gauges or {}).items():
+            metric = f"{PREFIX}_{group}"
+            lines.append(f"# TYPE {metric} gauge")
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'{metric}{{stat="{stat}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def record(stage, seconds):
+    """Account ``seconds`` spent in ``stage``, timed elsewhere (say in a worker
+    process), like a finished ``span``."""
+    get_registry().observe(stage, seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """Decorator running a function (or coroutine function) in a ``span``."""
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return run
+
+    return decorate
+
+
+def inc(name, value=1, **labels):
+    get_registry().inc(name, value, **labels)
+
+
+@contextmanager
+def collect():
+    """Gather the ``(stage, seconds)`` of every span finished in this context,
+    including tasks and ``asyncio.to_thread`` calls started from it, into the
+    yielded list."""
+    timings = []
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+async def bound(coro, timings):
+    """Await ``coro`` with its spans gathered into ``timings``, for
+    coroutines handed to an event loop in another thread."""
+    token = _timings.set(timings)
+    try:
+        return await coro
+    finally:
+        _timings.reset(token)
+
+
+def begin():
+    """Start collecting spans in this context, until ``end`` is called with
+    the returned token; for frameworks with separate before/after hooks."""
+    return _timings.set([])
+
+
+def end(token):
+    """Stop collecting and return the ``(stage, seconds)`` gathered."""
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings
+
+
+def current_timings():
+    return _timings.get()
+
+
+def server_timing(timings, total=None):
+    """``Server-Timing`` header value, one entry per stage with the time of
+    its spans summed."""
+    durations = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    if total is not None:
+        durations["total"] = total
+    return ", ".join(f"{stage};dur={s * 1000:.1f}" for stage, s in durations.items())
+
+
+_registry = Registry()
+
+
+def get_registry():
+    return _registry
+
+
+def set_registry(registry):
+    global _registry
+    _registry = registry
@@ -0,0 +1,300 @@
+"""Pre-compute rewinds for a list of users ahead of a traffic spike.
+
+Fetches each user's lists through a bounded pool of coroutines sharing one
+rate-limited AniList client, aggregates them in a process pool and writes
+the result into the same result cache and share store the servers read,
+under the keys the servers look up (every year's reports with the list
+store, each year's report on its own without it), so the first visit is
+served without touching AniList.
+
+Every finished user is appended to a journal with the years warmed, and a
+rerun with the same journal skips the years already warmed, so an
+interrupted run resumes where it stopped. Users that failed are retried on
+the next run.
+
+    python prewarm.py users.txt --year 2025 --concurrency 8 --rate 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data import AniListClient, fetch_all, fetch_cached, get_store  # noqa: E402
+from data.client import ANILIST_API_URL  # noqa: E402
+from data.scheduler import (  # noqa: E402
+    PRIORITY_BACKGROUND,
+    RequestScheduler,
+    TokenBucket,
+    priority,
+)
+from results import get_result_cache, rewind_key, rewinds_key  # noqa: E402
+from rewind import build_rewind, build_rewind_multi  # noqa: E402
+from shares import get_share_store  # noqa: E402
+
+EMPTY_LIST = []
+# Seconds the warmed rewinds stay fresh in the result cache.
+DEFAULT_TTL = 7 * 24 * 3600
+PROGRESS_EVERY = 5.0
+
+
+def read_usernames(path):
+    """Usernames in ``path``, one per line, without blanks, ``#`` comments
+    and case-insensitive repeats."""
+    seen = set()
+    usernames = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name = line.split("#", 1)[0].strip()
+            if name and name.lower() not in seen:
+                seen.add(name.lower())
+                usernames.append(name)
+    return usernames
+
+
+class Journal:
+    """Append-only record of finished users, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done(self):
+        """The years recorded as warmed, by lowercased username."""
+        if not os.path.exists(self.path):
+            return {}
+        done = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash.
+                    continue
+                if record.get("status") == "ok":
+                    years = done.setdefault(record["username"].lower(), set())
+                    years.update(record.get("years", ()))
+        return done
+
+    def record(self, username, status, **fields):
+        line = json.dumps({"username": username, "status": status, **fields})
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class Progress:
+    """Counts finished users and estimates the time left from the rate so
+    far in this run."""
+
+    def __init__(self, total, every=PROGRESS_EVERY):
+        self.total = total
+        self.every = every
+        self.ok = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._printed = self.started
+
+    @property
+    def finished(self):
+        return self.ok + self.failed
+
+    def update(self, ok):
+        if ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._printed >= self.every or self.finished == self.total:
+            self._printed = now
+            print(self.line())
+
+    def line(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.finished / elapsed if elapsed else 0.0
+        left = self.total - self.finished
+        eta = f"{left / rate:,.0f} s" if rate else "unknown"
+        return (
+            f"{self.finished}/{self.total} users"
+            f"  {self.ok} warmed, {self.failed} failed"
+            f"  {rate * 60:,.1f} users/min  ETA {eta}"
+        )
+
+
+def aggregate(anime, manga, favorites, years):
+    """Every year's report, as ``rewind_reports`` caches them, plus the
+    reports for ``years``, as ``rewind_for`` returns them. Runs in a worker
+    process."""
+    reports = build_rewind_multi(anime, manga, favorites)
+    requested = {}
+    for year in years:
+        report = reports.get(year)
+        if report is None:
+            report = build_rewind(EMPTY_LIST, EMPTY_LIST, favorites, year)
+        requested[year] = dict(report)
+    return {"favorites": favorites, "reports": reports}, requested
+
+
+def pending_years(usernames, years, done):
+    """``(username, years)`` for every user with a year in ``years`` that
+    ``done`` (``Journal.done()``) does not have."""
+    pending = []
+    for username in usernames:
+        warmed = done.get(username.lower(), ())
+        missing = [year for year in years if year not in warmed]
+        if missing:
+            pending.append((username, missing))
+    return pending
+
+
+class Prewarmer:
+    """Fetches, aggregates and stores rewinds for many users.
+
+    At most ``concurrency`` users are in flight at once; their AniList
+    requests are paced by the client's scheduler, at ``PRIORITY_BACKGROUND``
+    so a client shared with a server yields to its visitors, and aggregation
+    runs in ``pool``. With the list store one fetch per user covers every
+    year; without it each year is fetched on its own, as the servers do.
+    """
+
+    def __init__(self, client, pool, journal, ttl=DEFAULT_TTL):
+        self.client = client
+        self.pool = pool
+        self.journal = journal
+        self.ttl = ttl
+        self.store = get_store()
+        self.results = get_result_cache()
+        self.shares = get_share_store()
+
+    async def warm(self, username, years):
+        """Warm ``username``'s reports for ``years``; returns their shareIds."""
+        if self.store is None:
+            requested = {}
+            for year in years:
+                requested[year] = await self.warm_year(username, year)
+        else:
+            with priority(PRIORITY_BACKGROUND):
+                lists = await fetch_cached(username, self.store, self.client)
+            loop = asyncio.get_running_loop()
+            cached, requested = await loop.run_in_executor(
+                self.pool, aggregate, *lists, years
+            )
+            await asyncio.to_thread(
+                self.results.set, rewinds_key(username), cached, self.ttl
+            )
+        await asyncio.to_thread(self.save, username, requested)
+        return [report["shareId"] for report in requested.values()]
+
+    async def warm_year(self, username, year):
+        """``username``'s report for ``year`` from a year-scoped fetch, cached
+        as ``rewind_for`` caches it without the list store."""
+        with priority(PRIORITY_BACKGROUND):
+            lists = await fetch_all(username, self.client, year=year)
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(self.pool, build_rewind, *lists, year)
+        await asyncio.to_thread(
+            self.results.set, rewind_key(username, year), report, self.ttl
+        )
+        return dict(report)
+
+    def save(self, username, requested):
+        for report in requested.values():
+            report["username"] = username
+            report["generatedAt"] = datetime.now().isoformat()
+            self.shares.put(report)
+
+    async def run(self, pending, concurrency):
+        """Warm every ``(username, years)`` of ``pending``."""
+        queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+        progress = Progress(len(pending))
+
+        async def worker():
+            while not queue.empty():
+                username, years = queue.get_nowait()
+                try:
+                    share_ids = await self.warm(username, years)
+                except Exception as e:
+                    print(f"Error warming {username}: {e}")
+                    self.journal.record(username, "error", error=str(e))
+                    progress.update(False)
+                else:
+                    self.journal.record(
+                        username, "ok", years=years, shareIds=share_ids
+                    )
+                    progress.update(True)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return progress
+
+
+async def prewarm(pending, journal, concurrency, rate, url, processes, ttl):
+    scheduler = RequestScheduler(TokenBucket(capacity=rate))
+    client = AniListClient(url=url, scheduler=scheduler)
+    try:
+        with ProcessPoolExecutor(processes) as pool:
+            warmer = Prewarmer(client, pool, journal, ttl)
+            return await warmer.run(pending, concurrency)
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("users", help="file with one username per line")
+    parser.add_argument(
+        "--year",
+        type=int,
+        action="append",
+        help="year to store a share for (repeatable, default: this year)",
+    )
+    parser.add_argument(
+        "--journal", help="progress file to resume from (default: USERS.done)"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--rate",
+        type=int,
+        default=60,
+        help="AniList requests per minute; leave headroom for live traffic",
+    )
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL)
+    parser.add_argument("--url", default=ANILIST_API_URL)
+    args = parser.parse_args()
+
+    if get_result_cache() is None:
+        parser.error("RESULT_CACHE_PATH is empty, so there is no cache to warm")
+
+    years = args.year or [datetime.utcnow().year]
+    journal = Journal(args.journal or f"{args.users}.done")
+    usernames = read_usernames(args.users)
+    pending = pending_years(usernames, years, journal.done())
+    print(
+        f"{len(usernames)} users, {len(usernames) - len(pending)} already warmed,"
+        f" {len(pending)} to go; years {', '.join(map(str, years))}"
+    )
+    if not pending:
+        return
+
+    progress = asyncio.run(
+        prewarm(
+            pending,
+            journal,
+            args.concurrency,
+            args.rate,
+            args.url,
+            args.processes,
+            args.ttl,
+        )
+    )
+    print(f"done in {time.monotonic() - progress.started:,.1f} s: {progress.line()}")
+
+
+if __name__ == "__main__":
+    main()
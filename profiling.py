@@ -0,0 +1,311 @@
+"""Opt-in sampling profiler for single production requests.
+
+A request is profiled when it sends ``X-Profile: <PROFILE_TOKEN>`` or is
+picked at random at ``PROFILE_SAMPLE_RATE``. While it runs, a sampler thread
+records the stacks of the threads doing its work every ``PROFILE_INTERVAL``
+seconds, so the request itself runs unmodified and only competes with the
+sampler for the GIL. The slowest ``max_profiles`` profiles are kept, with
+the hottest stacks, the input sizes the handlers annotated and a hash of the
+username, and can be downloaded as pstats (for snakeviz and friends) or
+speedscope JSON.
+
+Samples are wall-clock, each weighted by the time since the previous one
+(the sampler falls behind while the request holds the GIL): time spent
+waiting on AniList shows up as stacks blocked in the fetch. At most
+``max_active`` requests are profiled at once.
+"""
+
+import hashlib
+import heapq
+import hmac
+import itertools
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_HEADER = "X-Profile"
+
+_current = ContextVar("profile", default=None)
+
+
+def user_hash(username):
+    """Stable, non-reversible id for a username, so slow profiles of the same
+    user can be grouped without storing who they are."""
+    if not username:
+        return None
+    return hashlib.sha256(username.lower().encode()).hexdigest()[:12]
+
+
+def entry_count(entries):
+    """Entries in a fetched list, which is None when nothing was fetched."""
+    return len(entries) if entries else 0
+
+
+def _frame_key(code):
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _label(key):
+    filename, lineno, name = key
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+class RequestProfile:
+    """The stacks sampled during one request, root first, with how often
+    each was seen and the time it accounts for."""
+
+    def __init__(self, endpoint, username=None, interval=PROFILE_INTERVAL):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.user = user_hash(username)
+        self.interval = interval
+        self.inputs = {}
+        self.samples = Counter()
+        self.seconds = Counter()
+        self.started_at = time.time()
+        self.wall = None
+        self.cpu = None
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._start
+        self.cpu = time.process_time() - self._cpu_start
+
+    def top_stacks(self, n=10):
+        """The ``n`` stacks sampled most often, leaf last."""
+        return [
+            {"ms": round(seconds * 1000, 1), "stack": [_label(k) for k in stack]}
+            for stack, seconds in self.seconds.most_common(n)
+        ]
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "user": self.user,
+            "startedAt": self.started_at,
+            "wall_ms": round(self.wall * 1000, 1),
+            # Process CPU during the request, including concurrent requests.
+            "cpu_ms": round(self.cpu * 1000, 1),
+            "samples": sum(self.samples.values()),
+            "inputs": self.inputs,
+            "top_stacks": self.top_stacks(5),
+        }
+
+    def pstats(self):
+        """The samples as a ``pstats`` dump: times are sampled time, and call
+        counts are the number of samples a function was on the stack in (a
+        sampler cannot see calls)."""
+        stats = {}
+        for stack, count in self.samples.items():
+            seconds = self.seconds[stack]
+            for i, key in enumerate(stack):
+                if key in stack[:i]:
+                    continue  # Recursion: count each function once per sample.
+                cc, nc, tt, ct, callers = stats.get(key, (0, 0, 0.0, 0.0, {}))
+                tt += seconds if i == len(stack) - 1 else 0.0
+                stats[key] = (cc + count, nc + count, tt, ct + seconds, callers)
+                if i:
+                    caller = stack[i - 1]
+                    ccc, cnc, ctt, cct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    own = seconds if i == len(stack) - 1 else 0.0
+                    callers[caller] = (
+                        ccc + count,
+                        cnc + count,
+                        ctt + own,
+                        cct + seconds,
+                    )
+        return marshal.dumps(stats)
+
+    def speedscope(self):
+        """The samples in speedscope's file format, one sampled profile."""
+        frames = {}
+        samples = []
+        weights = []
+        for stack, seconds in self.seconds.items():
+            samples.append([frames.setdefault(key, len(frames)) for key in stack])
+            weights.append(seconds * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.endpoint} {self.id}",
+            "exporter": "anilist-wrapped",
+            "shared": {
+                "frames": [
+                    {"name": name, "file": filename, "line": lineno}
+                    for filename, lineno, name in frames
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.endpoint,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile, threads):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.profile = profile
+        self.threads = threads
+        self._done = threading.Event()
+
+    def run(self):
+        samples = self.profile.samples
+        seconds = self.profile.seconds
+        last = time.perf_counter()
+        while not self._done.wait(self.profile.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frames = sys._current_frames()
+            for ident in self.threads():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    stack = tuple(reversed(stack))
+                    samples[stack] += 1
+                    seconds[stack] += elapsed
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class ProfileStore:
+    """The ``max_profiles`` slowest request profiles, by wall time."""
+
+    def __init__(
+        self,
+        token=PROFILE_TOKEN,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        max_profiles=20,
+        max_active=2,
+    ):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        self.stats = {"profiled": 0, "kept": 0, "skipped_busy": 0}
+        self._heap = []
+        self._counter = itertools.count()
+        self._slots = threading.BoundedSemaphore(max_active)
+        self._lock = threading.Lock()
+
+    def authorized(self, token):
+        """Whether ``token`` unlocks profiling; never without a configured
+        ``PROFILE_TOKEN``."""
+        return bool(self.token and token) and hmac.compare_digest(token, self.token)
+
+    def wanted(self, header=None):
+        if self.authorized(header):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def add(self, profile):
+        self.stats["profiled"] += 1
+        item = (profile.wall, next(self._counter), profile)
+        with self._lock:
+            if len(self._heap) < self.max_profiles:
+                heapq.heappush(self._heap, item)
+            elif profile.wall > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+            else:
+                return
+        self.stats["kept"] += 1
+
+    def list(self):
+        """Summaries of the kept profiles, slowest first."""
+        with self._lock:
+            profiles = [p for _, _, p in sorted(self._heap, reverse=True)]
+        return [p.summary() for p in profiles]
+
+    def get(self, profile_id):
+        with self._lock:
+            for _, _, profile in self._heap:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    @contextmanager
+    def maybe_profile(self, endpoint, header=None, username=None, threads=None):
+        """Profile the enclosed request if it asked for it or was sampled;
+        yields the ``RequestProfile`` or None. ``threads()`` returns the
+        idents of the threads to sample (default: the calling thread)."""
+        if not self.wanted(header):
+            yield None
+            return
+        if not self._slots.acquire(blocking=False):
+            self.stats["skipped_busy"] += 1
+            yield None
+            return
+
+        if threads is None:
+            ident = threading.get_ident()
+            threads = lambda: (ident,)  # noqa: E731
+        profile = RequestProfile(endpoint, username)
+        sampler = _Sampler(profile, threads)
+        token = _current.set(profile)
+        sampler.start()
+        try:
+            yield profile
+        finally:
+            sampler.stop()
+            profile.finish()
+            _current.reset(token)
+            self._slots.release()
+            self.add(profile)
+
+
+def active():
+    """The profile of the current request, if it is being profiled."""
+    return _current.get()
+
+
+def annotate(**inputs):
+    """Record input sizes on the current request's profile, if any."""
+    profile = _current.get()
+    if profile is not None:
+        profile.inputs.update(inputs)
+
+
+def identify(username):
+    """Set the (hashed) user of the current request's profile, if any."""
+    profile = _current.get()
+    if profile is not None:
+        profile.user = user_hash(username)
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def get_profile_store():
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = ProfileStore()
+    return _profiles
+
+
+def set_profile_store(store):
+    global _profiles
+    _profiles = store
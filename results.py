@@ -0,0 +1,388 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from data.scheduler import PRIORITY_BACKGROUND, priority
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get(
+    "RESULT_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "results.sqlite3"),
+)
+DEFAULT_TTL = int(os.environ.get("RESULT_CACHE_TTL", 3600))
+DEFAULT_STALE_TTL = int(os.environ.get("RESULT_STALE_TTL", 6 * 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    fresh_until REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# JSON objects only have string keys; dicts keyed by ints (years, scores) are
+# stored under this marker and get their int keys back when read.
+_INT_KEYS = "__int_keys__"
+
+
+def _to_json(value):
+    if isinstance(value, dict):
+        if value and all(isinstance(k, int) for k in value):
+            return {_INT_KEYS: {str(k): _to_json(v) for k, v in value.items()}}
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+def _from_json(obj):
+    if len(obj) == 1 and _INT_KEYS in obj:
+        return {int(k): v for k, v in obj[_INT_KEYS].items()}
+    return obj
+
+
+def dumps(value):
+    """``value`` as zlib-compressed JSON."""
+    data = json.dumps(_to_json(value), separators=(",", ":"))
+    return zlib.compress(data.encode(), 6)
+
+
+def loads(blob):
+    return json.loads(zlib.decompress(blob), object_hook=_from_json)
+
+
+def rewinds_key(username):
+    """Key of every year's reports for ``username``, as the servers cache
+    them with the list store."""
+    return f"rewinds:{username.lower()}"
+
+
+def rewind_key(username, year):
+    """Key of ``username``'s report for ``year`` alone, as the servers cache
+    it without the list store."""
+    return f"rewind:{username.lower()}:{year}"
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one: the first caller
+    runs the function and everyone arriving while it runs gets its result
+    (or its exception)."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            value = fn()
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines on one event loop: callers arriving
+    while a call for the same key is running await the same task."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class ResultCache:
+    """Computed results shared by every worker process.
+
+    Values are stored as zlib-compressed JSON in one SQLite file, so a rewind
+    built by one worker is served by all of them and survives a deploy.
+    Values must be JSON-serializable; tuples come back as lists. Rows that
+    cannot be decoded (such as ones written by an older version) are misses.
+
+    ``get_or_compute`` guards against stampedes at two levels: threads of one
+    process missing on the same key share a single in-flight computation,
+    and across processes a lease row lets only one worker compute while the
+    others poll for its result. A lease whose holder died expires after
+    ``lease_timeout`` seconds and is taken over.
+
+    Values are fresh for ``ttl`` seconds and then served stale for up to
+    ``stale_ttl`` more while one background refresh replaces them, so a hot
+    key never makes a caller wait on AniList once it has been built.
+    Refreshes submit their AniList requests at ``PRIORITY_BACKGROUND``.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_PATH,
+        ttl=DEFAULT_TTL,
+        stale_ttl=DEFAULT_STALE_TTL,
+        lease_timeout=60.0,
+        poll_interval=0.05,
+        prune_every=200,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.prune_every = prune_every
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "computed": 0, "waited": 0}
+
+        self._flights = SingleFlight()
+        self._aflights = AsyncSingleFlight()
+        self._background = set()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(2, thread_name_prefix="result-refresh")
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            try:
+                db.execute(
+                    "ALTER TABLE results"
+                    " ADD COLUMN fresh_until REAL NOT NULL DEFAULT 0"
+                )
+            except sqlite3.OperationalError:
+                pass
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key):
+        """The stored value for ``key``, fresh or stale, or None."""
+        return self._lookup(key)[0]
+
+    def _lookup(self, key):
+        with self._db() as db:
+            row = db.execute(
+                "SELECT value, fresh_until FROM results"
+                " WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None, False
+        try:
+            value = loads(row[0])
+        except (zlib.error, ValueError):
+            logger.warning("Discarding undecodable result for %s", key)
+            return None, False
+        return value, row[1] >= time.time()
+
+    def set(self, key, value, ttl=None):
+        blob = dumps(value)
+        fresh_until = time.time() + (self.ttl if ttl is None else ttl)
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at, fresh_until)"
+                " VALUES (?, ?, ?, ?)",
+                (key, blob, fresh_until + self.stale_ttl, fresh_until),
+            )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def delete(self, key):
+        with self._db() as db:
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def prune(self):
+        now = time.time()
+        with self._db() as db:
+            db.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+            db.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """Return the cached value for ``key``, calling ``compute()`` at most
+        once across all workers when it is missing. A stale value is
+        returned as is and refreshed in the background."""
+        value, fresh = self._lookup(key)
+        if value is not None:
+            if fresh:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale"] += 1
+                self._refresh(key, compute, ttl)
+            return value
+
+        self.stats["misses"] += 1
+        return self._flights.do(key, lambda: self._compute_once(key, compute, ttl))
+
+    def _refresh(self, key, compute, ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with priority(PRIORITY_BACKGROUND):
+                    self._flights.do(
+                        key,
+                        lambda: self._compute_once(key, compute, ttl, wait=False),
+                    )
+            except Exception:
+                logger.exception("Error refreshing %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(run)
+
+    def _compute_once(self, key, compute, ttl, wait=True):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        while True:
+            if self._acquire(key, owner):
+                try:
+                    value = compute()
+                    self.set(key, value, ttl)
+                    self.stats["computed"] += 1
+                    return value
+                finally:
+                    self._release(key, owner)
+
+            if not wait:
+                # Another worker is already refreshing it.
+                return self.get(key)
+            time.sleep(self.poll_interval)
+            value = self.get(key)
+            if value is not None:
+                self.stats["waited"] += 1
+                return value
+
+    async def aget_or_compute(self, key, compute, ttl=None):
+        """``get_or_compute`` for the event loop: ``compute`` is a coroutine
+        function and SQLite access runs in a worker thread."""
+        value, fresh = await asyncio.to_thread(self._lookup, key)
+        if value is not None:
+            if fresh:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale"] += 1
+                self._arefresh(key, compute, ttl)
+            return value
+
+        self.stats["misses"] += 1
+        return await self._aflights.do(
+            key, lambda: self._acompute_once(key, compute, ttl)
+        )
+
+    def _arefresh(self, key, compute, ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def run():
+            try:
+                with priority(PRIORITY_BACKGROUND):
+                    await self._aflights.do(
+                        key,
+                        lambda: self._acompute_once(key, compute, ttl, wait=False),
+                    )
+            except Exception:
+                logger.exception("Error refreshing %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        task = asyncio.ensure_future(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _acompute_once(self, key, compute, ttl, wait=True):
+        owner = f"{os.getpid()}:task-{id(asyncio.current_task())}"
+        while True:
+            if await asyncio.to_thread(self._acquire, key, owner):
+                try:
+                    value = await compute()
+                    await asyncio.to_thread(self.set, key, value, ttl)
+                    self.stats["computed"] += 1
+                    return value
+                finally:
+                    await asyncio.to_thread(self._release, key, owner)
+
+            if not wait:
+                return await asyncio.to_thread(self.get, key)
+            await asyncio.sleep(self.poll_interval)
+            value = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                self.stats["waited"] += 1
+                return value
+
+    def _acquire(self, key, owner):
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now)
+            )
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                (key, owner, now + self.lease_timeout),
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, key, owner):
+        with self._db() as db:
+            db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+
+_results = None
+_results_lock = threading.Lock()
+
+
+def get_result_cache():
+    """The process-wide result cache, or None when ``RESULT_CACHE_PATH`` is
+    set to an empty string."""
+    global _results
+    with _results_lock:
+        if _results is None and DEFAULT_PATH:
+            _results = ResultCache(DEFAULT_PATH)
+    return _results
+
+
+def set_result_cache(results):
+    global _results
+    _results = results
@@ -1,5 +1,23 @@
+import math
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from collections import defaultdict
+
+import numpy as np
+
+import metrics
+from aggregate import (
+    ONGOING_STATUSES,
+    EntryColumns,
+    LazyMin,
+    RunningCounts,
+    Vocabulary,
+    appearance_order,
+    first_argmax,
+    ordered_counts,
+    top_k,
+)
+from data.entries import entry_list
 
 
 def determine_persona(stats):
@@ -36,212 +54,150 @@ def determine_persona(stats):
     return "The Casual Observer", "You enjoy anime at a healthy, human pace."
 
 
-def build_rewind(anime_data, manga_data, favorites_data, year: int):
-    overall = {
-        "anime_completed": 0,
-        "manga_completed": 0,
-        "episodes_watched": 0,
-        "minutes_watched": 0,
-        "chapters_read": 0,
-        "volumes_read": 0,
-        "rewatches": 0,
-        "rereads": 0,
-        "scores": [],
-        "genres": defaultdict(int),
-        "studios": defaultdict(int),
-        "formats": defaultdict(int),
-        "countries": defaultdict(int),
+def _anime_obj(e):
+    return {
+        "title": e.title,
+        "score": e.score,
+        "cover_image": e.cover,
+        "banner_image": e.banner,
+        "format": e.format or "UNKNOWN",
+        "studios": [{"name": name} for name in e.studios],
     }
 
-    monthly = defaultdict(
-        lambda: {
-            "anime": [],
-            "manga": [],
-            "genres": defaultdict(int),
-        }
-    )
-
-    ongoing = {"anime": [], "manga": []}
-
-    def was_active_in_year(ts):
-        if not ts:
-            return False
-        dt = datetime.fromtimestamp(ts)
-        return dt.year == year
-
-    for lst in anime_data["lists"]:
-        for e in lst["entries"]:
-            media = e["media"]
-
-            if e["status"] in ["CURRENT", "REPEATING"] and was_active_in_year(
-                e.get("updatedAt")
-            ):
-                ongoing["anime"].append(
-                    {
-                        "title": media["title"].get("english")
-                        or media["title"]["english"],
-                        "cover_image": media["coverImage"]["large"],
-                        "progress": e.get("progress") or 0,
-                        "score": e["score"],
-                    }
-                )
-
-            c = e.get("completedAt")
-            if not c or c["year"] != year:
-                continue
 
-            m = c["month"]
+def _manga_obj(e):
+    return {
+        "title": e.title,
+        "score": e.score,
+        "cover_image": e.cover,
+        "banner_image": e.banner,
+    }
 
-            overall["anime_completed"] += 1
-            progress = e.get("progress") or 0
-            overall["episodes_watched"] += progress
-            duration = media.get("duration") or 24
-            overall["minutes_watched"] += progress * duration
-            overall["rewatches"] += e.get("repeat") or 0
 
-            if e["score"] > 0:
-                overall["scores"].append(e["score"])
+def _ongoing_obj(e):
+    return {
+        "title": e.title,
+        "cover_image": e.cover,
+        "progress": e.progress or 0,
+        "score": e.score,
+    }
 
-            fmt = media.get("format") or "UNKNOWN"
-            overall["formats"][fmt] += 1
 
-            studios = media.get("studios", {}).get("nodes", [])
-            for s in studios:
-                overall["studios"][s["name"]] += 1
+def _ongoing(columns, year):
+    idx = np.flatnonzero(columns.ongoing_in(year))
+    order = np.argsort(-columns.progress[idx], kind="stable")
+    return [_ongoing_obj(columns.entries[i]) for i in idx[order].tolist()]
 
-            anime_obj = {
-                "title": media["title"].get("english") or media["title"]["english"],
-                "score": e["score"],
-                "cover_image": media["coverImage"]["large"],
-                "banner_image": media["bannerImage"],
-                "format": fmt,
-                "studios": studios,
-            }
-            monthly[m]["anime"].append(anime_obj)
-
-            for g in media.get("genres", []):
-                overall["genres"][g] += 1
-                monthly[m]["genres"][g] += 1
-
-    for lst in manga_data["lists"]:
-        for e in lst["entries"]:
-            media = e["media"]
-
-            if e["status"] in ["CURRENT", "REPEATING"] and was_active_in_year(
-                e.get("updatedAt")
-            ):
-                ongoing["manga"].append(
-                    {
-                        "title": media["title"].get("english")
-                        or media["title"]["english"],
-                        "cover_image": media["coverImage"]["large"],
-                        "progress": e.get("progress") or 0,
-                        "score": e["score"],
-                    }
-                )
-
-            c = e.get("completedAt")
-            if not c or c["year"] != year:
-                continue
 
-            m = c["month"]
+def _average(scores):
+    return round(float(scores.sum()) / len(scores), 2) if len(scores) else 0
 
-            overall["manga_completed"] += 1
-            overall["chapters_read"] += e.get("progress") or 0
-            overall["volumes_read"] += e.get("progressVolumes") or 0
-            overall["rereads"] += e.get("repeat") or 0
 
-            if e["score"] > 0:
-                overall["scores"].append(e["score"])
+def _top_completed(columns, idx, month_rank, make, k):
+    tiebreak = month_rank[columns.month[idx]] * (len(columns) + 1) + idx
+    top = top_k(columns.score[idx], tiebreak, k)
+    return [make(columns.entries[i]) for i in idx[top].tolist()]
 
-            origin = media.get("countryOfOrigin") or "JP"
-            overall["countries"][origin] += 1
 
-            manga_obj = {
-                "title": media["title"].get("english") or media["title"]["english"],
-                "score": e["score"],
-                "cover_image": media["coverImage"]["large"],
-                "banner_image": media["bannerImage"],
-            }
-            monthly[m]["manga"].append(manga_obj)
+@metrics.timed("aggregate")
+def build_rewind(anime_data, manga_data, favorites_data, year: int):
+    vocab = Vocabulary()
+    anime = EntryColumns(entry_list(anime_data), "anime", vocab, years={year})
+    manga = EntryColumns(entry_list(manga_data), "manga", vocab, years={year})
+    return _build_year(anime, manga, vocab, favorites_data, year)
+
+
+def _build_year(anime, manga, vocab, favorites_data, year):
+    names = vocab.names
+
+    a_mask = anime.completed_in(year)
+    m_mask = manga.completed_in(year)
+    a = np.flatnonzero(a_mask)
+    m = np.flatnonzero(m_mask)
+    a_month = anime.month[a]
+    m_month = manga.month[m]
+
+    # Months in the order they were first seen (anime first), which is the
+    # order ties between equally scored titles are broken in.
+    months = appearance_order(np.concatenate([a_month, m_month]))
+    month_rank = np.zeros(max(months, default=0) + 1, np.int64)
+    month_rank[months] = np.arange(len(months))
+
+    a_genres = a_mask[anime.genre_owner]
+    m_genres = m_mask[manga.genre_owner]
+    genre_codes = np.concatenate(
+        [anime.genre_code[a_genres], manga.genre_code[m_genres]]
+    )
+    genre_months = np.concatenate(
+        [
+            anime.month[anime.genre_owner[a_genres]],
+            manga.month[manga.genre_owner[m_genres]],
+        ]
+    )
 
-            for g in media.get("genres", []):
-                overall["genres"][g] += 1
-                monthly[m]["genres"][g] += 1
+    a_scores = anime.score[a]
+    m_scores = manga.score[m]
+    anime_scores = a_scores[a_scores > 0]
+    manga_scores = m_scores[m_scores > 0]
+    scores = np.concatenate([anime_scores, manga_scores])
 
     monthly_overview = []
     activity_counts = [0] * 12
 
-    for month, data in sorted(monthly.items()):
-        total_titles = len(data["anime"]) + len(data["manga"])
+    for month in sorted(months):
+        # Entries with only a completion year have no month to file under.
+        if month == 0:
+            continue
+        a_in = a[a_month == month]
+        m_in = m[m_month == month]
+        total_titles = len(a_in) + len(m_in)
         if 1 <= month <= 12:
             activity_counts[month - 1] = total_titles
 
+        top_anime = first_argmax(anime.score[a_in])
+        top_manga = first_argmax(manga.score[m_in])
         monthly_overview.append(
             {
                 "month": month,
                 "activity_summary": {
-                    "anime_completed": len(data["anime"]),
-                    "manga_completed": len(data["manga"]),
+                    "anime_completed": len(a_in),
+                    "manga_completed": len(m_in),
                     "total_titles_completed": total_titles,
                 },
-                "top_anime": max(data["anime"], key=lambda x: x["score"], default=None),
-                "top_manga": max(data["manga"], key=lambda x: x["score"], default=None),
+                "top_anime": (
+                    _anime_obj(anime.entries[a_in[top_anime]])
+                    if top_anime is not None
+                    else None
+                ),
+                "top_manga": (
+                    _manga_obj(manga.entries[m_in[top_manga]])
+                    if top_manga is not None
+                    else None
+                ),
                 "top_genres": [
                     g
-                    for g, _ in sorted(
-                        data["genres"].items(), key=lambda x: x[1], reverse=True
+                    for g, _ in ordered_counts(
+                        genre_codes[genre_months == month], names
                     )[:3]
                 ],
             }
         )
 
-    avg_score = (
-        round(sum(overall["scores"]) / len(overall["scores"]), 2)
-        if overall["scores"]
-        else 0
-    )
-
-    anime_scores = [
-        e["score"] for m in monthly.values() for e in m["anime"] if e["score"] > 0
-    ]
-    manga_scores = [
-        e["score"] for m in monthly.values() for e in m["manga"] if e["score"] > 0
-    ]
-
-    anime_avg = round(sum(anime_scores) / len(anime_scores), 2) if anime_scores else 0
-    manga_avg = round(sum(manga_scores) / len(manga_scores), 2) if manga_scores else 0
+    avg_score = _average(scores)
+    anime_avg = _average(anime_scores)
+    manga_avg = _average(manga_scores)
 
-    top_genres_list = sorted(
-        overall["genres"].items(), key=lambda x: x[1], reverse=True
-    )
-
-    all_completed_anime = []
-    for m in monthly.values():
-        all_completed_anime.extend(m["anime"])
-
-    all_completed_manga = []
-    for m in monthly.values():
-        all_completed_manga.extend(m["manga"])
-
-    all_completed_anime.sort(key=lambda x: x["score"], reverse=True)
-    all_completed_manga.sort(key=lambda x: x["score"], reverse=True)
+    top_genres_list = ordered_counts(genre_codes, names)
+    formats = ordered_counts(anime.category[a], names)
 
-    best_anime_year = all_completed_anime[0] if all_completed_anime else None
-    best_manga_year = all_completed_manga[0] if all_completed_manga else None
+    top_anime_list = _top_completed(anime, a, month_rank, _anime_obj, 3)
+    top_manga_list = _top_completed(manga, m, month_rank, _manga_obj, 3)
+    best_anime_year = top_anime_list[0] if top_anime_list else None
+    best_manga_year = top_manga_list[0] if top_manga_list else None
 
-    top_anime_list = all_completed_anime[:3]
-    top_manga_list = all_completed_manga[:3]
-
-    score_dist = defaultdict(int)
-    for s in overall["scores"]:
-        if s > 0:
-            bin_key = (s // 10) * 10
-            if bin_key == 100:
-                bin_key = 90
-            score_dist[bin_key] += 1
-
-    final_score_dist = {k: score_dist[k] for k in range(10, 101, 10)}
+    bins = (scores // 10) * 10
+    bins[bins == 100] = 90
+    final_score_dist = {k: int(np.count_nonzero(bins == k)) for k in range(10, 101, 10)}
 
     peak_month_data = None
     if monthly_overview:
@@ -250,56 +206,55 @@ def build_rewind(anime_data, manga_data, favorites_data, year: int):
             key=lambda x: x["activity_summary"]["total_titles_completed"],
         )
 
+    minutes_watched = int((anime.progress[a] * anime.duration[a]).sum())
     persona_title, persona_desc = determine_persona(
         {
-            "episodes_watched": overall["episodes_watched"],
-            "anime_completed": overall["anime_completed"],
-            "formats": overall["formats"],
+            "episodes_watched": int(anime.progress[a].sum()),
+            "anime_completed": len(a),
+            "formats": dict(formats),
             "average_score": avg_score,
             "top_genres": top_genres_list,
         }
     )
 
-    all_covers = set()
-    for m in monthly.values():
-        for a in m["anime"]:
-            if a.get("cover_image"):
-                all_covers.add(a["cover_image"])
-        for mg in m["manga"]:
-            if mg.get("cover_image"):
-                all_covers.add(mg["cover_image"])
-
-    collage_covers = list(all_covers)[:50]
-
-    ongoing["anime"].sort(key=lambda x: x["progress"], reverse=True)
-    ongoing["manga"].sort(key=lambda x: x["progress"], reverse=True)
+    collage = {}
+    for month in months:
+        for columns, idx in (
+            (anime, a[a_month == month]),
+            (manga, m[m_month == month]),
+        ):
+            for i in idx.tolist():
+                cover = columns.entries[i].cover
+                if cover:
+                    collage[cover] = None
+        if len(collage) >= 50:
+            break
+    collage_covers = list(collage)[:50]
+
+    studio_mask = a_mask[anime.studio_owner]
 
     return {
         "year": year,
         "persona": {"title": persona_title, "description": persona_desc},
         "overall": {
-            "anime_completed": overall["anime_completed"],
-            "manga_completed": overall["manga_completed"],
-            "episodes_watched": overall["episodes_watched"],
-            "minutes_watched": overall["minutes_watched"],
-            "total_days_watched": round(overall["minutes_watched"] / 1440, 1),
-            "chapters_read": overall["chapters_read"],
-            "volumes_read": overall["volumes_read"],
-            "rewatches": overall["rewatches"],
-            "rereads": overall["rereads"],
+            "anime_completed": len(a),
+            "manga_completed": len(m),
+            "episodes_watched": int(anime.progress[a].sum()),
+            "minutes_watched": minutes_watched,
+            "total_days_watched": round(minutes_watched / 1440, 1),
+            "chapters_read": int(manga.progress[m].sum()),
+            "volumes_read": int(manga.volumes[m].sum()),
+            "rewatches": int(anime.repeat[a].sum()),
+            "rereads": int(manga.repeat[m].sum()),
             "average_score": avg_score,
             "anime_avg_score": anime_avg,
             "manga_avg_score": manga_avg,
             "top_genres": dict(top_genres_list),
             "top_studios": dict(
-                sorted(overall["studios"].items(), key=lambda x: x[1], reverse=True)[:5]
-            ),
-            "formats": dict(
-                sorted(overall["formats"].items(), key=lambda x: x[1], reverse=True)
-            ),
-            "countries": dict(
-                sorted(overall["countries"].items(), key=lambda x: x[1], reverse=True)
+                ordered_counts(anime.studio_code[studio_mask], names)[:5]
             ),
+            "formats": dict(formats),
+            "countries": dict(ordered_counts(manga.category[m], names)),
             "score_distribution": final_score_dist,
             "best_anime": best_anime_year,
             "best_manga": best_manga_year,
@@ -308,8 +263,465 @@ def build_rewind(anime_data, manga_data, favorites_data, year: int):
             "collage_covers": collage_covers,
             "activity_counts": activity_counts,
         },
-        "ongoing": ongoing,
+        "ongoing": {"anime": _ongoing(anime, year), "manga": _ongoing(manga, year)},
         "highlights": {"peak_month": peak_month_data},
         "favorites": favorites_data,
         "monthly_overview": monthly_overview,
     }
+
+
+@metrics.timed("aggregate")
+def build_rewind_multi(anime_data, manga_data, favorites_data, years=None):
+    """Build the report for every year with activity from one pass over the lists.
+
+    The lists are turned into columns once and every year is a set of masks
+    over them. ``years`` limits (or extends) the years returned; years
+    without activity get an empty report.
+    """
+    vocab = Vocabulary()
+    anime = EntryColumns(entry_list(anime_data), "anime", vocab)
+    manga = EntryColumns(entry_list(manga_data), "manga", vocab)
+
+    if years is None:
+        years = anime.active_years() | manga.active_years()
+
+    return {
+        y: _build_year(anime, manga, vocab, favorites_data, y) for y in sorted(years)
+    }
+
+
+KINDS = ("anime", "manga")
+
+
+class _Row:
+    """An entry's place in the accumulator, with the fields the reports read
+    defaulted once."""
+
+    __slots__ = (
+        "kind",
+        "seq",
+        "entry",
+        "year",
+        "month",
+        "score",
+        "progress",
+        "repeat",
+        "amount",
+        "genres",
+        "studios",
+        "category",
+        "ongoing_year",
+    )
+
+    def __init__(self, kind, seq, entry):
+        self.kind = kind
+        self.seq = seq
+        self.entry = entry
+        self.year = entry.year or 0
+        self.month = entry.month or 0
+        self.score = float(entry.score)
+        self.progress = entry.progress or 0
+        self.repeat = entry.repeat or 0
+        self.genres = entry.genres
+        if kind == "anime":
+            # Minutes per episode for anime, volumes read for manga.
+            self.amount = entry.duration or 24
+            self.studios = entry.studios
+            self.category = entry.format or "UNKNOWN"
+        else:
+            self.amount = entry.volumes or 0
+            self.studios = ()
+            self.category = entry.country or "JP"
+        updated = entry.updated_at or 0
+        self.ongoing_year = (
+            datetime.fromtimestamp(updated).year
+            if updated and entry.status in ONGOING_STATUSES
+            else None
+        )
+
+    def position(self, index=0):
+        """Where this entry's ``index``-th name sits in the concatenated
+        anime-then-manga order ``build_rewind`` counts names in."""
+        return (KINDS.index(self.kind), self.seq, index)
+
+
+def _insert(groups, score, row, sign):
+    """Add or remove ``row`` in a ``score -> {seq: row}`` index."""
+    if sign > 0:
+        groups.setdefault(score, {})[row.seq] = row
+    else:
+        group = groups[score]
+        del group[row.seq]
+        if not group:
+            del groups[score]
+
+
+def _best(groups):
+    """The highest scored row of a ``score -> {seq: row}`` index, earliest
+    first on ties, like ``first_argmax``."""
+    if not groups:
+        return None
+    group = groups[max(groups)]
+    return group[min(group)]
+
+
+class _Month:
+    def __init__(self):
+        self.count = {kind: 0 for kind in KINDS}
+        self.members = {kind: {} for kind in KINDS}
+        self.first = {kind: LazyMin() for kind in KINDS}
+        self.by_score = {kind: {} for kind in KINDS}
+        self.genres = RunningCounts()
+
+    def apply(self, row, sign):
+        kind = row.kind
+        self.count[kind] += sign
+        if sign > 0:
+            self.members[kind][row.seq] = row
+            self.first[kind].add(row.seq)
+        else:
+            del self.members[kind][row.seq]
+            self.first[kind].remove(row.seq)
+        _insert(self.by_score[kind], row.score, row, sign)
+        for i, genre in enumerate(row.genres):
+            if sign > 0:
+                self.genres.add(genre, row.position(i))
+            else:
+                self.genres.remove(genre, row.position(i))
+
+    def appearance(self):
+        """Sort key of the month in first-appearance order, anime first."""
+        if self.count["anime"]:
+            return (0, self.first["anime"].first())
+        return (1, self.first["manga"].first())
+
+    def __bool__(self):
+        return any(self.count.values())
+
+
+class _Year:
+    """Running totals behind one year's report."""
+
+    def __init__(self):
+        self.completed = {kind: 0 for kind in KINDS}
+        self.progress = {kind: 0 for kind in KINDS}
+        self.repeat = {kind: 0 for kind in KINDS}
+        self.minutes = 0
+        self.volumes = 0
+        self.scores = {kind: {} for kind in KINDS}
+        self.by_score = {kind: {} for kind in KINDS}
+        self.genres = RunningCounts()
+        self.studios = RunningCounts()
+        self.categories = {kind: RunningCounts() for kind in KINDS}
+        self.months = {}
+        self.ongoing = {kind: {} for kind in KINDS}
+
+    def apply_completed(self, row, sign):
+        kind = row.kind
+        self.completed[kind] += sign
+        self.progress[kind] += sign * row.progress
+        self.repeat[kind] += sign * row.repeat
+        if kind == "anime":
+            self.minutes += sign * row.progress * row.amount
+        else:
+            self.volumes += sign * row.amount
+        if row.score > 0:
+            scores = self.scores[kind]
+            left = scores.get(row.score, 0) + sign
+            if left:
+                scores[row.score] = left
+            else:
+                del scores[row.score]
+        _insert(self.by_score[kind], row.score, row, sign)
+
+        update = "add" if sign > 0 else "remove"
+        for i, genre in enumerate(row.genres):
+            getattr(self.genres, update)(genre, row.position(i))
+        for i, studio in enumerate(row.studios):
+            getattr(self.studios, update)(studio, row.position(i))
+        getattr(self.categories[kind], update)(row.category, row.position())
+
+        month = self.months.get(row.month)
+        if month is None:
+            month = self.months[row.month] = _Month()
+        month.apply(row, sign)
+        if not month:
+            del self.months[row.month]
+
+    def apply_ongoing(self, row, sign):
+        if sign > 0:
+            self.ongoing[row.kind][row.seq] = row
+        else:
+            del self.ongoing[row.kind][row.seq]
+
+    def __bool__(self):
+        return any(self.completed.values()) or any(self.ongoing.values())
+
+    def report(self, year, favorites_data):
+        """The year's report, equal to ``build_rewind`` over the same lists."""
+        months = sorted(self.months, key=lambda m: self.months[m].appearance())
+        month_rank = {month: i for i, month in enumerate(months)}
+
+        monthly_overview = []
+        activity_counts = [0] * 12
+        for month in sorted(months):
+            if month == 0:
+                continue
+            bucket = self.months[month]
+            total_titles = bucket.count["anime"] + bucket.count["manga"]
+            if 1 <= month <= 12:
+                activity_counts[month - 1] = total_titles
+            top_anime = _best(bucket.by_score["anime"])
+            top_manga = _best(bucket.by_score["manga"])
+            monthly_overview.append(
+                {
+                    "month": month,
+                    "activity_summary": {
+                        "anime_completed": bucket.count["anime"],
+                        "manga_completed": bucket.count["manga"],
+                        "total_titles_completed": total_titles,
+                    },
+                    "top_anime": _anime_obj(top_anime.entry) if top_anime else None,
+                    "top_manga": _manga_obj(top_manga.entry) if top_manga else None,
+                    "top_genres": [g for g, _ in bucket.genres.ordered()[:3]],
+                }
+            )
+
+        anime_avg = _running_average(self.scores["anime"])
+        manga_avg = _running_average(self.scores["manga"])
+        avg_score = _running_average(self.scores["anime"], self.scores["manga"])
+
+        top_genres_list = self.genres.ordered()
+        formats = self.categories["anime"].ordered()
+
+        top_anime_list = self._top("anime", month_rank, _anime_obj, 3)
+        top_manga_list = self._top("manga", month_rank, _manga_obj, 3)
+        best_anime_year = top_anime_list[0] if top_anime_list else None
+        best_manga_year = top_manga_list[0] if top_manga_list else None
+
+        final_score_dist = dict.fromkeys(range(10, 101, 10), 0)
+        for scores in self.scores.values():
+            for score, count in scores.items():
+                bucket = min(int(score // 10) * 10, 90)
+                if bucket in final_score_dist:
+                    final_score_dist[bucket] += count
+
+        peak_month_data = None
+        if monthly_overview:
+            peak_month_data = max(
+                monthly_overview,
+                key=lambda x: x["activity_summary"]["total_titles_completed"],
+            )
+
+        episodes_watched = self.progress["anime"]
+        persona_title, persona_desc = determine_persona(
+            {
+                "episodes_watched": episodes_watched,
+                "anime_completed": self.completed["anime"],
+                "formats": dict(formats),
+                "average_score": avg_score,
+                "top_genres": top_genres_list,
+            }
+        )
+
+        collage = {}
+        for month in months:
+            bucket = self.months[month]
+            for kind in KINDS:
+                members = bucket.members[kind]
+                for seq in sorted(members):
+                    cover = members[seq].entry.cover
+                    if cover:
+                        collage[cover] = None
+            if len(collage) >= 50:
+                break
+        collage_covers = list(collage)[:50]
+
+        return {
+            "year": year,
+            "persona": {"title": persona_title, "description": persona_desc},
+            "overall": {
+                "anime_completed": self.completed["anime"],
+                "manga_completed": self.completed["manga"],
+                "episodes_watched": episodes_watched,
+                "minutes_watched": self.minutes,
+                "total_days_watched": round(self.minutes / 1440, 1),
+                "chapters_read": self.progress["manga"],
+                "volumes_read": self.volumes,
+                "rewatches": self.repeat["anime"],
+                "rereads": self.repeat["manga"],
+                "average_score": avg_score,
+                "anime_avg_score": anime_avg,
+                "manga_avg_score": manga_avg,
+                "top_genres": dict(top_genres_list),
+                "top_studios": dict(self.studios.ordered()[:5]),
+                "formats": dict(formats),
+                "countries": dict(self.categories["manga"].ordered()),
+                "score_distribution": final_score_dist,
+                "best_anime": best_anime_year,
+                "best_manga": best_manga_year,
+                "top_anime_list": top_anime_list,
+                "top_manga_list": top_manga_list,
+                "collage_covers": collage_covers,
+                "activity_counts": activity_counts,
+            },
+            "ongoing": {
+                kind: [
+                    _ongoing_obj(row.entry)
+                    for row in sorted(
+                        self.ongoing[kind].values(),
+                        key=lambda row: (-row.progress, row.seq),
+                    )
+                ]
+                for kind in KINDS
+            },
+            "highlights": {"peak_month": peak_month_data},
+            "favorites": favorites_data,
+            "monthly_overview": monthly_overview,
+        }
+
+    def _top(self, kind, month_rank, make, k):
+        """Like ``_top_completed``: walks score levels from the top until ``k``
+        candidates are found, then breaks ties by month and list order."""
+        groups = self.by_score[kind]
+        candidates = []
+        for score in sorted(groups, reverse=True):
+            candidates.extend(groups[score].values())
+            if len(candidates) >= k:
+                break
+        candidates.sort(key=lambda row: (-row.score, month_rank[row.month], row.seq))
+        return [make(row.entry) for row in candidates[:k]]
+
+
+def _running_average(*score_counts):
+    total = math.fsum(s * c for counts in score_counts for s, c in counts.items())
+    n = sum(c for counts in score_counts for c in counts.values())
+    return round(total / n, 2) if n else 0
+
+
+class RewindAccumulator:
+    """Every year's report for one user, kept up to date from list deltas.
+
+    Holds the running counters ``build_rewind`` would otherwise recompute
+    from scratch, per year, so adding, removing or updating an entry only
+    touches the years and buckets it belongs to, and ``reports`` only
+    re-emits the years that changed. Entries are ordered the way
+    ``ListStore.load`` returns them, an update moving the entry to the end,
+    so ties break exactly as ``build_rewind_multi`` over the stored lists.
+    """
+
+    def __init__(self, anime_data=None, manga_data=None, favorites_data=None):
+        self.favorites = favorites_data
+        self._rows = {}
+        self._years = {}
+        self._reports = {}
+        self._dirty = set()
+        self._seq = 0
+        for kind, data in (("anime", anime_data), ("manga", manga_data)):
+            for entry in entry_list(data):
+                self.add(kind, entry)
+
+    def add(self, kind, entry):
+        """Add ``entry`` (an ``Entry``), replacing (and moving to the end) any
+        entry with the same id."""
+        self.remove(kind, entry.id)
+        self._seq += 1
+        row = self._rows[(kind, entry.id)] = _Row(kind, self._seq, entry)
+        self._apply(row, 1)
+
+    update = add
+
+    def remove(self, kind, entry_id):
+        row = self._rows.pop((kind, entry_id), None)
+        if row is not None:
+            self._apply(row, -1)
+
+    def apply(self, anime_changes=(), manga_changes=(), favorites_data=None):
+        """Apply changed entries, in the order ``ListStore.merge`` writes
+        them, and the latest favorites."""
+        for kind, changes in (("anime", anime_changes), ("manga", manga_changes)):
+            for entry in changes or ():
+                self.add(kind, entry)
+        if favorites_data is not None and favorites_data != self.favorites:
+            self.favorites = favorites_data
+            self._reports = {
+                year: {**report, "favorites": favorites_data}
+                for year, report in self._reports.items()
+            }
+
+    def _apply(self, row, sign):
+        if row.year:
+            self._year(row.year).apply_completed(row, sign)
+            self._settle(row.year)
+        if row.ongoing_year is not None:
+            self._year(row.ongoing_year).apply_ongoing(row, sign)
+            self._settle(row.ongoing_year)
+
+    def _year(self, year):
+        state = self._years.get(year)
+        if state is None:
+            state = self._years[year] = _Year()
+        return state
+
+    def _settle(self, year):
+        self._dirty.add(year)
+        if not self._years[year]:
+            del self._years[year]
+
+    def years(self):
+        return set(self._years)
+
+    def report(self, year):
+        """``build_rewind`` for ``year``, recomputed only if it changed."""
+        if year in self._dirty or year not in self._reports:
+            state = self._years.get(year) or _Year()
+            self._reports[year] = state.report(year, self.favorites)
+            self._dirty.discard(year)
+        return self._reports[year]
+
+    def reports(self, years=None):
+        """``build_rewind_multi`` over the accumulated lists."""
+        if years is None:
+            years = self.years()
+        return {y: self.report(y) for y in sorted(years)}
+
+
+class AccumulatorCache:
+    """Per-process LRU of users' ``RewindAccumulator``s, each tagged with the
+    stored list state it reflects, so a refresh that only fetched changes is
+    applied as deltas instead of rebuilding every report."""
+
+    def __init__(self, max_users=64):
+        self.max_users = max_users
+        self.stats = {"incremental": 0, "rebuilt": 0}
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, username, refresh, load):
+        """Every year's report after ``refresh`` (a ``data.Refresh``).
+        ``load(username)`` returns the stored lists, used when there is no
+        accumulator for the state the refresh started from."""
+        key = username.lower()
+        with self._lock:
+            acc, state = self._items.pop(key, (None, None))
+
+        lists = (refresh.anime, refresh.manga, refresh.favorites)
+        rebuild = refresh.mode == "full" or acc is None or state != refresh.since
+        if rebuild and refresh.mode != "full":
+            with metrics.span("store.load"):
+                lists = load(username)
+
+        with metrics.span("aggregate"):
+            if rebuild:
+                acc = RewindAccumulator(*lists)
+                self.stats["rebuilt"] += 1
+            else:
+                acc.apply(*lists)
+                self.stats["incremental"] += 1
+            reports = acc.reports()
+
+        with self._lock:
+            self._items[key] = (acc, refresh.state)
+            while len(self._items) > self.max_users:
+                self._items.popitem(last=False)
+        return {"favorites": acc.favorites, "reports": reports}
@@ -0,0 +1,136 @@
+"""Progressive rewind responses.
+
+The report page is a sequence of section templates under
+``templates/report``; ``report_content.html`` includes them in this order.
+Each section is sent as one line of newline-delimited JSON, carrying its
+HTML and the report fields it introduces, as soon as the data it reads is
+there:
+
+- ``STATIC_SECTIONS`` read nothing from the report and go out at once;
+- ``FETCHED_SECTIONS`` only read what AniList returned (favorites) and go
+  out as soon as the lists arrive, before they are aggregated;
+- the rest read aggregates over the whole list and go out once the report
+  is built, ``outro`` (which carries the shareId) after it has been stored.
+
+The first event lists the sections in page order so the client can place
+them as they arrive. Building code reports the fetched data through
+``fetched``; ``staged`` and ``astaged`` turn that into events while the
+build is still running.
+"""
+
+import asyncio
+import contextvars
+import json
+import queue
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+# Page sections in order, with the report fields each one introduces.
+SECTIONS = (
+    ("styles", ()),
+    ("hero", ("username", "year", "persona")),
+    ("highlights", ("overall",)),
+    ("charts", ()),
+    ("grind", ("ongoing",)),
+    ("cast", ("favorites",)),
+    ("timeline", ("monthly_overview", "highlights")),
+    ("outro", ("shareId", "generatedAt")),
+)
+SECTION_NAMES = [name for name, _ in SECTIONS]
+FIELDS = dict(SECTIONS)
+
+STATIC_SECTIONS = ("styles", "charts")
+FETCHED_SECTIONS = ("cast",)
+
+NDJSON_HEADERS = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+
+_on_fetched = contextvars.ContextVar("on_fetched", default=None)
+
+
+def event(kind, **fields):
+    """One NDJSON line: ``{"event": kind, **fields}``."""
+    return json.dumps({"event": kind, **fields}, separators=(",", ":")) + "\n"
+
+
+def render_section(env, name, context):
+    with metrics.span("render"):
+        return env.get_template(f"report/{name}.html").render(context)
+
+
+def section_event(name, html, context):
+    data = {field: context.get(field) for field in FIELDS[name]}
+    return event("section", name=name, data=data, html=html)
+
+
+def render_sections(env, context):
+    """The HTML of every section of the page, by name."""
+    return {name: render_section(env, name, context) for name in SECTION_NAMES}
+
+
+def page_html(sections):
+    """``report_content.html`` from the HTML of its sections."""
+    return "\n".join(sections[name] for name in SECTION_NAMES)
+
+
+def early_events(env, context, names):
+    """Events for the sections ``names``, rendered from ``context``."""
+    for name in names:
+        yield section_event(name, render_section(env, name, context), context)
+
+
+def fetched(favorites):
+    """Report the favorites of lists just fetched to the stream waiting on
+    this build, if any."""
+    callback = _on_fetched.get()
+    if callback is not None and favorites is not None:
+        callback(favorites)
+
+
+@contextmanager
+def on_fetched(callback):
+    token = _on_fetched.set(callback)
+    try:
+        yield
+    finally:
+        _on_fetched.reset(token)
+
+
+def staged(build):
+    """Run ``build()`` in a thread and yield ``("fetched", favorites)`` when
+    it reports its lists, then ``("built", result)``; raises what ``build``
+    raises. A build that joined another request's (or another worker's)
+    only yields ``"built"``."""
+    messages = queue.SimpleQueue()
+
+    def run():
+        try:
+            with on_fetched(lambda favorites: messages.put(("fetched", favorites))):
+                messages.put(("built", build()))
+        except BaseException as e:
+            messages.put(("error", e))
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), daemon=True).start()
+    while True:
+        kind, value = messages.get()
+        if kind == "error":
+            raise value
+        yield kind, value
+        if kind == "built":
+            return
+
+
+async def astaged(build):
+    """``staged`` for a coroutine function, run as a task on this loop."""
+    messages = asyncio.Queue()
+    with on_fetched(lambda favorites: messages.put_nowait(("fetched", favorites))):
+        task = asyncio.ensure_future(build())
+    task.add_done_callback(lambda _: messages.put_nowait(("built", None)))
+    while True:
+        kind, value = await messages.get()
+        if kind == "built":
+            yield kind, await task
+            return
+        yield kind, value
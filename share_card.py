@@ -1,27 +1,157 @@
-import requests
+import numpy as np
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, features
+
+import metrics
+from images import get_cover_fetcher
+
+WIDTH, HEIGHT = 1080, 1350
+COVER_SIZE = (330, 475)
+COVER_RADIUS = 30
+GLOW_SIZE = (340, 485)
+
+PREVIEW_SIZE = (WIDTH // 2, HEIGHT // 2)
+
+# name -> (PIL format, MIME type, save options per preset)
+FORMATS = {
+    "png": (
+        "PNG",
+        "image/png",
+        {
+            "fast": {"compress_level": 1},
+            "balanced": {"compress_level": 6},
+            "small": {"optimize": True},
+        },
+    ),
+    "jpeg": (
+        "JPEG",
+        "image/jpeg",
+        {
+            "fast": {"quality": 85},
+            "balanced": {"quality": 88, "optimize": True, "subsampling": 0},
+            "small": {"quality": 80, "optimize": True, "progressive": True},
+        },
+    ),
+    "webp": (
+        "WEBP",
+        "image/webp",
+        {
+            "fast": {"quality": 80, "method": 0},
+            "balanced": {"quality": 82, "method": 4},
+            "small": {"quality": 78, "method": 6},
+        },
+    ),
+}
+if features.check("avif"):
+    FORMATS["avif"] = (
+        "AVIF",
+        "image/avif",
+        {
+            "fast": {"quality": 60, "speed": 8},
+            "balanced": {"quality": 65, "speed": 6},
+            "small": {"quality": 60, "speed": 4},
+        },
+    )
+PRESETS = ("fast", "balanced", "small")
+
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+@lru_cache(maxsize=1)
+def background():
+    """The card's vertical gradient with the top and bottom accent bars,
+    built once as an array; cards start from a copy of it."""
+    ratio = np.arange(HEIGHT) / HEIGHT
+    rows = np.stack([8 + ratio * 12, 8 + ratio * 18, 15 + ratio * 25], axis=1).astype(
+        np.uint8
+    )
+    gradient = np.ascontiguousarray(
+        np.broadcast_to(rows[:, None, :], (HEIGHT, WIDTH, 3))
+    )
+
+    img = Image.fromarray(gradient, "RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([(0, 0), (WIDTH, 4)], fill="#00d9ff")
+    draw.rectangle([(0, HEIGHT - 4), (WIDTH, HEIGHT)], fill="#ff8080")
+    return img
 
 
-def download_image(url):
+@lru_cache(maxsize=1)
+def fonts():
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        return {
+            "title": ImageFont.truetype(FONT_BOLD, 58),
+            "heading": ImageFont.truetype(FONT_BOLD, 36),
+            "stat": ImageFont.truetype(FONT_BOLD, 62),
+            "label": ImageFont.truetype(FONT_REGULAR, 22),
+            "small": ImageFont.truetype(FONT_REGULAR, 20),
+            "tiny": ImageFont.truetype(FONT_BOLD, 14),
         }
-        response = requests.get(url, timeout=15, headers=headers)
-        response.raise_for_status()
-        img = Image.open(BytesIO(response.content))
-        return img.convert("RGB")
-    except Exception as e:
-        print(f"Error downloading image {url}: {e}")
-        placeholder = Image.new("RGB", (280, 400), color="#1a1a1a")
-        return placeholder
+    except Exception:
+        default = ImageFont.load_default()
+        return dict.fromkeys(
+            ["title", "heading", "stat", "label", "small", "tiny"], default
+        )
 
 
-def round_corners(img, radius):
-    mask = Image.new("L", img.size, 0)
+@lru_cache(maxsize=None)
+def glow(color):
+    layer = Image.new("RGBA", GLOW_SIZE, (*color, 25))
+    return layer.filter(ImageFilter.GaussianBlur(15))
+
+
+@lru_cache(maxsize=None)
+def corner_mask(size, radius):
+    mask = Image.new("L", size, 0)
     draw = ImageDraw.Draw(mask)
-    draw.rounded_rectangle([(0, 0), img.size], radius=radius, fill=255)
+    draw.rounded_rectangle([(0, 0), size], radius=radius, fill=255)
+    return mask
+
+
+def preload():
+    """Build every shared render asset up front so the first card request
+    doesn't pay for it."""
+    background()
+    fonts()
+    glow((0, 217, 255))
+    glow((255, 128, 128))
+    corner_mask(COVER_SIZE, COVER_RADIUS)
+
+
+def negotiate_format(accept=None, requested=None):
+    """Pick the card's encoding: ``requested`` (a ``format=`` parameter) if
+    given, otherwise the first of WebP/AVIF the ``Accept`` header lists,
+    otherwise PNG."""
+    if requested:
+        requested = requested.lower().replace("jpg", "jpeg")
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported format: {requested}")
+        return requested
+    accept = accept or ""
+    for name in ("webp", "avif"):
+        if name in FORMATS and f"image/{name}" in accept:
+            return name
+    return "png"
+
+
+@metrics.timed("card.encode")
+def encode_card(img, fmt="png", preset="balanced", preview=False):
+    """Encode a rendered card; ``preview`` halves its resolution for in-page
+    display."""
+    if preset not in PRESETS:
+        raise ValueError(f"Unsupported preset: {preset}")
+    pil_format, _, options = FORMATS[fmt]
+    if preview:
+        img = img.reduce(2)
+    img_io = BytesIO()
+    img.save(img_io, pil_format, **options[preset])
+    return img_io.getvalue()
+
+
+def round_corners(img, radius):
+    mask = corner_mask(img.size, radius)
 
     output = Image.new("RGBA", img.size, (0, 0, 0, 0))
     output.paste(img, (0, 0))
@@ -29,49 +159,44 @@ def round_corners(img, radius):
     return output
 
 
+def card_inputs(data):
+    """The parts of a report the card actually draws; two reports with the
+    same inputs render identical cards."""
+    overall = data["overall"]
+    return {
+        "username": data.get("username", "User"),
+        "year": data.get("year", 2024),
+        "persona": data["persona"]["title"],
+        "best_anime": (overall.get("best_anime") or {}).get("cover_image"),
+        "best_manga": (overall.get("best_manga") or {}).get("cover_image"),
+        "anime_completed": overall["anime_completed"],
+        "episodes_watched": overall["episodes_watched"],
+        "manga_completed": overall["manga_completed"],
+        "chapters_read": overall["chapters_read"],
+        "top_genres": list(overall.get("top_genres", {}).keys())[:6],
+    }
+
+
+@metrics.timed("card.render")
 def create_share_card(data):
-    width, height = 1080, 1350
+    width, height = WIDTH, HEIGHT
 
-    img = Image.new("RGB", (width, height), color="#000000")
+    img = background().copy()
     draw = ImageDraw.Draw(img, "RGBA")
 
-    for y in range(height):
-        ratio = y / height
-        r = int(8 + ratio * 12)
-        g = int(8 + ratio * 18)
-        b = int(15 + ratio * 25)
-        draw.rectangle([(0, y), (width, y + 1)], fill=(r, g, b))
-
-    try:
-        font_title = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 58
-        )
-        font_heading = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 36
-        )
-        font_stat = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 62
-        )
-        font_label = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 22
-        )
-        font_small = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 20
-        )
-        font_tiny = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 14
-        )
-    except Exception:
-        font_title = ImageFont.load_default()
-        font_heading = font_stat = font_label = font_small = font_tiny = font_title
+    f = fonts()
+    font_title = f["title"]
+    font_heading = f["heading"]
+    font_stat = f["stat"]
+    font_label = f["label"]
+    font_small = f["small"]
+    font_tiny = f["tiny"]
 
     overall = data["overall"]
     persona = data["persona"]
     username = data.get("username", "User")
     year = data.get("year", 2024)
 
-    draw.rectangle([(0, 0), (width, 4)], fill="#00d9ff")
-
     draw.text((45, 30), f"WRAPPED {year}", fill="#00d9ff", font=font_small)
     draw.text((45, 65), username.upper(), fill="#ffffff", font=font_title)
 
@@ -89,13 +214,18 @@ def create_share_card(data):
 
     y_offset = 160
 
-    anime_cover = download_image(overall.get("best_anime", {}).get("cover_image"))
-    anime_cover = anime_cover.resize((330, 475), Image.Resampling.LANCZOS)
-    anime_rounded = round_corners(anime_cover, 30)
+    with metrics.span("card.covers"):
+        anime_cover, manga_cover = get_cover_fetcher().get_many(
+            [
+                (overall.get("best_anime") or {}).get("cover_image"),
+                (overall.get("best_manga") or {}).get("cover_image"),
+            ],
+            COVER_SIZE,
+        )
+    anime_rounded = round_corners(anime_cover, COVER_RADIUS)
 
-    glow = Image.new("RGBA", (340, 485), (0, 217, 255, 25))
-    glow = glow.filter(ImageFilter.GaussianBlur(15))
-    img.paste(glow, (55, y_offset - 5), glow)
+    anime_glow = glow((0, 217, 255))
+    img.paste(anime_glow, (55, y_offset - 5), anime_glow)
 
     img.paste(anime_rounded, (60, y_offset), anime_rounded)
 
@@ -104,13 +234,10 @@ def create_share_card(data):
     )
     draw.text((83, y_offset + 20), "AOTY", fill="#000000", font=font_tiny)
 
-    manga_cover = download_image(overall.get("best_manga", {}).get("cover_image"))
-    manga_cover = manga_cover.resize((330, 475), Image.Resampling.LANCZOS)
-    manga_rounded = round_corners(manga_cover, 30)
+    manga_rounded = round_corners(manga_cover, COVER_RADIUS)
 
-    glow = Image.new("RGBA", (340, 485), (255, 128, 128, 25))
-    glow = glow.filter(ImageFilter.GaussianBlur(15))
-    img.paste(glow, (685, y_offset - 5), glow)
+    manga_glow = glow((255, 128, 128))
+    img.paste(manga_glow, (685, y_offset - 5), manga_glow)
 
     img.paste(manga_rounded, (690, y_offset), manga_rounded)
 
@@ -215,6 +342,4 @@ def create_share_card(data):
         draw.text((genre_x + 20, genre_y + 12), genre, fill="#ffffff", font=font_small)
         genre_x += genre_width + 15
 
-    draw.rectangle([(0, height - 4), (width, height)], fill="#ff8080")
-
     return img
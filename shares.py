@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_PATH = os.environ.get(
+    "SHARE_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "anilist-wrapped", "shares.sqlite3"),
+)
+DEFAULT_TTL = int(os.environ.get("SHARE_TTL", 30 * 24 * 3600))
+# Reads record when a share was last read at most this often (seconds).
+TOUCH_EVERY = 600
+
+# Not part of a report's identity: the same report generated twice gets the
+# same shareId.
+VOLATILE_FIELDS = ("shareId", "generatedAt")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shares (
+    id TEXT PRIMARY KEY,
+    report BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shares_accessed ON shares (accessed_at);
+"""
+
+
+def share_id_for(report):
+    """Content-addressed id of ``report``: a hash of its canonical JSON.
+    Usernames are case-insensitive, as in the result cache keys, so the
+    same report requested as "Foo" and "foo" gets one id."""
+    content = {k: v for k, v in report.items() if k not in VOLATILE_FIELDS}
+    if isinstance(content.get("username"), str):
+        content["username"] = content["username"].lower()
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def encode(report):
+    return zlib.compress(json.dumps(report, separators=(",", ":")).encode(), 6)
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+class MemoryShareStore:
+    """Per-process share store: compressed reports in an LRU bounded by
+    total compressed size, each kept for at most ``ttl`` seconds."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_bytes=32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, report):
+        """Store ``report`` and return its shareId, which is also set on it."""
+        share_id = share_id_for(report)
+        report["shareId"] = share_id
+        blob = encode(report)
+        with self._lock:
+            old = self._items.pop(share_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._items[share_id] = (time.time() + self.ttl, blob)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+        return share_id
+
+    def get(self, share_id):
+        with self._lock:
+            item = self._items.get(share_id)
+            if item is None:
+                return None
+            expires_at, blob = item
+            if expires_at < time.time():
+                del self._items[share_id]
+                self._bytes -= len(blob)
+                return None
+            self._items.move_to_end(share_id)
+        return decode(blob)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteShareStore:
+    """Share store in one SQLite file shared by every worker process, so a
+    share link works from any worker and survives restarts.
+
+    Expired rows are purged, and the least recently read rows beyond
+    ``max_items`` evicted, every ``prune_every`` writes. Reads only write
+    the read time back once it is ``touch_every`` seconds old, so a hot
+    share is served without taking the write lock on every view.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_PATH,
+        ttl=DEFAULT_TTL,
+        max_items=100_000,
+        prune_every=200,
+        touch_every=TOUCH_EVERY,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_items = max_items
+        self.prune_every = prune_every
+        self.touch_every = touch_every
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def put(self, report):
+        """Store ``report`` and return its shareId, which is also set on it."""
+        share_id = share_id_for(report)
+        report["shareId"] = share_id
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO shares VALUES (?, ?, ?, ?)",
+                (share_id, encode(report), now + self.ttl, now),
+            )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+        return share_id
+
+    def get(self, share_id):
+        now = time.time()
+        with self._db() as db:
+            row = db.execute(
+                "SELECT report, accessed_at FROM shares"
+                " WHERE id = ? AND expires_at >= ?",
+                (share_id, now),
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.touch_every:
+                db.execute(
+                    "UPDATE shares SET accessed_at = ? WHERE id = ?", (now, share_id)
+                )
+        return decode(row[0])
+
+    def prune(self):
+        with self._db() as db:
+            db.execute("DELETE FROM shares WHERE expires_at < ?", (time.time(),))
+            db.execute(
+                "DELETE FROM shares WHERE id IN (SELECT id FROM shares"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,),
+            )
+
+    def __len__(self):
+        with self._db() as db:
+            return db.execute("SELECT COUNT(*) FROM shares").fetchone()[0]
+
+
+_shares = None
+_shares_lock = threading.Lock()
+
+
+def get_share_store():
+    """The process-wide share store: SQLite at ``SHARE_STORE_PATH``, or an
+    in-memory store when that is set to an empty string."""
+    global _shares
+    with _shares_lock:
+        if _shares is None:
+            _shares = SQLiteShareStore() if DEFAULT_PATH else MemoryShareStore()
+    return _shares
+
+
+def set_share_store(store):
+    global _shares
+    _shares = store
@@ -86,17 +86,17 @@ class App {
 		loader.classList.remove("hidden");
 
 		try {
-			const res = await fetch(`${this.api}/rewind?username=${username}&year=${year}`);
+			const res = await fetch(`${this.api}/rewind/stream?username=${username}&year=${year}`);
 			if (!res.ok) throw new Error("User not found or private");
-			const result = await res.json();
-			this.data = result.data;
 
-			gsap.to(this.dom.gate, {
-				yPercent: -100,
-				duration: 1.5,
-				ease: "power4.inOut",
-				onComplete: () => this.render(result.html),
-			});
+			this.data = {};
+			this.dom.app.innerHTML = "";
+			for await (const message of this.readEvents(res)) {
+				if (message.event === "error") throw new Error("User not found or private");
+				if (message.event === "status" && message.sections) this.layout(message.sections);
+				if (message.event === "section") this.renderSection(message);
+				if (message.event === "done") this.render();
+			}
 		} catch (err) {
 			document.getElementById("error").textContent = err.message;
 			document.getElementById("error").classList.remove("hidden");
@@ -105,9 +105,42 @@ class App {
 		}
 	}
 
-	render(htmlContent) {
-		this.dom.app.innerHTML = htmlContent;
-		gsap.set(this.dom.app, { opacity: 1 });
+	async *readEvents(response) {
+		const reader = response.body.getReader();
+		const decoder = new TextDecoder();
+		let buffer = "";
+		for (;;) {
+			const { value, done } = await reader.read();
+			if (done) break;
+			buffer += decoder.decode(value, { stream: true });
+			const lines = buffer.split("\n");
+			buffer = lines.pop();
+			for (const line of lines) if (line) yield JSON.parse(line);
+		}
+	}
+
+	// Sections arrive as soon as their data is ready, not in page order, so
+	// each one fills a slot laid out from the first status event.
+	layout(names) {
+		this.dom.app.innerHTML = names.map((name) => `<div data-section="${name}" style="display: contents"></div>`).join("");
+	}
+
+	renderSection(section) {
+		Object.assign(this.data, section.data);
+		const slot = this.dom.app.querySelector(`[data-section="${section.name}"]`);
+		if (slot) slot.innerHTML = section.html;
+		else this.dom.app.insertAdjacentHTML("beforeend", section.html);
+		if (section.name === "hero") {
+			gsap.to(this.dom.gate, {
+				yPercent: -100,
+				duration: 1.5,
+				ease: "power4.inOut",
+				onComplete: () => gsap.set(this.dom.app, { opacity: 1 }),
+			});
+		}
+	}
+
+	render() {
 		setTimeout(() => this.initVisuals(), 100);
 		setTimeout(() => this.renderCharts(), 500);
 	}
@@ -455,7 +488,7 @@ class App {
 			const url = window.URL.createObjectURL(blob);
 			const link = document.createElement("a");
 			link.href = url;
-			link.download = `Wrapped-${this.data.username}-${this.data.year}.png`;
+			link.download = `Wrapped-${this.data.username}-${this.data.year}.${blob.type.split("/")[1] || "png"}`;
 			link.click();
 			window.URL.revokeObjectURL(url);
 
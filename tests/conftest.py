@@ -0,0 +1,25 @@
+import pytest
+
+import app
+import data.client
+from benchmarks.stub_server import StubAniList
+from data import AniListClient, run_sync, set_store
+from results import ResultCache, set_result_cache
+from shares import MemoryShareStore, set_share_store
+
+
+@pytest.fixture
+def anilist(tmp_path, monkeypatch):
+    """A stub AniList behind the default client, with empty caches and
+    share store in ``tmp_path``; yields the stub and the client."""
+    with StubAniList(latency=0, entries=60) as stub:
+        client = AniListClient(url=stub.url)
+        monkeypatch.setattr(data.client, "_client", client)
+        set_result_cache(ResultCache(str(tmp_path / "results.sqlite3")))
+        set_share_store(MemoryShareStore())
+        app.cache.clear()
+        yield stub, client
+        set_result_cache(None)
+        set_share_store(None)
+        set_store(None)
+        run_sync(client.aclose())
@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from cards import CardRenderer, CardTimeout
+
+DATA = {
+    "username": "a",
+    "year": 2024,
+    "persona": {"title": "The Completionist"},
+    "overall": {
+        "anime_completed": 1,
+        "episodes_watched": 12,
+        "manga_completed": 0,
+        "chapters_read": 0,
+    },
+}
+
+
+class BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        raise BrokenProcessPool("a worker died")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class StalledPool:
+    def submit(self, fn, *args):
+        return Future()
+
+
+def renderer(pool, **kwargs):
+    renderer = CardRenderer(cache_dir=None, workers=1, **kwargs)
+    renderer._pool = pool
+    return renderer
+
+
+def test_rejects_unknown_presets_before_queueing():
+    cards = renderer(BrokenPool())
+    with pytest.raises(ValueError):
+        cards.submit(DATA, "png", "tiny")
+    assert cards.pending == 0
+    assert not cards._pool.shut_down
+
+
+def test_failed_submit_settles_the_render_and_replaces_a_broken_pool():
+    pool = BrokenPool()
+    cards = renderer(pool)
+    with pytest.raises(BrokenProcessPool):
+        cards.render(DATA)
+    assert cards.pending == 0
+    assert cards._inflight == {}
+    assert cards.stats["errors"] == 1
+    assert pool.shut_down and cards._pool is None
+
+
+def test_render_times_out():
+    cards = renderer(StalledPool(), timeout=0.05)
+    with pytest.raises(CardTimeout):
+        cards.render(DATA)
+    with pytest.raises(CardTimeout):
+        asyncio.run(cards.arender(DATA))
+    # The stalled render is still shared, not cancelled by the timeouts.
+    (inflight,) = cards._inflight.values()
+    assert not inflight.done()
@@ -0,0 +1,37 @@
+import asyncio
+
+from benchmarks.stub_server import StubAniList
+from data.client import AniListClient, LoopThread
+
+QUERY = "query ($username: String) { User(name: $username) { id } }"
+
+
+def test_keeps_one_http_client_per_live_loop():
+    with StubAniList(latency=0) as stub:
+        client = AniListClient(url=stub.url)
+        other = LoopThread()
+
+        async def ask():
+            await client.query(QUERY, {"username": "bench"})
+            return client._client()
+
+        async def ask_and_leave():
+            # Like a script that ends its loop without ``client.aclose()``;
+            # closes the connections itself to keep the test quiet.
+            http = await ask()
+            await http.aclose()
+            return http
+
+        async def main():
+            second = await ask()
+            assert second is not first
+            # The client of the closed loop is dropped, the live one is kept.
+            assert list(client._clients.values()) == [threaded, second]
+
+            await client.aclose()
+            assert client._clients == {}
+            assert second.is_closed and threaded.is_closed
+
+        first = asyncio.run(ask_and_leave())
+        threaded = other.run(ask())
+        asyncio.run(main())
@@ -0,0 +1,17 @@
+import json
+
+from data import ListStore
+from data.entries import Entry, decode
+
+SPARSE = {"id": 7, "status": None, "media": {"title": {"english": "Sparse"}}}
+
+
+def test_entry_without_status_round_trips(tmp_path):
+    entry = Entry.from_json(SPARSE)
+    decoded = decode(json.dumps({"entries": [entry.to_json()]}))["entries"][0]
+    assert isinstance(decoded, Entry) and decoded == entry
+
+    store = ListStore(str(tmp_path / "lists.sqlite3"))
+    store.replace("bench", [entry], [], {})
+    anime, manga, _ = store.load("bench")
+    assert anime == [entry] and manga == []
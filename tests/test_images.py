@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+
+import asgi
+from images import ImageProxy, set_image_proxy
+
+
+def test_asgi_shutdown_closes_the_proxy_client(anilist, tmp_path):
+    proxy = ImageProxy(cache_dir=str(tmp_path / "proxy"))
+    set_image_proxy(proxy)
+
+    async def pooled():
+        return proxy._async_client()
+
+    try:
+        with TestClient(asgi.app) as client:
+            http = client.portal.call(pooled)
+        assert http.is_closed and proxy._http is None
+    finally:
+        set_image_proxy(None)
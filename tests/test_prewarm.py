@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+import data.store
+from data import ListStore, run_sync, set_store
+from prewarm import Journal, Prewarmer, pending_years
+from shares import share_id_for
+
+YEAR = 2024
+
+
+@pytest.mark.parametrize("with_store", [True, False])
+def test_servers_read_what_prewarm_wrote(anilist, tmp_path, monkeypatch, with_store):
+    stub, client = anilist
+    if with_store:
+        set_store(ListStore(str(tmp_path / "lists.sqlite3")))
+    else:
+        monkeypatch.setattr(data.store, "DEFAULT_PATH", "")
+        set_store(None)
+
+    journal = Journal(str(tmp_path / "users.done"))
+    with ThreadPoolExecutor(2) as pool:
+        warmer = Prewarmer(client, pool, journal)
+        (share_id,) = run_sync(warmer.warm("Bench", [YEAR]))
+    sent = stub.requests
+    results = warmer.results
+
+    report = app.rewind_for("bench", YEAR)
+    assert share_id_for({**report, "username": "Bench"}) == share_id
+    assert results.stats["hits"] == 1 and results.stats["computed"] == 0
+    assert stub.requests == sent
+
+
+def test_journal_skips_only_the_years_already_warmed(tmp_path):
+    journal = Journal(str(tmp_path / "users.done"))
+    journal.record("Foo", "ok", years=[2024], shareIds=["a"])
+    journal.record("bar", "error", error="boom")
+
+    pending = pending_years(["foo", "Bar"], [2024, 2025], journal.done())
+    assert pending == [("foo", [2025]), ("Bar", [2024, 2025])]
@@ -0,0 +1,25 @@
+import pickle
+import zlib
+
+from results import ResultCache
+
+
+def test_round_trips_int_keyed_reports(tmp_path):
+    results = ResultCache(str(tmp_path / "results.sqlite3"))
+    value = {
+        "favorites": {"anime": [{"id": 1}]},
+        "reports": {2024: {"score_distribution": {10: 3, 7: 1}, "genres": []}},
+    }
+    results.set("rewinds:a", value)
+    assert results.get("rewinds:a") == value
+
+
+def test_undecodable_rows_are_misses(tmp_path):
+    results = ResultCache(str(tmp_path / "results.sqlite3"))
+    results.set("rewinds:a", {})
+    with results._db() as db:
+        db.execute(
+            "UPDATE results SET value = ?", (zlib.compress(pickle.dumps({1: 2})),)
+        )
+    assert results.get("rewinds:a") is None
+    assert results.get_or_compute("rewinds:a", lambda: {"ok": 1}) == {"ok": 1}
@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.stub_server import StubAniList
+from data.client import AniListClient, run_sync
+from data.scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    TokenBucket,
+    priority,
+)
+
+QUERY = "query ($username: String) { User(name: $username) { id } }"
+
+
+def post(http, url):
+    return lambda: http.post(url, json={"query": QUERY, "variables": {}})
+
+
+async def burst(scheduler, url, n):
+    async with httpx.AsyncClient() as http:
+        return await asyncio.gather(
+            *(scheduler.submit(post(http, url)) for _ in range(n))
+        )
+
+
+def test_stays_within_the_rate():
+    limit, window = 4, 0.5
+    with StubAniList(latency=0, rate_limit=limit, window=window) as stub:
+        scheduler = RequestScheduler(TokenBucket(capacity=limit, period=window))
+        responses = asyncio.run(burst(scheduler, stub.url, 12))
+
+    assert [r.status_code for r in responses] == [200] * 12
+    # A token bucket sends at most ``capacity + rate * t`` requests by ``t``.
+    start = stub.arrivals[0]
+    for sent, at in enumerate(stub.arrivals, 1):
+        assert sent <= limit + (at - start) * limit / window + 1
+
+
+def test_waits_out_429_retry_after():
+    with StubAniList(latency=0, rate_limit=2, window=1.0) as stub:
+        # The client believes it may send far more than the server allows.
+        scheduler = RequestScheduler(
+            TokenBucket(capacity=100, period=1.0), backoff_base=0.01
+        )
+        responses = asyncio.run(burst(scheduler, stub.url, 4))
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert stub.throttled >= 1
+    assert scheduler.stats["throttled"] == stub.throttled
+    assert scheduler.stats["retries"] >= stub.throttled
+    # The retried requests went out only after the server's window reset.
+    assert stub.arrivals[-1] - stub.arrivals[0] >= 0.9
+
+
+def test_serves_interactive_before_background():
+    order = []
+
+    async def run(url):
+        scheduler = RequestScheduler(TokenBucket(capacity=1, period=0.05))
+        async with httpx.AsyncClient() as http:
+
+            def request(label):
+                async def send():
+                    order.append(label)
+                    return await post(http, url)()
+
+                return send
+
+            await asyncio.gather(
+                *(
+                    scheduler.submit(request(f"bg{i}"), PRIORITY_BACKGROUND)
+                    for i in range(3)
+                ),
+                *(
+                    scheduler.submit(request(f"ui{i}"), PRIORITY_INTERACTIVE)
+                    for i in range(2)
+                ),
+            )
+        await scheduler.aclose()
+
+    with StubAniList(latency=0) as stub:
+        asyncio.run(run(stub.url))
+
+    assert order == ["ui0", "ui1", "bg0", "bg1", "bg2"]
+
+
+@pytest.mark.parametrize("limit", [60, 120])
+def test_headers_never_raise_the_configured_rate(limit):
+    bucket = TokenBucket(capacity=90)
+    bucket.sync(limit=limit, remaining=limit - 1)
+    assert bucket.capacity == min(limit, 90)
+    assert bucket.tokens <= min(limit, 90)
+
+
+def test_background_context_reaches_the_scheduler():
+    seen = []
+
+    class Recording(RequestScheduler):
+        async def submit(self, send, priority=PRIORITY_INTERACTIVE):
+            seen.append(priority)
+            return await super().submit(send, priority)
+
+    with StubAniList(latency=0) as stub:
+        client = AniListClient(url=stub.url, scheduler=Recording())
+        run_sync(client.query(QUERY, {"username": "a"}))
+        with priority(PRIORITY_BACKGROUND):
+            run_sync(client.query(QUERY, {"username": "a"}))
+        run_sync(client.aclose())
+
+    assert seen == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
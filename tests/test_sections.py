@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from flask import render_template
+
+import app
+import data.store
+from data import set_store
+from sections import SECTION_NAMES, page_html
+
+YEAR = 2024
+URL = f"/api/rewind/stream?username=bench&year={YEAR}"
+
+
+@pytest.fixture
+def client(anilist, monkeypatch):
+    monkeypatch.setattr(data.store, "DEFAULT_PATH", "")
+    set_store(None)
+    return app.app.test_client()
+
+
+def read(response, n=None):
+    lines = []
+    for chunk in response.response:
+        lines.extend(json.loads(line) for line in chunk.decode().splitlines())
+        if n is not None and len(lines) >= n:
+            break
+    return lines
+
+
+def order(events):
+    return [e.get("name") or e.get("stage") or e["event"] for e in events]
+
+
+def test_sends_sections_as_their_data_arrives(anilist, client):
+    stub, _ = anilist
+    response = client.get(URL, buffered=False)
+    first = read(response, 3)
+    # Layout and static sections go out before AniList is asked anything.
+    assert first[0]["sections"] == SECTION_NAMES
+    assert order(first) == ["fetching", "styles", "charts"]
+    assert stub.requests == 0
+
+    events = first + read(response)
+    assert order(events) == [
+        "fetching",
+        "styles",
+        "charts",
+        # Favorites come with the fetch, before the lists are aggregated.
+        "cast",
+        "rendering",
+        "hero",
+        "highlights",
+        "grind",
+        "timeline",
+        "outro",
+        "done",
+    ]
+    share_id = events[-2]["data"]["shareId"]
+    assert app.get_share_store().get(share_id) is not None
+
+
+def test_stream_and_report_share_the_section_cache(client):
+    events = read(client.get(URL, buffered=False))
+    sections = {e["name"]: e["html"] for e in events if e["event"] == "section"}
+    share_id = events[-2]["data"]["shareId"]
+
+    # Served from the sections the stream rendered, not rendered again.
+    assert app.cache.get(f"report-html:{share_id}") == sections
+    page = client.get(f"/api/report?shareId={share_id}")
+    assert page.status_code == 200
+    assert page.get_data(as_text=True) == page_html(sections)
+
+
+def test_page_html_matches_the_full_template(client):
+    events = read(client.get(URL, buffered=False))
+    share_id = events[-2]["data"]["shareId"]
+    report = app.get_share_store().get(share_id)
+    with app.app.app_context():
+        sections = app.report_sections(report)
+        collage = app.get_thumbnail_store().prepare(report)
+        full = render_template("report_content.html", collage=collage, **report)
+    assert page_html(sections) == full
+
+
+def test_report_etag_needs_an_existing_share(client):
+    events = read(client.get(URL, buffered=False))
+    share_id = events[-2]["data"]["shareId"]
+    etag = {"If-None-Match": f'"{share_id}"'}
+
+    report = client.get(f"/api/report?shareId={share_id}", headers=etag)
+    assert report.status_code == 304
+    unknown = {"If-None-Match": '"000000000000"'}
+    missing = client.get("/api/report?shareId=000000000000", headers=unknown)
+    assert missing.status_code == 404
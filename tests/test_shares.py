@@ -0,0 +1,28 @@
+from shares import SQLiteShareStore, share_id_for
+
+REPORT = {"username": "Foo", "year": 2024, "overall": {"anime_completed": 3}}
+
+
+def test_share_ids_ignore_username_case():
+    assert share_id_for(REPORT) == share_id_for({**REPORT, "username": "foo"})
+    assert share_id_for(REPORT) != share_id_for({**REPORT, "year": 2023})
+
+
+def test_reads_touch_a_share_at_most_every_interval(tmp_path):
+    shares = SQLiteShareStore(str(tmp_path / "shares.sqlite3"), touch_every=60)
+    share_id = shares.put(dict(REPORT))
+
+    def accessed_at():
+        with shares._db() as db:
+            return db.execute(
+                "SELECT accessed_at FROM shares WHERE id = ?", (share_id,)
+            ).fetchone()[0]
+
+    stored = accessed_at()
+    assert shares.get(share_id)["username"] == "Foo"
+    assert accessed_at() == stored
+
+    with shares._db() as db:
+        db.execute("UPDATE shares SET accessed_at = accessed_at - 120")
+    shares.get(share_id)
+    assert accessed_at() > stored - 120